@@ -0,0 +1,118 @@
+"""Account lookup across the legacy login tables.
+
+Supplier and customer accounts may live in any of several historical tables,
+keyed by differently named columns. Rather than probing every table/column
+pair per login (and relying on ProgrammingError for the ones that do not
+exist), ``AccountResolver`` asks the database's column catalogue once which
+pairs exist, caches that plan, and then answers each login with a single round
+trip: one targeted query when only one table exists, otherwise one batch whose
+result sets are read with ``nextset()``. Backends that cannot batch (see
+dialects.py) get one query per table instead, stopping at the first match.
+"""
+
+import threading
+
+import dialects
+import metrics
+
+SUPPLIER_TABLES = ('Admins', 'vanshul_Admins', 'SupplierUsers')
+# Accounts from these tables administer every supplier's catalogue
+ADMIN_TABLES = ('Admins', 'vanshul_Admins')
+SUPPLIER_FIELDS = ('Email', 'Username', 'UserName', 'LoginId')
+CUSTOMER_TABLES = ('Customers', 'vanshul_Customers', 'CustomerAccounts')
+CUSTOMER_FIELDS = ('Email', 'EmailAddress')
+
+# Key added to returned accounts naming the table they were read from
+SOURCE_TABLE_KEY = '_source_table'
+
+
+class AccountResolver:
+    def __init__(self, tables, fields):
+        self.tables = tuple(tables)
+        self.fields = tuple(fields)
+        self._plan = None
+        self._lock = threading.Lock()
+
+    def plan(self, conn):
+        """Return ``[(table, [columns...]), ...]`` for the candidates that exist, in priority order."""
+
+        plan = self._plan
+        metrics.cache_lookup('account_plan', plan is not None)
+        if plan is None:
+            with self._lock:
+                if self._plan is None:
+                    self._plan = self._discover(conn)
+                plan = self._plan
+        return plan
+
+    def invalidate(self):
+        self._plan = None
+
+    def _discover(self, conn):
+        sql, params = dialects.current().columns_query(self.tables, self.fields)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            found = {}
+            for table_name, column_name in cursor.fetchall():
+                found.setdefault(table_name.lower(), set()).add(column_name.lower())
+        finally:
+            cursor.close()
+
+        plan = []
+        for table_name in self.tables:
+            columns = found.get(table_name.lower(), set())
+            # Column names compare case-insensitively (e.g. Username/UserName)
+            matched = []
+            for field in self.fields:
+                if field.lower() in columns and field.lower() not in {name.lower() for name in matched}:
+                    matched.append(field)
+            if matched:
+                plan.append((table_name, matched))
+        return plan
+
+    def lookup(self, conn, identifier):
+        plan = self.plan(conn)
+        if not plan:
+            return None
+
+        dialect = dialects.current()
+        queries = []
+        for table_name, fields in plan:
+            predicate = ' OR '.join(f"{field} = ?" for field in fields)
+            # Prefer a match on the earlier candidate column, as the per-column probing did
+            ordering = ' '.join(f"WHEN {field} = ? THEN {index}" for index, field in enumerate(fields))
+            order_by = f" ORDER BY CASE {ordering} ELSE {len(fields)} END" if len(fields) > 1 else ''
+            params = [identifier] * (len(fields) * 2 if order_by else len(fields))
+            queries.append(dialect.limit(f"SELECT * FROM {table_name} WHERE {predicate}{order_by}", params, 1))
+
+        if dialect.supports_batches:
+            batches = [(';\n'.join(sql for sql, _ in queries), [param for _, params in queries for param in params])]
+        else:
+            batches = queries
+
+        cursor = conn.cursor()
+        try:
+            tables = iter(table_name for table_name, _ in plan)
+            for sql, params in batches:
+                try:
+                    cursor.execute(sql, params)
+                except dialect.ProgrammingError:
+                    # A table or column vanished since discovery; rediscover on the next login
+                    self.invalidate()
+                    raise
+                for table_name in tables:
+                    row = cursor.fetchone() if cursor.description else None
+                    if row:
+                        account = dict(zip([column[0] for column in cursor.description], row))
+                        account[SOURCE_TABLE_KEY] = table_name
+                        return account
+                    if not cursor.nextset():
+                        break
+            return None
+        finally:
+            cursor.close()
+
+
+supplier_accounts = AccountResolver(SUPPLIER_TABLES, SUPPLIER_FIELDS)
+customer_accounts = AccountResolver(CUSTOMER_TABLES, CUSTOMER_FIELDS)
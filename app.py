@@ -1,35 +1,69 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, g, send_file, has_request_context
+import base64
 import binascii
+import click
 import csv
+import gzip
 import hashlib
+import hmac
+import importlib
+import io
 import os
+import re
 import uuid
 import json
+import zlib
 from datetime import datetime
+from decimal import Decimal
 from collections import defaultdict
 from functools import wraps
 from urllib.parse import urlparse
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
-import pyodbc
 import logging
 import sys
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+import threading
+import time
+
+import accounts
+import dashboard
+import dialects
+import exports
+import forecasting
+import imports
+import instrumentation
+import logging_config
+import metrics
+import migrate
+import outbox
+import profiling
+import replicas
+import repository
+import resilience
+import rollups
+import security
+import stock
+
+# Configure logging (levels, JSON output and sampling are environment-driven; see logging_config.py)
 logger = logging.getLogger(__name__)
+# Per-request chatter; sampled so it stays cheap under load
+hot_logger = logging.getLogger(f'{__name__}.hot')
+logging_config.configure(__name__)
 
 # Check Python version
 if sys.version_info < (3, 7):
     logger.error("Python version must be 3.7 or higher. Current version: %s", sys.version)
     sys.exit(1)
 
+# Database backend, chosen by DB_BACKEND (see dialects.py)
 try:
-    import pyodbc
-    logger.info("pyodbc module imported successfully")
-except ImportError:
-    logger.error("pyodbc module is missing. Please install it with 'pip install pyodbc'")
+    dialect = dialects.current()
+    dialect.driver
+except (ImportError, ValueError) as e:
+    logger.error("Database backend is unavailable: %s", e)
     sys.exit(1)
+logger.info("Using database backend %s", dialect.describe())
 
 app = Flask(__name__)
 app.secret_key = 'super-secret-key-2025'
@@ -38,125 +72,404 @@ app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['SESSION_PERMANENT'] = False
 
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+@app.before_request
+def assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+
+@app.after_request
+def echo_request_id(response):
+    request_id = getattr(g, 'request_id', None)
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+
+# Key under which asgi.py hands over the timings of queries it ran before the view
+PREFETCH_TIMINGS_ENVIRON_KEY = 'vvstore.prefetch_timings'
+instrumentation.init_app(app, prefetch_timings_key=PREFETCH_TIMINGS_ENVIRON_KEY)
+metrics.init_app(app)
+profiling.init_app(app, authorised=lambda: bool(session.get('supplier_user')))
+
+# Behind a reverse proxy every request comes from the proxy's address; trust the
+# X-Forwarded-For/-Proto that TRUSTED_PROXY_HOPS proxies append (default 0: none)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
 # Ensure upload folder exists
 upload_folder = app.config['UPLOAD_FOLDER']
 if not os.path.exists(upload_folder):
     os.makedirs(upload_folder)
-    logger.info(f"Created upload folder: {upload_folder}")
+    logger.info("Created upload folder: %s", upload_folder)
 
 # Database Configuration
-def get_db():
-    server = os.getenv('DB_SERVER', '208.91.198.196')
-    database = os.getenv('DB_NAME', 'ICP')
-    username = os.getenv('DB_USER', 'ICP')
-    password = os.getenv('DB_PASSWORD', 'Teams@@2578')
-    driver = os.getenv('DB_DRIVER', '{ODBC Driver 18 for SQL Server}')
-    conn_str = (
-        fr'DRIVER={driver};SERVER={server};DATABASE={database};'
-        fr'UID={username};PWD={password};Encrypt=yes;TrustServerCertificate=yes;'
-    )
+_connect_factory = None
+
+
+def _load_connect_factory():
+    """Resolve ``DB_CONNECT_FACTORY`` ("module:callable") used to swap in a local stand-in database."""
+
+    global _connect_factory
+    target = os.getenv('DB_CONNECT_FACTORY')
+    if not target:
+        return None
+    if _connect_factory is None:
+        module_name, _, attribute = target.partition(':')
+        _connect_factory = getattr(importlib.import_module(module_name), attribute or 'connect')
+    return _connect_factory
+
+
+def get_db(readonly=False):
+    """A connection to the primary; with ``readonly=True``, to a read replica when one is usable (replicas.py)."""
+
+    started = time.perf_counter()
+    conn = _connect_read() if readonly else None
+    if conn is None:
+        conn = _connect()
+    return instrumentation.instrument_connection(conn, time.perf_counter() - started)
+
+
+# Refuses connections while the database keeps failing, instead of waiting out a timeout per request
+db_breaker = resilience.CircuitBreaker(
+    'database',
+    dialect.Error,
+    failure_threshold=int(os.getenv('DB_BREAKER_FAILURES', '5')),
+    reset_seconds=float(os.getenv('DB_BREAKER_RESET_SECONDS', '30')),
+)
+
+
+def _connect():
+    db_breaker.before_call()
+    factory = _load_connect_factory()
     try:
-        conn = pyodbc.connect(conn_str)
-        logger.info("Database connection established successfully")
-        return conn
-    except pyodbc.Error as e:
-        logger.error(f"Database connection failed: {e}")
+        conn = factory() if factory is not None else dialect.connect()
+    except dialect.Error as e:
+        db_breaker.record_failure(e)
+        logger.error("Database connection failed: %s", e)
         raise
+    db_breaker.record_success()
+    hot_logger.debug("Database connection established")
+    return conn
+
+
+def _observe_statement(normalised_sql, seconds, failed):
+    if not failed:
+        db_breaker.record_success()
+    elif dialect.query_timeout and seconds >= dialect.query_timeout:
+        # Cancelled by DB_QUERY_TIMEOUT; other errors (constraints, bad SQL) say nothing about availability
+        db_breaker.record_failure(f"statement timed out after {seconds:.1f}s: {normalised_sql[:80]}")
+
+
+instrumentation.query_listeners.append(_observe_statement)
+
+replica_router = replicas.from_env(dialect, _connect)
+if replica_router is not None:
+    logger.info("Routing reads to replicas: %s", ', '.join(replica.name for replica in replica_router.replicas))
+
+
+def _connect_read():
+    """A replica connection, or None to read from the primary (none usable, or this session just wrote)."""
+
+    if replica_router is None:
+        return None
+    conn = None
+    if not reads_pinned_to_primary():
+        conn = replica_router.connect_read()
+    metrics.DB_READS.labels('primary' if conn is None else 'replica').inc()
+    return conn
 
-# Create table manually using pyodbc
-def create_table():
+
+def pin_reads_to_primary():
+    """After this session writes, read from the primary -- past replicas and the catalogue snapshot -- for a while."""
+
+    catalog_snapshot.invalidate()
+    if has_request_context():
+        seconds = replica_router.sticky_seconds if replica_router is not None else catalog_snapshot.fresh_seconds
+        replicas.pin_to_primary(session, seconds)
+
+
+def reads_pinned_to_primary():
+    return has_request_context() and replicas.pinned_to_primary(session)
+
+
+@app.cli.command('migrate')
+@click.option('--target', type=int, default=None, help='Stop after this migration version.')
+@click.option('--status', is_flag=True, help='Only report applied and pending migrations.')
+def migrate_command(target, status):
+    """Apply pending schema migrations from migrations/."""
+    conn = get_db()
+    try:
+        if status:
+            pending = migrate.pending_migrations(conn)
+            click.echo(f"Schema version {migrate.current_version(conn)}, {len(pending)} pending")
+            for migration in pending:
+                click.echo(f"  pending {migration.version:04d}_{migration.name}")
+            return
+        applied = migrate.migrate(conn, target=target, log=click.echo)
+        click.echo(f"Schema is at version {migrate.current_version(conn)} ({len(applied)} applied)")
+    except migrate.MigrationError as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+
+
+@app.cli.command('replicas')
+def replicas_command():
+    """Check the read replicas in DB_REPLICAS and report their health and lag."""
+    if replica_router is None:
+        click.echo("No read replicas configured (DB_REPLICAS is unset)")
+        return
+    replica_router.check()
+    for replica in replica_router.status():
+        state = 'in rotation' if replica['usable'] else 'out of rotation'
+        lag = 'lag unknown' if replica['lag'] is None else f"{replica['lag']:.1f}s behind"
+        detail = f" ({replica['error']})" if replica['error'] else ''
+        click.echo(f"{replica['replica']}: {state}, {lag}{detail}")
+
+
+@app.cli.command('link-supplier')
+@click.argument('email')
+@click.argument('supplier')
+def link_supplier_command(email, supplier):
+    """Let the supplier account EMAIL sign in to SUPPLIER's console."""
     conn = get_db()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Products' AND xtype='U')
-            BEGIN
-                CREATE TABLE ICP.dbo.vanshul_Products (
-                    Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-                    ItemName NVARCHAR(255) NOT NULL,
-                    Category NVARCHAR(100),
-                    Supplier NVARCHAR(100),
-                    PurchasePrice FLOAT NOT NULL,
-                    SalePrice FLOAT,
-                    ProfitMargin FLOAT DEFAULT 20.0,
-                    SellingPrice FLOAT NOT NULL,
-                    Quantity INT NOT NULL,
-                    PhotoPaths NVARCHAR(MAX),
-                    CreatedAt DATETIME DEFAULT GETDATE()
-                )
-            END
-            """
-        )
-        cursor.execute(
-            """
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Orders' AND xtype='U')
-            BEGIN
-                CREATE TABLE ICP.dbo.vanshul_Orders (
-                    Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-                    OrderNumber NVARCHAR(50) NOT NULL UNIQUE,
-                    CustomerEmail NVARCHAR(255),
-                    Status NVARCHAR(50) DEFAULT 'Pending',
-                    TotalAmount DECIMAL(18, 2) NOT NULL DEFAULT 0,
-                    CreatedAt DATETIME DEFAULT GETDATE()
-                )
-            END
-            """
-        )
-        cursor.execute(
-            """
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_OrderItems' AND xtype='U')
-            BEGIN
-                CREATE TABLE ICP.dbo.vanshul_OrderItems (
-                    OrderItemId UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-                    OrderId UNIQUEIDENTIFIER NOT NULL,
-                    ProductId UNIQUEIDENTIFIER NOT NULL,
-                    Quantity INT NOT NULL,
-                    UnitPrice DECIMAL(18, 2) NOT NULL,
-                    LineTotal DECIMAL(18, 2) NOT NULL,
-                    CONSTRAINT FK_Order_OrderId FOREIGN KEY (OrderId) REFERENCES vanshul_Orders(Id),
-                    CONSTRAINT FK_Order_ProductId FOREIGN KEY (ProductId) REFERENCES vanshul_Products(Id)
-                )
-            END
-            """
-        )
-        cursor.execute(
-            """
-            IF COL_LENGTH('dbo.vanshul_Products', 'InitialQuantity') IS NULL
-            BEGIN
-                ALTER TABLE ICP.dbo.vanshul_Products
-                ADD InitialQuantity INT NULL;
-
-                UPDATE ICP.dbo.vanshul_Products
-                SET InitialQuantity = Quantity
-                WHERE InitialQuantity IS NULL;
-            END
-            """
-        )
-        cursor.execute(
-            """
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Customers' AND xtype='U')
-            BEGIN
-                CREATE TABLE ICP.dbo.Customers (
-                    Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-                    FullName NVARCHAR(255) NOT NULL,
-                    Email NVARCHAR(255) NOT NULL UNIQUE,
-                    PasswordHash NVARCHAR(255) NOT NULL,
-                    CreatedAt DATETIME DEFAULT GETDATE()
-                )
-            END
-            """
-        )
+        supplier_id = repository.link_supplier_email(cursor, supplier, email)
+        if supplier_id is None:
+            raise click.ClickException("Supplier name must not be empty")
         conn.commit()
-    except pyodbc.Error as e:
-        logger.error(f"Failed to ensure tables exist: {e}")
+        click.echo(f"{email} now signs in to the console of {supplier} ({supplier_id})")
+    except dialect.Error as exc:
         conn.rollback()
+        raise click.ClickException(str(exc))
     finally:
         cursor.close()
         conn.close()
 
-# Call create_table on app startup (if needed)
-create_table()
+
+@app.cli.command('forecast')
+@click.option('--limit', type=int, default=20, show_default=True, help='Suggestions to list.')
+def forecast_command(limit):
+    """Load the sales history and list the most urgent reorder suggestions across all suppliers."""
+    started = time.perf_counter()
+    conn = get_db()
+    try:
+        daily = forecasting.SalesHistory().refresh(conn)
+        loaded = time.perf_counter() - started
+        products = repository.list_products(conn, forecasting.PRODUCT_COLUMNS)
+        now = repository.database_now(conn)
+    except dialect.Error as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    suggestions = forecasting.forecast(products, daily, now)
+    click.echo(
+        f"{int(daily.sum())} units over {len(daily)} product-days loaded in {loaded:.2f}s, "
+        f"{len(products)} products forecast in {time.perf_counter() - started - loaded:.2f}s"
+    )
+    for product in suggestions[:limit]:
+        if not product['needs_reorder']:
+            break
+        click.echo(
+            f"{product['ItemName']} ({product['Supplier']}): {product['Quantity']} on hand, "
+            f"{product['velocity']}/day, {product['days_of_cover']} days of cover, order {product['suggested_order']}"
+        )
+
+
+@app.cli.command('rollups')
+def rollups_command():
+    """Fold orders into the sales rollups: the whole history on the first run, new orders after that."""
+    started = time.perf_counter()
+    conn = get_db()
+    try:
+        folded = rollups.run(conn)
+        through = repository.job_watermark(conn, rollups.WATERMARK)
+    except dialect.Error as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    click.echo(f"{folded} product-hours folded in {time.perf_counter() - started:.2f}s; rollups cover orders up to {through}")
+
+
+@app.cli.command('compact-stock')
+def compact_stock_command():
+    """Fold settled stock movements into the products' on-hand snapshot."""
+    conn = get_db()
+    try:
+        through, changed = stock.compact(conn)
+    except dialect.Error as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    click.echo(f"{changed} products updated; the snapshot includes movements up to {through or 0}")
+
+
+# Negative quantities are arguments, not options
+@app.cli.command('adjust-stock', context_settings={'ignore_unknown_options': True})
+@click.argument('product_id')
+@click.argument('quantity', type=int)
+@click.option('--note', help='Why, e.g. "stock count" or "damaged in transit".')
+def adjust_stock_command(product_id, quantity, note):
+    """Record a stock adjustment of QUANTITY units (negative to write stock off) for PRODUCT_ID."""
+    conn = get_db()
+    try:
+        on_hand = stock.adjust(conn, product_id, quantity, note)
+    except (ValueError, dialect.Error) as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    click.echo(f"{product_id}: {on_hand} on hand")
+
+
+@app.cli.command('shard-stock')
+@click.argument('product_id')
+@click.argument('shards', type=int)
+def shard_stock_command(product_id, shards):
+    """Split PRODUCT_ID's stock across SHARDS counter rows so concurrent sales of it do not queue on one (0 to undo)."""
+    conn = get_db()
+    try:
+        on_hand = stock.shard(conn, product_id, shards)
+    except (ValueError, dialect.Error) as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    click.echo(f"{product_id}: {on_hand} on hand across {shards or 'no'} shards")
+
+
+@app.cli.command('outbox-relay')
+@click.option('--sink', default=lambda: os.getenv('OUTBOX_SINK'), help='file:PATH or an http(s) URL (default: OUTBOX_SINK).')
+@click.option('--interval', type=float, default=1.0, show_default=True, help='Seconds between polls once caught up.')
+@click.option('--once', is_flag=True, help='Publish what is pending and exit.')
+def outbox_relay_command(sink, interval, once):
+    """Publish inventory events from the outbox to a sink, in batches, as they are recorded."""
+    if not sink:
+        raise click.ClickException("No sink: set OUTBOX_SINK or pass --sink")
+    target = outbox.open_sink(sink)
+    while True:
+        conn = get_db()
+        try:
+            published = outbox.drain(conn, target)
+        except (OSError, dialect.Error) as exc:
+            if once:
+                raise click.ClickException(str(exc))
+            # The batch is published again on the next poll; consumers skip seqs they have seen
+            logger.warning("Could not publish outbox events to %s: %s", target.name, exc)
+            published = 0
+        finally:
+            conn.close()
+        if once:
+            click.echo(f"Published {published} events to {target.name}")
+            return
+        time.sleep(interval)
+
+
+@app.cli.command('export')
+@click.argument('dataset', type=click.Choice(sorted(exports.DATASETS)))
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(sorted(exports.FORMATS)), help="Default: OUTPUT's extension.")
+@click.option('--search', help='Only products matching this (or their order lines), as the console search does.')
+@click.option('--supplier-id', help="Only this supplier's products.")
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), help='orders: placed on or after this day.')
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), help='orders: placed before this day.')
+def export_command(dataset, output, fmt, search, supplier_id, since, until):
+    """Write DATASET (products or orders) to OUTPUT as CSV, XLSX or Parquet, a batch at a time."""
+    fmt = fmt or os.path.splitext(output)[1].lstrip('.').lower()
+    if fmt not in exports.FORMATS:
+        raise click.ClickException(f"Cannot tell the format from {output}; pass --format")
+    started = time.perf_counter()
+    conn = get_db(readonly=True)
+    try:
+        cursor = exports.open_export(conn, dataset, search, supplier_id, since, until)
+        try:
+            with open(output, 'wb') as handle:
+                for chunk in exports.stream(cursor, dataset, fmt):
+                    handle.write(chunk)
+        finally:
+            cursor.close()
+    except dialect.Error as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    size = os.path.getsize(output)
+    click.echo(f"Wrote {dataset} to {output} ({size / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+
+@app.cli.command('stock-history')
+@click.argument('product_id')
+@click.option('--limit', type=int, default=50, show_default=True)
+def stock_history_command(product_id, limit):
+    """List PRODUCT_ID's latest stock movements, newest first."""
+    conn = get_db()
+    try:
+        product = repository.get_product(conn, product_id)
+        movements = repository.product_movements(conn, product_id, limit)
+    except dialect.Error as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        conn.close()
+    if product is None:
+        raise click.ClickException(f"No product {product_id}")
+    click.echo(f"{product['ItemName']}: {product['Quantity']} on hand")
+    for movement in movements:
+        detail = ' '.join(str(value) for value in (movement['Reference'], movement['Note']) if value)
+        click.echo(f"  #{movement['Seq']} {movement['CreatedAt']} {movement['Kind']:10} {movement['Quantity']:+d} {detail}")
+
+
+SCHEMA_CHECK_RETRY_SECONDS = 60
+_schema_check = {'done': False, 'last_attempt': 0.0}
+_schema_check_lock = threading.Lock()
+
+
+@app.before_request
+def verify_schema_version():
+    """Once per process, compare the database schema version with the bundled migrations."""
+
+    if _schema_check['done']:
+        return
+    with _schema_check_lock:
+        now = time.monotonic()
+        if _schema_check['done'] or now - _schema_check['last_attempt'] < SCHEMA_CHECK_RETRY_SECONDS:
+            return
+        _schema_check['last_attempt'] = now
+        try:
+            conn = get_db()
+            try:
+                version = migrate.current_version(conn)
+            finally:
+                conn.close()
+        except dialect.Error as e:
+            logger.error("Could not verify schema version: %s", e)
+            return
+        _schema_check['done'] = True
+        expected = migrate.latest_version()
+        if version < expected:
+            logger.error("Database schema is at version %s but the app expects %s; run 'flask --app app migrate'", version, expected)
+        elif version > expected:
+            logger.warning("Database schema version %s is newer than this release (%s)", version, expected)
+
+
+def configure_app(config=None):
+    """Apply ``FLASK_*`` environment settings and ``config`` to the module's ``app`` and return it.
+
+    This is not a factory: routes are registered on the module-level ``app`` as
+    the module is imported, so every call configures and returns that same
+    object. Call it once per process (wsgi.py, asgi.py and ``python app.py`` do).
+
+    Importing this module and configuring the app never touches the database;
+    schema changes are applied separately (``flask --app app migrate``, run by
+    gunicorn.conf.py in the master before workers fork).
+    """
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    return app
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
@@ -190,11 +503,6 @@ def build_cart_summary(cart):
     return total_items, total_amount
 
 
-def map_row(cursor, row):
-    columns = [column[0] for column in cursor.description]
-    return dict(zip(columns, row))
-
-
 def _normalise_password_value(value):
     """Return a comparable representation for password data fetched from SQL Server."""
 
@@ -245,7 +553,7 @@ def _check_sql_digest(expected_digest, provided_password):
     if isinstance(expected_digest, bytes):
         for algorithm in ('sha512', 'sha256'):
             digest = hashlib.new(algorithm, provided_password.encode('utf-8')).digest()
-            if digest == expected_digest:
+            if hmac.compare_digest(digest, expected_digest):
                 return True
 
     return False
@@ -265,93 +573,104 @@ def verify_password(stored_password, provided_password):
         return _check_sql_digest(normalised, provided_password)
 
     if isinstance(normalised, str):
-        if normalised.startswith('pbkdf2:'):
+        if security.is_werkzeug_hash(normalised):
             return check_password_hash(normalised, provided_password)
         if _check_sql_digest(normalised, provided_password):
             return True
-        return normalised == provided_password
+        return hmac.compare_digest(normalised.encode('utf-8'), provided_password.encode('utf-8'))
 
     return False
 
 
+PASSWORD_COLUMNS = ('PasswordHash', 'Password', 'password')
+
+
+def stored_password_for(account):
+    return next((account.get(column) for column in PASSWORD_COLUMNS if account.get(column)), None)
+
+
+def rehash_account_password(account, password):
+    """Replace a legacy (plaintext, HASHBYTES, older-cost) password with the current scheme."""
+
+    table_name = account.get(accounts.SOURCE_TABLE_KEY)
+    column = next((name for name in PASSWORD_COLUMNS if account.get(name)), None)
+    if not table_name or not column or account.get('Id') is None:
+        return
+    new_hash = security.hash_password(password.strip())
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"UPDATE {table_name} SET {column} = ? WHERE Id = ?", (new_hash, account['Id']))
+        conn.commit()
+        logger.info("Upgraded password hash for account %s in %s", account['Id'], table_name)
+    except dialect.Error as e:
+        # e.g. a VARBINARY or too-short legacy column; the old value keeps working
+        conn.rollback()
+        logger.warning("Could not upgrade password hash in %s.%s: %s", table_name, column, e)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def check_login_password(account, password):
+    """Verify on the bounded password pool, then upgrade legacy hashes in the background."""
+
+    stored_password = stored_password_for(account)
+    if not security.password_verifier.run(verify_password, stored_password, password):
+        return False
+    if security.needs_rehash(_normalise_password_value(stored_password)):
+        security.password_verifier.submit(rehash_account_password, account, password)
+    return True
+
+
+def login_rate_limited(account_key):
+    """True if the client's IP has used up its sign-in attempts or the account is waiting out its failures.
+
+    An attempt at an account with no failures left costs the IP more.
+    """
+    client_ip = request.remote_addr or 'unknown'
+    account_key = account_key.lower()
+    locked = security.login_account_limiter.exhausted(account_key)
+    if not security.login_ip_limiter.allow(client_ip, security.LOCKED_ACCOUNT_COST if locked else 1.0):
+        return True
+    return security.login_backoff.retry_after(account_key) > 0
+
+
+def record_login_failure(account_key):
+    # Only failures count against the account; past its bucket each one makes the account wait longer
+    account_key = account_key.lower()
+    within_limit = security.login_account_limiter.allow(account_key)
+    security.login_backoff.failed(account_key, over_limit=not within_limit)
+
+
+def record_login_success(account_key):
+    security.login_backoff.succeeded(account_key.lower())
+
+
 def fetch_supplier_account(identifier):
     conn = get_db()
-    table_candidates = [
-        'Admins',
-        'vanshul_Admins',
-        'SupplierUsers',
-    ]
-    field_candidates = ['Email', 'Username', 'UserName', 'LoginId']
     try:
-        for table_name in table_candidates:
-            for field in field_candidates:
-                cursor = conn.cursor()
-                try:
-                    cursor.execute(
-                        f"SELECT TOP 1 * FROM {table_name} WHERE {field} = ?",
-                        (identifier,),
-                    )
-                    row = cursor.fetchone()
-                except pyodbc.ProgrammingError:
-                    cursor.close()
-                    continue
-
-                if row:
-                    account = map_row(cursor, row)
-                    cursor.close()
-                    return account
-                cursor.close()
-        return None
+        return accounts.supplier_accounts.lookup(conn, identifier)
     finally:
         conn.close()
 
 
 def fetch_customer_account(email):
     conn = get_db()
-    table_candidates = [
-        'Customers',
-        'vanshul_Customers',
-        'CustomerAccounts',
-    ]
-    field_candidates = ['Email', 'EmailAddress']
     try:
-        for table_name in table_candidates:
-            for field in field_candidates:
-                cursor = conn.cursor()
-                try:
-                    cursor.execute(
-                        f"SELECT TOP 1 * FROM {table_name} WHERE {field} = ?",
-                        (email,),
-                    )
-                    row = cursor.fetchone()
-                except pyodbc.ProgrammingError:
-                    cursor.close()
-                    continue
-
-                if row:
-                    account = map_row(cursor, row)
-                    cursor.close()
-                    return account
-                cursor.close()
-        return None
+        return accounts.customer_accounts.lookup(conn, email)
     finally:
         conn.close()
 
 
 def create_customer_account(full_name, email, password):
-    hashed_password = generate_password_hash(password)
+    hashed_password = security.hash_password(password)
     conn = get_db()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            INSERT INTO Customers (Id, FullName, Email, PasswordHash)
-            VALUES (?, ?, ?, ?)
-            """,
-            (str(uuid.uuid4()), full_name, email, hashed_password),
-        )
+        repository.insert_customer(cursor, full_name, email, hashed_password)
         conn.commit()
-    except pyodbc.IntegrityError as exc:
+    except dialect.IntegrityError as exc:
         conn.rollback()
         raise ValueError('An account with that email already exists.') from exc
     finally:
@@ -362,14 +681,69 @@ def create_customer_account(full_name, email, password):
 def supplier_login_required(view_func):
     @wraps(view_func)
     def wrapped_view(*args, **kwargs):
-        if not session.get('supplier_user'):
+        supplier_user = session.get('supplier_user')
+        if not supplier_user:
             flash('Please sign in with your supplier credentials to continue.', 'warning')
             return redirect(url_for('supplier_login', next=request.path))
+        if 'admin' not in supplier_user:
+            # Signed in before consoles were scoped to a supplier
+            session.pop('supplier_user', None)
+            flash('Please sign in again to continue.', 'info')
+            return redirect(url_for('supplier_login', next=request.path))
         return view_func(*args, **kwargs)
 
     return wrapped_view
 
 
+SUPPLIER_ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('SUPPLIER_ADMIN_EMAILS', '').split(',') if email.strip()}
+
+
+def supplier_account_scope(account, email):
+    """Session fields for what a supplier account may see: its own supplier's products, or everything for admins."""
+
+    admin = account.get(accounts.SOURCE_TABLE_KEY) in accounts.ADMIN_TABLES or email.lower() in SUPPLIER_ADMIN_EMAILS
+    conn = get_db()
+    try:
+        supplier = repository.supplier_for_email(conn, email)
+    finally:
+        conn.close()
+    return {
+        'admin': admin,
+        'supplier_id': str(supplier['Id']) if supplier else None,
+        'supplier_name': supplier['Name'] if supplier else None,
+    }
+
+
+def supplier_scope():
+    """The SupplierId the console shows: the account's own, or for admins ``?supplier=`` (None: every supplier)."""
+
+    supplier_user = session['supplier_user']
+    if supplier_user.get('admin'):
+        requested = request.args.get('supplier', '').strip()
+        return requested if _is_uuid(requested) else None
+    return supplier_user['supplier_id']
+
+
+def uploading_supplier():
+    """Supplier columns forced onto products a supplier account adds; None for admins, whose rows name their supplier."""
+
+    supplier_user = session['supplier_user']
+    if supplier_user.get('admin'):
+        return None
+    return {'Supplier': supplier_user['supplier_name'], 'SupplierId': supplier_user['supplier_id']}
+
+
+def products_changed(supplier_id=None):
+    """Drop cached views of products a write in this request touched (``supplier_id`` None: any supplier's)."""
+
+    if supplier_id is None:
+        dashboard.cache.clear()
+    else:
+        dashboard.cache.invalidate(supplier_id)
+    pin_reads_to_primary()
+    stock.compactor.compact_if_due(get_db)
+
+
 def customer_login_required(view_func):
     @wraps(view_func)
     def wrapped_view(*args, **kwargs):
@@ -389,6 +763,30 @@ def customer_login_required(view_func):
     return wrapped_view
 
 
+def api_customer_required(view_func):
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        if not session.get('customer_user'):
+            return jsonify({'error': 'Authentication required.'}), 401
+        return view_func(*args, **kwargs)
+
+    return wrapped_view
+
+
+def api_feed_required(view_func):
+    """Downstream systems with a ``CHANGES_API_KEYS`` bearer key, or a signed-in admin: the feed carries customers' orders."""
+
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+        authorised = scheme.lower() == 'bearer' and any(hmac.compare_digest(key.strip(), known) for known in CHANGES_API_KEYS)
+        if not authorised and not (session.get('supplier_user') or {}).get('admin'):
+            return jsonify({'error': 'Authentication required.'}), 401
+        return view_func(*args, **kwargs)
+
+    return wrapped_view
+
+
 def resolve_next(default_endpoint):
     next_target = request.args.get('next') or request.form.get('next')
     if next_target:
@@ -400,86 +798,139 @@ def resolve_next(default_endpoint):
     return url_for(default_endpoint)
 
 
+def decorate_product(product_dict):
+    if product_dict.get('PhotoPaths'):
+        try:
+            product_dict['photo_list'] = json.loads(product_dict['PhotoPaths'])
+        except json.JSONDecodeError:
+            product_dict['photo_list'] = []
+    else:
+        product_dict['photo_list'] = []
+    if product_dict.get('SalePrice') and product_dict['SalePrice'] < product_dict['SellingPrice']:
+        product_dict['discount'] = round(((product_dict['SellingPrice'] - product_dict['SalePrice']) / product_dict['SellingPrice']) * 100, 2)
+        product_dict['display_price'] = product_dict['SalePrice']
+    else:
+        product_dict['discount'] = 0.0
+        product_dict['display_price'] = product_dict['SellingPrice']
+    return product_dict
+
+
+def _load_catalog():
+    conn = get_db(readonly=True)
+    try:
+        products = [decorate_product(product) for product in repository.list_products(conn, repository.API_PRODUCT_COLUMNS)]
+    finally:
+        conn.close()
+    return {'products': products, 'by_id': {str(product['Id']).lower(): product for product in products}}
+
+
+# Storefront and product pages keep serving the last good catalogue while the database is down
+catalog_snapshot = resilience.StaleWhileRevalidate(
+    'catalog',
+    _load_catalog,
+    dialect.Error,
+    fresh_seconds=float(os.getenv('CATALOG_FRESH_SECONDS', '10')),
+    retry_max_seconds=float(os.getenv('CATALOG_RETRY_MAX_SECONDS', '30')),
+)
+
+
+def fetch_catalog():
+    """The catalogue from the snapshot (shared, do not modify); reloaded first for a session that just wrote."""
+
+    return catalog_snapshot.get(refresh=reads_pinned_to_primary())['products']
+
+
+# Key under which the ASGI front end (asgi.py) hands pre-loaded query results to a view
+PREFETCH_ENVIRON_KEY = 'vvstore.prefetched'
+
+
+def prefetched(name, loader, *args):
+    """Return data the async front end already loaded for this request, or load it now."""
+
+    results = request.environ.get(PREFETCH_ENVIRON_KEY) or {}
+    if name in results:
+        result = results[name]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return loader(*args)
+
+
 def fetch_product(product_id):
-    conn = get_db()
-    cursor = conn.cursor()
+    """A product from the catalogue snapshot, or from the database if it is newer or this session just wrote."""
+
+    if not reads_pinned_to_primary():
+        product = catalog_snapshot.get()['by_id'].get(str(product_id).lower())
+        if product is not None:
+            return product
+    conn = get_db(readonly=True)
     try:
-        cursor.execute("SELECT * FROM vanshul_Products WHERE Id = ?", (product_id,))
-        row = cursor.fetchone()
-        if not row:
-            return None
-        columns = [column[0] for column in cursor.description]
-        product_dict = dict(zip(columns, row))
-        if product_dict.get('PhotoPaths'):
-            try:
-                product_dict['photo_list'] = json.loads(product_dict['PhotoPaths'])
-            except json.JSONDecodeError:
-                product_dict['photo_list'] = []
-        else:
-            product_dict['photo_list'] = []
-        if product_dict.get('SalePrice') and product_dict['SalePrice'] < product_dict['SellingPrice']:
-            product_dict['display_price'] = product_dict['SalePrice']
-        else:
-            product_dict['display_price'] = product_dict['SellingPrice']
-        return product_dict
+        product = repository.get_product(conn, product_id)
+        return decorate_product(product) if product else None
     finally:
-        cursor.close()
         conn.close()
 
 
-def create_order_records(order_items, customer_email=None, status='Completed'):
-    if not order_items:
-        raise ValueError('No order items provided')
+def add_product_to_cart(cart, product_id, product, quantity):
+    """Add ``quantity`` of ``product`` to ``cart``; raise ValueError if stock is short."""
 
-    conn = get_db()
-    cursor = conn.cursor()
+    if product['Quantity'] < quantity:
+        metrics.CART_OPERATIONS.labels('add', 'rejected').inc()
+        raise ValueError('Requested quantity exceeds available stock.')
+
+    if product_id in cart:
+        new_quantity = cart[product_id]['quantity'] + quantity
+        if new_quantity > product['Quantity']:
+            metrics.CART_OPERATIONS.labels('add', 'rejected').inc()
+            raise ValueError('Cannot add more than available stock to the cart.')
+        cart[product_id]['quantity'] = new_quantity
+    else:
+        cart[product_id] = {
+            'product_id': product_id,
+            'name': product['ItemName'],
+            'unit_price': float(product['display_price']),
+            'quantity': quantity,
+            'photo': product['photo_list'][0] if product['photo_list'] else None,
+        }
+    metrics.CART_OPERATIONS.labels('add', 'ok').inc()
+    return cart
+
+
+def cart_order_items(cart):
+    return [
+        {
+            'product_id': item['product_id'],
+            'name': item['name'],
+            'quantity': item['quantity'],
+            'unit_price': item['unit_price'],
+        }
+        for item in cart.values()
+    ]
+
+
+def create_order_records(order_items, customer_email=None, status='Completed'):
+    started = time.perf_counter()
+    outcome = 'failed'
     try:
-        order_id = str(uuid.uuid4())
-        order_number = f"VV-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
-        total_amount = sum(item['quantity'] * item['unit_price'] for item in order_items)
-
-        cursor.execute(
-            """
-            INSERT INTO vanshul_Orders (Id, OrderNumber, CustomerEmail, Status, TotalAmount)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (order_id, order_number, customer_email, status, total_amount),
-        )
+        result = _write_order_records(order_items, customer_email, status)
+        outcome = 'placed'
+        pin_reads_to_primary()
+        stock.compactor.compact_if_due(get_db)
+        return result
+    except ValueError:
+        # Empty order or insufficient stock
+        outcome = 'rejected'
+        raise
+    finally:
+        metrics.CHECKOUTS.labels(outcome).inc()
+        metrics.CHECKOUT_LATENCY.observe(time.perf_counter() - started)
 
-        for item in order_items:
-            cursor.execute(
-                """
-                UPDATE vanshul_Products
-                SET Quantity = Quantity - ?
-                WHERE Id = ? AND Quantity >= ?
-                """,
-                (item['quantity'], item['product_id'], item['quantity']),
-            )
-            if cursor.rowcount == 0:
-                raise ValueError(f"Insufficient inventory for {item['name']}")
-
-            cursor.execute(
-                """
-                INSERT INTO vanshul_OrderItems (OrderItemId, OrderId, ProductId, Quantity, UnitPrice, LineTotal)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    str(uuid.uuid4()),
-                    order_id,
-                    item['product_id'],
-                    item['quantity'],
-                    item['unit_price'],
-                    item['quantity'] * item['unit_price'],
-                ),
-            )
 
-        conn.commit()
-        return order_number, total_amount
-    except Exception as exc:
-        conn.rollback()
-        raise exc
+def _write_order_records(order_items, customer_email, status):
+    conn = get_db()
+    try:
+        return repository.create_order(conn, order_items, customer_email, status)
     finally:
-        cursor.close()
         conn.close()
 
 @app.route('/')
@@ -487,93 +938,275 @@ def create_order_records(order_items, customer_email=None, status='Completed'):
 @supplier_login_required
 def index():
     search_query = request.args.get('search', '').strip()
+    supplier_id = supplier_scope()
+    admin = session['supplier_user'].get('admin')
     try:
-        conn = get_db()
-        cursor = conn.cursor()
         if search_query:
-            like_query = f"%{search_query}%"
-            cursor.execute(
-                """
-                SELECT * FROM vanshul_Products
-                WHERE ItemName LIKE ? OR Category LIKE ? OR Supplier LIKE ?
-                """,
-                (like_query, like_query, like_query),
-            )
+            view = _load_dashboard(supplier_id, search_query)
         else:
-            cursor.execute("SELECT * FROM vanshul_Products")
-        products = cursor.fetchall()
-        products_dict = [map_row(cursor, row) for row in products]
-
-        total_quantity = sum(row.get('Quantity', 0) or 0 for row in products_dict)
-        total_inventory_value = sum((row.get('Quantity', 0) or 0) * (row.get('PurchasePrice') or 0) for row in products_dict)
-        potential_revenue = sum((row.get('Quantity', 0) or 0) * (row.get('SellingPrice') or 0) for row in products_dict)
-        margins = [row.get('ProfitMargin') for row in products_dict if row.get('ProfitMargin') is not None]
-        avg_margin = round(sum(margins) / len(margins), 2) if margins else 0.0
-
-        low_stock_items = []
-        category_distribution = defaultdict(int)
-        for row in products_dict:
-            qty = row.get('Quantity') or 0
-            initial_qty = row.get('InitialQuantity') or qty
-            if initial_qty <= 0:
-                stock_ratio = 1
-            else:
-                stock_ratio = qty / initial_qty
-            row['InitialQuantity'] = initial_qty
-            row['stock_ratio'] = stock_ratio
-            row['is_low_stock'] = initial_qty > 0 and stock_ratio <= 0.4
-            if row['is_low_stock']:
-                low_stock_items.append(row)
-            category_distribution[(row.get('Category') or 'Uncategorised').strip() or 'Uncategorised'] += qty
-
-        analytics = {
-            'total_inventory_value': total_inventory_value,
-            'potential_revenue': potential_revenue,
-            'average_margin': avg_margin,
-            'low_stock_count': len(low_stock_items),
-            'category_distribution': sorted(category_distribution.items(), key=lambda item: item[1], reverse=True),
-            'search_query': search_query,
-        }
-
-        logger.info(f"Retrieved {len(products_dict)} products from database")
-        cursor.close()
-        conn.close()
+            view = dashboard.cache.get(supplier_id, lambda: _load_dashboard(supplier_id), refresh=reads_pinned_to_primary())
+        suppliers = _load_supplier_choices() if admin else []
+        hot_logger.info("Retrieved %d products for supplier %s", len(view['inventory']), supplier_id or '(all)')
         return render_template(
             'index.html',
-            inventory=products_dict,
-            total_quantity=total_quantity,
-            analytics=analytics,
-            low_stock_items=low_stock_items,
+            inventory=view['inventory'],
+            total_quantity=view['total_quantity'],
+            analytics={**view['analytics'], 'search_query': search_query},
+            low_stock_items=view['low_stock_items'],
+            suppliers=suppliers,
+            selected_supplier=supplier_id,
             active_page='dashboard',
         )
-    except pyodbc.Error as e:
-        logger.error(f"Error in index route: {e}")
+    except dialect.Error as e:
+        logger.error("Error in index route: %s", e)
         flash(f"Error loading inventory: {e}", 'danger')
         return render_template(
             'index.html',
             inventory=[],
             total_quantity=0,
-            analytics={'total_inventory_value': 0, 'potential_revenue': 0, 'average_margin': 0, 'low_stock_count': 0, 'category_distribution': [], 'search_query': search_query},
+            analytics={**dashboard.EMPTY_ANALYTICS, 'search_query': search_query},
             low_stock_items=[],
+            suppliers=[],
+            selected_supplier=supplier_id,
             active_page='dashboard',
         )
 
+
+def _load_dashboard(supplier_id, search_query=None):
+    conn = get_db(readonly=True)
+    try:
+        return dashboard.load(conn, supplier_id, search_query)
+    finally:
+        conn.close()
+
+
+def _load_supplier_choices():
+    conn = get_db(readonly=True)
+    try:
+        return [{'id': str(supplier['Id']), 'name': supplier['Name']} for supplier in repository.list_suppliers(conn)]
+    finally:
+        conn.close()
+
+
+@app.route('/reorder')
+@supplier_login_required
+def reorder():
+    supplier_id = supplier_scope()
+    admin = session['supplier_user'].get('admin')
+    show_all = request.args.get('show') == 'all'
+    try:
+        conn = get_db(readonly=True)
+        try:
+            products = repository.list_products(conn, forecasting.PRODUCT_COLUMNS, supplier_id=supplier_id)
+            now = repository.database_now(conn)
+        finally:
+            conn.close()
+        daily = forecasting.history.daily(lambda: get_db(readonly=True))
+        suggestions = forecasting.forecast(products, daily, now)
+        suppliers = _load_supplier_choices() if admin else []
+    except dialect.Error as e:
+        logger.error("Error in reorder route: %s", e)
+        flash(f"Error loading reorder suggestions: {e}", 'danger')
+        suggestions, suppliers = [], []
+    due = [product for product in suggestions if product['needs_reorder']]
+    return render_template(
+        'reorder.html',
+        suggestions=suggestions if show_all else due,
+        due_count=len(due),
+        product_count=len(suggestions),
+        show_all=show_all,
+        suppliers=suppliers,
+        selected_supplier=supplier_id,
+        lead_time_days=forecasting.LEAD_TIME_DAYS,
+        review_days=forecasting.REVIEW_DAYS,
+        history_days=forecasting.HISTORY_DAYS,
+        active_page='reorder',
+    )
+
+
+REPORT_PERIOD_FORMATS = {'hour': '%H:00', 'day': '%d %b', 'month': '%b %Y'}
+REPORT_BREAKDOWNS = {'product': 'Product', 'category': 'Category', 'supplier': 'Supplier'}
+
+
+def _report_options():
+    """``(supplier_id, range_key, by)`` for a sales report, from the session and query string."""
+
+    supplier_id = supplier_scope()
+    range_key = request.args.get('range')
+    if range_key not in rollups.RANGES:
+        range_key = '30d'
+    by = request.args.get('by')
+    if by not in REPORT_BREAKDOWNS or (by == 'supplier' and not session['supplier_user'].get('admin')):
+        by = 'product'
+    return supplier_id, range_key, by
+
+
+def _report_amounts(row):
+    revenue = float(row['Revenue'] or 0)
+    margin = revenue - float(row['Cost'] or 0)
+    return {
+        'units': int(row['Units'] or 0),
+        'revenue': revenue,
+        'margin': margin,
+        'margin_pct': round(margin / revenue * 100, 1) if revenue else 0.0,
+    }
+
+
+@app.route('/reports')
+@supplier_login_required
+def reports():
+    supplier_id, range_key, by = _report_options()
+    admin = session['supplier_user'].get('admin')
+    rollups.refresher.refresh_if_due(get_db)
+    series, breakdown, updated_through, shown = [], [], None, []
+    try:
+        conn = get_db(readonly=True)
+        try:
+            # Periods by the database's clock, which stamps the orders
+            grain, start, end = rollups.window(range_key, repository.database_now(conn))
+            shown = rollups.periods(grain, start, end)
+            totals = {
+                rollups.to_datetime(row['PeriodStart']): row
+                for row in repository.rollup_series(conn, grain, start, end, supplier_id)
+            }
+            breakdown = [
+                {'name': row['Name'] or 'Uncategorised', **_report_amounts(row)}
+                for row in repository.rollup_breakdown(conn, grain, start, end, by, supplier_id)
+            ]
+            updated_through = repository.job_watermark(conn, rollups.WATERMARK)
+        finally:
+            conn.close()
+        suppliers = _load_supplier_choices() if admin else []
+    except dialect.Error as e:
+        logger.error("Error in reports route: %s", e)
+        flash(f"Error loading sales reports: {e}", 'danger')
+        totals, suppliers = {}, []
+    empty = {'Units': 0, 'Revenue': 0, 'Cost': 0}
+    grain = rollups.RANGES[range_key][0]
+    for period in shown:
+        series.append({'label': period.strftime(REPORT_PERIOD_FORMATS[grain]), **_report_amounts(totals.get(period, empty))})
+    summary = _report_amounts({key: sum(float(row[key] or 0) for row in totals.values()) for key in ('Units', 'Revenue', 'Cost')})
+    peak = max((row['revenue'] for row in series), default=0)
+    return render_template(
+        'reports.html',
+        series=series,
+        peak=peak,
+        breakdown=breakdown,
+        summary=summary,
+        ranges=rollups.RANGES,
+        range_key=range_key,
+        breakdowns={key: label for key, label in REPORT_BREAKDOWNS.items() if admin or key != 'supplier'},
+        by=by,
+        suppliers=suppliers,
+        selected_supplier=supplier_id,
+        updated_through=updated_through,
+        active_page='reports',
+    )
+
+
+@app.route('/reports.csv')
+@supplier_login_required
+def reports_csv():
+    """Stream the report's rows, one per period and product, category or supplier, as CSV."""
+
+    supplier_id, range_key, by = _report_options()
+    rollups.refresher.refresh_if_due(get_db)
+    try:
+        conn = get_db(readonly=True)
+        grain, start, end = rollups.window(range_key, repository.database_now(conn))
+        cursor = repository.open_rollup_export(conn, grain, start, end, by, supplier_id)
+    except dialect.Error as e:
+        if 'conn' in locals():
+            conn.close()
+        logger.error("Error in reports export: %s", e)
+        flash(f"Error exporting sales report: {e}", 'danger')
+        return redirect(url_for('reports', range=range_key, by=by))
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Period', REPORT_BREAKDOWNS[by], 'Units', 'Revenue', 'Cost', 'Margin'])
+        while True:
+            rows = cursor.fetchmany(API_EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            for period, name, units, revenue, cost in rows:
+                revenue, cost = float(revenue or 0), float(cost or 0)
+                writer.writerow([
+                    rollups.to_datetime(period).isoformat(' '), name or 'Uncategorised', int(units or 0),
+                    f"{revenue:.2f}", f"{cost:.2f}", f"{revenue - cost:.2f}",
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def close_connection():
+        cursor.close()
+        conn.close()
+
+    filename = f"sales-{range_key}-by-{by}.csv"
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+    response.call_on_close(close_connection)
+    return response
+
+
+@app.route('/export')
+@supplier_login_required
+def export():
+    """Stream the dashboard's products, or their order lines, as CSV, XLSX or Parquet, filtered like ``index()``."""
+
+    dataset = request.args.get('dataset', 'products')
+    fmt = request.args.get('format', 'csv')
+    search_query = request.args.get('search', '').strip()
+    supplier_id = supplier_scope()
+    try:
+        since, until = (
+            datetime.strptime(request.args[key], '%Y-%m-%d') if request.args.get(key) else None for key in ('since', 'until')
+        )
+    except ValueError:
+        since = until = dataset = None
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        flash('Unknown export; choose products or orders as CSV, XLSX or Parquet (dates as YYYY-MM-DD).', 'danger')
+        return redirect(url_for('index', search=search_query or None))
+    try:
+        conn = get_db(readonly=True)
+        cursor = exports.open_export(conn, dataset, search_query, supplier_id, since, until)
+    except dialect.Error as e:
+        if 'conn' in locals():
+            conn.close()
+        logger.error("Error in export: %s", e)
+        flash(f"Error exporting {dataset}: {e}", 'danger')
+        return redirect(url_for('index', search=search_query or None))
+
+    def close_connection():
+        cursor.close()
+        conn.close()
+
+    response = Response(
+        stream_with_context(exports.stream(cursor, dataset, fmt)),
+        mimetype=exports.FORMATS[fmt].mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"'},
+    )
+    response.call_on_close(close_connection)
+    return response
+
+
 @app.route('/products')
 def products():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vanshul_Products")
-        products = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
-        products_dict = [dict(zip(columns, row)) for row in products]
+        conn = get_db(readonly=True)
+        products_dict = repository.list_products(conn)
         total_quantity = sum(row['Quantity'] for row in products_dict) if products_dict else 0
-        logger.info(f"Retrieved {len(products_dict)} products for client view")
-        cursor.close()
+        hot_logger.info("Retrieved %d products for client view", len(products_dict))
         conn.close()
         return render_template('products.html', inventory=products_dict, total_quantity=total_quantity)
-    except pyodbc.Error as e:
-        logger.error(f"Error in products route: {e}")
+    except dialect.Error as e:
+        logger.error("Error in products route: %s", e)
         flash(f"Error loading products: {e}", 'danger')
         return render_template('products.html', inventory=[], total_quantity=0)
 
@@ -585,6 +1218,7 @@ def upload():
             item_name = request.form['item_name']
             category = request.form.get('category', 'General')
             supplier = request.form.get('supplier', 'Unknown')
+            own_supplier = uploading_supplier()
             purchase_price = float(request.form['purchase_price'])
             sale_price = float(request.form['sale_price']) if request.form.get('sale_price') else None
             profit_margin = float(request.form.get('profit_margin', 20))
@@ -616,26 +1250,26 @@ def upload():
 
             conn = get_db()
             cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO vanshul_Products (ItemName, Category, Supplier, PurchasePrice, SalePrice, ProfitMargin, SellingPrice, Quantity, InitialQuantity, PhotoPaths)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    item_name,
-                    category,
-                    supplier,
-                    purchase_price,
-                    sale_price,
-                    profit_margin,
-                    selling_price,
-                    quantity,
-                    quantity,
-                    json.dumps(photo_paths) if photo_paths else None,
-                ),
+            repository.insert_product(
+                cursor,
+                {
+                    'ItemName': item_name,
+                    'Category': category,
+                    'Supplier': supplier,
+                    'PurchasePrice': purchase_price,
+                    'SalePrice': sale_price,
+                    'ProfitMargin': profit_margin,
+                    'SellingPrice': selling_price,
+                    'Quantity': quantity,
+                    'InitialQuantity': quantity,
+                    'PhotoPaths': json.dumps(photo_paths) if photo_paths else None,
+                    # A supplier account can only add to its own catalogue, whatever the form says
+                    **(own_supplier or {}),
+                },
             )
             conn.commit()
-            logger.info(f"Added product: {item_name} with {len(photo_paths)} photos")
+            products_changed(own_supplier and own_supplier['SupplierId'])
+            logger.info("Added product: %s with %d photos", item_name, len(photo_paths))
             flash(f'Product "{item_name}" added successfully with {len(photo_paths)} photos!', 'success')
             cursor.close()
             conn.close()
@@ -644,14 +1278,14 @@ def upload():
                 conn.rollback()
                 cursor.close()
                 conn.close()
-            logger.error(f"ValueError in upload: {e}")
+            logger.error("ValueError in upload: %s", e)
             flash(f'Invalid input data. Please check numbers: {str(e)}', 'danger')
-        except pyodbc.Error as e:
+        except dialect.Error as e:
             if 'conn' in locals():
                 conn.rollback()
                 cursor.close()
                 conn.close()
-            logger.error(f"Error in upload: {e}")
+            logger.error("Error in upload: %s", e)
             flash(f'Error adding product: {str(e)}', 'danger')
         return redirect(url_for('index'))
     return render_template('upload.html', active_page='upload')
@@ -667,49 +1301,53 @@ def bulk_upload():
         if file.filename == '':
             flash('No selected file', 'danger')
             return redirect(request.url)
-        if file and file.filename.endswith('.csv'):
+        if file and imports.accepts(file.filename):
+            started = time.perf_counter()
             conn = get_db()
             cursor = conn.cursor()
             try:
-                stream = file.stream
-                csv_reader = csv.DictReader(stream)
                 added_count = 0
-                for row in csv_reader:
-                    try:
-                        new_product = (
-                            row['item_name'],
-                            row.get('category', 'General'),
-                            row.get('supplier', 'Unknown'),
-                            float(row['purchase_price']),
-                            float(row.get('profit_margin', 20)),
-                            float(row['purchase_price']) * (1 + float(row.get('profit_margin', 20)) / 100),
-                            int(row['quantity']),
-                            int(row['quantity']),
-                            None,  # PhotoPaths
-                        )
-                        cursor.execute(
-                            """
-                            INSERT INTO vanshul_Products (ItemName, Category, Supplier, PurchasePrice, ProfitMargin, SellingPrice, Quantity, InitialQuantity, PhotoPaths)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            new_product,
-                        )
-                        added_count += 1
-                    except (KeyError, ValueError):
-                        flash('Invalid CSV format. Required: item_name, purchase_price, quantity', 'danger')
-                        continue
+                known_suppliers = {}
+                own_supplier = uploading_supplier()
+                with imports.open_rows(file) as rows:
+                    for row in rows:
+                        try:
+                            new_product = {
+                                'ItemName': row['item_name'],
+                                'Category': row.get('category', 'General'),
+                                'Supplier': row.get('supplier', 'Unknown'),
+                                'PurchasePrice': float(row['purchase_price']),
+                                'ProfitMargin': float(row.get('profit_margin', 20)),
+                                'SellingPrice': float(row['purchase_price']) * (1 + float(row.get('profit_margin', 20)) / 100),
+                                'Quantity': row['quantity'],
+                                'InitialQuantity': row['quantity'],
+                                'PhotoPaths': None,
+                                **(own_supplier or {}),
+                            }
+                            repository.insert_product(cursor, new_product, known_suppliers)
+                            added_count += 1
+                        except (KeyError, ValueError, TypeError):
+                            metrics.IMPORT_ROWS.labels('rejected').inc()
+                            flash('Invalid row. Required: item_name, purchase_price, quantity', 'danger')
+                            continue
                 conn.commit()
-                logger.info(f"Bulk uploaded {added_count} products")
+                products_changed(own_supplier and own_supplier['SupplierId'])
+                metrics.IMPORT_ROWS.labels('imported').inc(added_count)
+                metrics.IMPORT_LATENCY.observe(time.perf_counter() - started)
+                logger.info("Bulk uploaded %d products from %s", added_count, file.filename)
                 flash(f'{added_count} products uploaded!', 'success')
-            except pyodbc.Error as e:
+            except imports.UploadError as e:
                 conn.rollback()
-                logger.error(f"Error in bulk upload: {e}")
+                flash(f'Could not import {file.filename}: {e}', 'danger')
+            except dialect.Error as e:
+                conn.rollback()
+                logger.error("Error in bulk upload: %s", e)
                 flash(f'Error uploading products: {str(e)}', 'danger')
             finally:
                 cursor.close()
                 conn.close()
         else:
-            flash('Please upload a valid CSV file', 'danger')
+            flash('Please upload a CSV or XLSX file', 'danger')
         return redirect(url_for('index'))
     return render_template('bulk_upload.html', active_page='bulk_upload')
 
@@ -726,16 +1364,23 @@ def supplier_login():
         password = request.form.get('password', '')
         if not identifier or not password:
             flash('Enter both username/email and password.', 'warning')
+        elif login_rate_limited(identifier):
+            flash('Too many sign-in attempts. Please wait a minute and try again.', 'warning')
+            return render_template('supplier_login.html', next=next_url), 429
         else:
             account = fetch_supplier_account(identifier)
-            stored_password = None
-            if account:
-                stored_password = (
-                    account.get('PasswordHash')
-                    or account.get('Password')
-                    or account.get('password')
-                )
-            if account and verify_password(stored_password, password):
+            try:
+                authenticated = bool(account) and check_login_password(account, password)
+            except security.VerifierBusy:
+                flash('Sign-in is busy right now. Please try again in a moment.', 'warning')
+                return render_template('supplier_login.html', next=next_url), 503
+            if authenticated:
+                email = account.get('Email') or account.get('Username') or identifier
+                scope = supplier_account_scope(account, email)
+                if not scope['admin'] and not scope['supplier_id']:
+                    logger.warning("Supplier sign-in refused for %s: account is not linked to a supplier", email)
+                    flash('Your account is not linked to a supplier yet. Please ask an administrator to link it.', 'warning')
+                    return render_template('supplier_login.html', next=next_url), 403
                 session['supplier_user'] = {
                     'id': account.get('Id'),
                     'name': account.get('FullName')
@@ -744,15 +1389,57 @@ def supplier_login():
                     or account.get('Email')
                     or account.get('Username')
                     or identifier,
-                    'email': account.get('Email') or account.get('Username') or identifier,
+                    'email': email,
+                    **scope,
                 }
+                record_login_success(identifier)
                 flash('Welcome back to the supplier dashboard.', 'success')
                 return redirect(next_url)
+            record_login_failure(identifier)
             flash('Invalid supplier credentials. Please try again.', 'danger')
 
     return render_template('supplier_login.html', next=next_url)
 
 
+@app.route('/admin/profile')
+@supplier_login_required
+def admin_profile():
+    """Sample this worker's threads, e.g. /admin/profile?seconds=10&format=svg."""
+
+    seconds = request.args.get('seconds', 10.0, type=float)
+    interval_ms = request.args.get('interval_ms', 5.0, type=float)
+    output = request.args.get('format', 'collapsed')
+    if not seconds or seconds <= 0 or not interval_ms or interval_ms <= 0 or output not in ('collapsed', 'svg'):
+        return Response('Expected seconds > 0, interval_ms > 0 and format=collapsed|svg\n', 400, mimetype='text/plain')
+
+    try:
+        result = profiling.sample(seconds, interval_ms / 1000.0, include_idle=request.args.get('idle') == '1')
+    except profiling.ProfilerBusy:
+        return Response('A profile is already running in this worker\n', 409, mimetype='text/plain')
+    logger.info("Sampled %d stacks over %.1fs for %s", sum(result.stacks.values()), result.seconds, session['supplier_user'].get('email'))
+
+    headers = {'X-Profiled-Pid': str(os.getpid()), 'Cache-Control': 'no-store'}
+    if output == 'svg':
+        return Response(result.flame_graph_svg(), mimetype='image/svg+xml', headers=headers)
+    return Response(result.collapsed(), mimetype='text/plain', headers=headers)
+
+
+@app.route('/admin/profile/requests/<profile_id>')
+@supplier_login_required
+def admin_request_profile(profile_id):
+    """A saved ``X-Profile`` request profile as a pstats report, or the raw file with ?format=prof."""
+
+    path = profiling.request_profile_path(profile_id)
+    if path is None:
+        return Response('Unknown profile id\n', 404, mimetype='text/plain')
+    if request.args.get('format') == 'prof':
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=f'{profile_id}.prof')
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in profiling.REPORT_SORT_KEYS:
+        sort = 'cumulative'
+    return Response(profiling.request_profile_report(profile_id, sort=sort), mimetype='text/plain')
+
+
 @app.route('/supplier/logout')
 def supplier_logout():
     session.pop('supplier_user', None)
@@ -799,16 +1486,26 @@ def customer_login():
         password = request.form.get('password', '')
         if not email or not password:
             flash('Enter both email and password.', 'warning')
+        elif login_rate_limited(email):
+            flash('Too many sign-in attempts. Please wait a minute and try again.', 'warning')
+            return render_template('customer_login.html', next=next_url), 429
         else:
             account = fetch_customer_account(email)
-            if account and verify_password(account.get('PasswordHash'), password):
+            try:
+                authenticated = bool(account) and check_login_password(account, password)
+            except security.VerifierBusy:
+                flash('Sign-in is busy right now. Please try again in a moment.', 'warning')
+                return render_template('customer_login.html', next=next_url), 503
+            if authenticated:
                 session['customer_user'] = {
                     'id': account.get('Id'),
                     'name': account.get('FullName'),
                     'email': account.get('Email'),
                 }
+                record_login_success(email)
                 flash('Welcome back to VVStore.', 'success')
                 return redirect(next_url)
+            record_login_failure(email)
             flash('Incorrect email or password.', 'danger')
 
     return render_template('customer_login.html', next=next_url)
@@ -824,33 +1521,13 @@ def customer_logout():
 @app.route('/storefront')
 def storefront():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vanshul_Products")
-        products = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
+        catalog = prefetched('catalog', fetch_catalog)
         search_query = request.args.get('q', '').strip()
         category_filter = request.args.get('category', '').strip()
 
         all_products = []
         category_map = defaultdict(list)
-        for row in products:
-            product = dict(zip(columns, row))
-            if product.get('PhotoPaths'):
-                try:
-                    product['photo_list'] = json.loads(product['PhotoPaths'])
-                except json.JSONDecodeError:
-                    product['photo_list'] = []
-            else:
-                product['photo_list'] = []
-
-            if product.get('SalePrice') and product['SalePrice'] < product['SellingPrice']:
-                product['discount'] = round(((product['SellingPrice'] - product['SalePrice']) / product['SellingPrice']) * 100, 2)
-                product['display_price'] = product['SalePrice']
-            else:
-                product['discount'] = 0.0
-                product['display_price'] = product['SellingPrice']
-
+        for product in catalog:
             product_category = (product.get('Category') or 'General').strip() or 'General'
             category_map[product_category].append(product)
             all_products.append(product)
@@ -886,9 +1563,6 @@ def storefront():
 
         spotlight_product = next((item for item in filtered_products if item.get('photo_list')), filtered_products[0] if filtered_products else None)
 
-        cursor.close()
-        conn.close()
-
         return render_template(
             'storefront.html',
             inventory=filtered_products,
@@ -899,8 +1573,8 @@ def storefront():
             category_filter=category_filter,
             active_page='storefront',
         )
-    except pyodbc.Error as e:
-        logger.error(f"Error in storefront route: {e}")
+    except dialect.Error as e:
+        logger.error("Error in storefront route: %s", e)
         flash(f"Error loading products: {e}", 'danger')
         return render_template(
             'storefront.html',
@@ -917,19 +1591,15 @@ def storefront():
 @app.route('/product/<id>')
 def product_detail(id):
     try:
-        product = fetch_product(id)
+        product = prefetched('product', fetch_product, id)
         if not product:
             flash('Product not found', 'danger')
             return redirect(url_for('storefront'))
-        if product.get('SalePrice') and product['SalePrice'] < product['SellingPrice']:
-            product['discount'] = round(((product['SellingPrice'] - product['SalePrice']) / product['SellingPrice']) * 100, 2)
-        else:
-            product['discount'] = 0.0
         cart_count, _ = build_cart_summary(get_cart())
-        logger.info(f"Retrieved product ID: {id}")
+        hot_logger.info("Retrieved product ID: %s", id)
         return render_template('product_detail.html', item=product, cart_count=cart_count)
-    except pyodbc.Error as e:
-        logger.error(f"Error in product detail route: {e}")
+    except dialect.Error as e:
+        logger.error("Error in product detail route: %s", e)
         flash(f"Error loading product: {e}", 'danger')
         return redirect(url_for('storefront'))
 
@@ -949,29 +1619,16 @@ def add_to_cart(product_id):
         flash('Unable to find that product.', 'danger')
         return redirect(request.referrer or url_for('storefront'))
 
-    if product['Quantity'] < quantity:
-        flash('Requested quantity exceeds available stock.', 'warning')
-        return redirect(request.referrer or url_for('storefront'))
-
     cart = get_cart()
-    if product_id in cart:
-        new_quantity = cart[product_id]['quantity'] + quantity
-        if new_quantity > product['Quantity']:
-            flash('Cannot add more than available stock to the cart.', 'warning')
-            return redirect(request.referrer or url_for('storefront'))
-        cart[product_id]['quantity'] = new_quantity
-    else:
-        cart[product_id] = {
-            'product_id': product_id,
-            'name': product['ItemName'],
-            'unit_price': float(product['display_price']),
-            'quantity': quantity,
-            'photo': product['photo_list'][0] if product['photo_list'] else None,
-        }
+    try:
+        add_product_to_cart(cart, product_id, product, quantity)
+    except ValueError as exc:
+        flash(str(exc), 'warning')
+        return redirect(request.referrer or url_for('storefront'))
     save_cart(cart)
     total_items, _ = build_cart_summary(cart)
     flash(f"Added {product['ItemName']} to the cart.", 'success')
-    logger.info(f"Cart updated: {total_items} items total")
+    hot_logger.info("Cart updated: %d items total", total_items)
     return redirect(request.referrer or url_for('storefront'))
 
 
@@ -992,15 +1649,18 @@ def update_cart(product_id):
 
     if quantity <= 0:
         cart.pop(product_id, None)
+        metrics.CART_OPERATIONS.labels('remove', 'ok').inc()
     else:
         product = fetch_product(product_id)
         if not product:
             flash('Product not found for update.', 'danger')
             return redirect(url_for('view_cart'))
         if product['Quantity'] < quantity:
+            metrics.CART_OPERATIONS.labels('update', 'rejected').inc()
             flash('Requested quantity exceeds available stock.', 'warning')
             return redirect(url_for('view_cart'))
         cart[product_id]['quantity'] = quantity
+        metrics.CART_OPERATIONS.labels('update', 'ok').inc()
 
     save_cart(cart)
     flash('Cart updated successfully.', 'success')
@@ -1014,6 +1674,7 @@ def remove_from_cart(product_id):
     if product_id in cart:
         removed_item = cart.pop(product_id)
         save_cart(cart)
+        metrics.CART_OPERATIONS.labels('remove', 'ok').inc()
         flash(f"Removed {removed_item['name']} from the cart.", 'info')
     else:
         flash('Item not found in cart.', 'warning')
@@ -1042,15 +1703,7 @@ def checkout():
         return redirect(url_for('view_cart'))
 
     customer_email = request.form.get('email') or None
-    order_items = [
-        {
-            'product_id': item['product_id'],
-            'name': item['name'],
-            'quantity': item['quantity'],
-            'unit_price': item['unit_price'],
-        }
-        for item in cart.values()
-    ]
+    order_items = cart_order_items(cart)
 
     try:
         order_number, total_amount = create_order_records(order_items, customer_email)
@@ -1061,7 +1714,7 @@ def checkout():
         flash(str(exc), 'danger')
         return redirect(url_for('view_cart'))
     except Exception as exc:
-        logger.error(f'Checkout failed: {exc}')
+        logger.error('Checkout failed: %s', exc)
         flash('We were unable to complete your order. Please try again.', 'danger')
         return redirect(url_for('view_cart'))
 
@@ -1100,9 +1753,374 @@ def buy_now(product_id):
     except ValueError as exc:
         flash(str(exc), 'danger')
     except Exception as exc:
-        logger.error(f'Buy now failed: {exc}')
+        logger.error('Buy now failed: %s', exc)
         flash('We were unable to process your purchase.', 'danger')
     return redirect(url_for('storefront'))
 
+
+# JSON API (v1)
+API_PRODUCT_FIELDS = (
+    'Id',
+    'ItemName',
+    'Category',
+    'Supplier',
+    'SellingPrice',
+    'SalePrice',
+    'display_price',
+    'discount',
+    'Quantity',
+    'photo_list',
+    'CreatedAt',
+)
+API_DEFAULT_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_EXPORT_BATCH_SIZE = 500
+API_GZIP_MIN_SIZE = 1024
+# Bearer keys for downstream systems reading the change feed, comma-separated
+CHANGES_API_KEYS = [key.strip() for key in os.getenv('CHANGES_API_KEYS', '').split(',') if key.strip()]
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def handle_api_error(exc):
+    return jsonify({'error': str(exc)}), exc.status
+
+
+def _api_db_error(exc):
+    logger.error("Database error in API route %s: %s", request.path, exc)
+    return ApiError('The catalogue is temporarily unavailable. Please retry shortly.', 503)
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def serialize_product(product, fields=API_PRODUCT_FIELDS):
+    return {field: _json_value(product.get(field)) for field in fields}
+
+
+def _encode_cursor(*values):
+    raw = json.dumps([_json_value(value) for value in values]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ApiError('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != size:
+        raise ApiError('Invalid cursor.')
+    return values
+
+
+def _api_page_size():
+    try:
+        limit = int(request.args.get('limit', API_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit must be an integer.')
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+
+def _api_requested_fields():
+    raw_fields = request.args.get('fields', '').strip()
+    if not raw_fields:
+        return API_PRODUCT_FIELDS
+    fields = tuple(field.strip() for field in raw_fields.split(',') if field.strip())
+    unknown = [field for field in fields if field not in API_PRODUCT_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _api_product_filters():
+    """Translate the storefront ``q``/``category`` parameters into SQL predicates."""
+
+    return repository.product_filters(request.args.get('q', '').strip(), request.args.get('category', '').strip())
+
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.after_request
+def compress_api_response(response):
+    if (
+        not request.path.startswith('/api/')
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not _accepts_gzip()
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < API_GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.route('/api/v1/products')
+def api_products():
+    fields = _api_requested_fields()
+    limit = _api_page_size()
+    clauses, params = _api_product_filters()
+    last_id = None
+    cursor_token = request.args.get('cursor')
+    if cursor_token:
+        (last_id,) = _decode_cursor(cursor_token, 1)
+        if not _is_uuid(last_id):
+            raise ApiError('Invalid cursor.')
+
+    try:
+        conn = get_db(readonly=True)
+        try:
+            page, has_more = repository.page_products(conn, clauses, params, limit, after_id=last_id)
+        finally:
+            conn.close()
+    except dialect.Error as e:
+        raise _api_db_error(e)
+
+    products = [decorate_product(product) for product in page]
+    next_cursor = _encode_cursor(products[-1]['Id']) if has_more else None
+    return jsonify({
+        'data': [serialize_product(product, fields) for product in products],
+        'next_cursor': next_cursor,
+    })
+
+
+@app.route('/api/v1/products/export')
+def api_products_export():
+    """Stream the (optionally filtered) catalogue as NDJSON, one product per line."""
+
+    fields = _api_requested_fields()
+    clauses, params = _api_product_filters()
+    try:
+        conn = get_db(readonly=True)
+        cursor = repository.open_product_export(conn, clauses, params)
+    except dialect.Error as e:
+        if 'conn' in locals():
+            conn.close()
+        raise _api_db_error(e)
+    columns = [column[0] for column in cursor.description]
+
+    def generate():
+        while True:
+            rows = cursor.fetchmany(API_EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield ''.join(
+                json.dumps(serialize_product(decorate_product(dict(zip(columns, row))), fields), separators=(',', ':')) + '\n'
+                for row in rows
+            )
+
+    def close_connection():
+        cursor.close()
+        conn.close()
+
+    body = generate()
+    headers = {}
+    if _accepts_gzip():
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    response = Response(stream_with_context(body), mimetype='application/x-ndjson', headers=headers)
+    response.call_on_close(close_connection)
+    return response
+
+
+@app.route('/api/v1/products/<product_id>')
+def api_product_detail(product_id):
+    fields = _api_requested_fields()
+    if not _is_uuid(product_id):
+        raise ApiError('Product not found.', 404)
+    try:
+        product = fetch_product(product_id)
+    except dialect.Error as e:
+        raise _api_db_error(e)
+    if not product:
+        raise ApiError('Product not found.', 404)
+    return jsonify({'data': serialize_product(product, fields)})
+
+
+def _api_cart_payload(cart):
+    total_items, total_amount = build_cart_summary(cart)
+    return {
+        'items': list(cart.values()),
+        'total_items': total_items,
+        'total_amount': round(total_amount, 2),
+    }
+
+
+@app.route('/api/v1/changes')
+@api_feed_required
+def api_changes():
+    """Inventory events after ``since`` (a previous page's ``next_cursor``; omitted: from the first), oldest first."""
+
+    limit = _api_page_size()
+    after = 0
+    since = request.args.get('since')
+    if since:
+        (after,) = _decode_cursor(since, 1)
+        if not isinstance(after, int) or after < 0:
+            raise ApiError('Invalid cursor.')
+
+    try:
+        # The primary: a replica may already have an event whose predecessor it has yet to receive
+        conn = get_db()
+        try:
+            events = outbox.settled_events(conn, after, limit + 1)
+        finally:
+            conn.close()
+    except dialect.Error as e:
+        raise _api_db_error(e)
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    return jsonify({
+        'data': [outbox.event_document(event) for event in events],
+        # Always set: poll with it for whatever happens next
+        'next_cursor': _encode_cursor(events[-1]['Seq'] if events else after),
+        'has_more': has_more,
+    })
+
+
+@app.route('/api/v1/cart', methods=['GET'])
+@api_customer_required
+def api_cart():
+    return jsonify({'data': _api_cart_payload(get_cart())})
+
+
+@app.route('/api/v1/cart', methods=['POST'])
+@api_customer_required
+def api_add_to_cart():
+    payload = request.get_json(silent=True) or {}
+    product_id = str(payload.get('product_id') or '').strip()
+    try:
+        quantity = int(payload.get('quantity', 1))
+    except (TypeError, ValueError):
+        raise ApiError('Invalid quantity supplied.')
+    if quantity < 1:
+        raise ApiError('Invalid quantity supplied.')
+    if not _is_uuid(product_id):
+        raise ApiError('Unable to find that product.', 404)
+
+    try:
+        product = fetch_product(product_id)
+    except dialect.Error as e:
+        raise _api_db_error(e)
+    if not product:
+        raise ApiError('Unable to find that product.', 404)
+
+    cart = get_cart()
+    try:
+        add_product_to_cart(cart, product_id, product, quantity)
+    except ValueError as exc:
+        raise ApiError(str(exc), 409)
+    save_cart(cart)
+    return jsonify({'data': _api_cart_payload(cart)})
+
+
+@app.route('/api/v1/cart/<product_id>', methods=['DELETE'])
+@api_customer_required
+def api_remove_from_cart(product_id):
+    cart = get_cart()
+    if product_id not in cart:
+        raise ApiError('Item not found in cart.', 404)
+    cart.pop(product_id)
+    save_cart(cart)
+    metrics.CART_OPERATIONS.labels('remove', 'ok').inc()
+    return jsonify({'data': _api_cart_payload(cart)})
+
+
+@app.route('/api/v1/orders', methods=['GET'])
+@api_customer_required
+def api_orders():
+    customer_email = session['customer_user'].get('email')
+    limit = _api_page_size()
+    before = None
+    cursor_token = request.args.get('cursor')
+    if cursor_token:
+        created_at, last_id = _decode_cursor(cursor_token, 2)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise ApiError('Invalid cursor.')
+        if not _is_uuid(last_id):
+            raise ApiError('Invalid cursor.')
+        before = (created_at, last_id)
+
+    try:
+        conn = get_db(readonly=True)
+        try:
+            orders, has_more = repository.customer_orders(conn, customer_email, limit, before=before)
+        finally:
+            conn.close()
+    except dialect.Error as e:
+        raise _api_db_error(e)
+
+    next_cursor = _encode_cursor(orders[-1]['CreatedAt'], orders[-1]['Id']) if has_more else None
+    data = []
+    for order in orders:
+        payload = {key: _json_value(value) for key, value in order.items() if key != 'items'}
+        payload['items'] = [{key: _json_value(value) for key, value in item.items()} for item in order['items']]
+        data.append(payload)
+    return jsonify({'data': data, 'next_cursor': next_cursor})
+
+
+@app.route('/api/v1/orders', methods=['POST'])
+@api_customer_required
+def api_create_order():
+    cart = get_cart()
+    if not cart:
+        raise ApiError('Your cart is empty.', 409)
+
+    customer_email = session['customer_user'].get('email')
+    try:
+        order_number, total_amount = create_order_records(cart_order_items(cart), customer_email)
+    except ValueError as exc:
+        raise ApiError(str(exc), 409)
+    except dialect.Error as e:
+        raise _api_db_error(e)
+    session.pop('cart', None)
+    return jsonify({'data': {'order_number': order_number, 'total_amount': round(total_amount, 2)}}), 201
+
+
 if __name__ == '__main__':
-    app.run(debug=True)  # Start the Flask server
\ No newline at end of file
+    conn = get_db()
+    try:
+        migrate.migrate(conn, log=logger.info)
+    finally:
+        conn.close()
+    configure_app().run(debug=True)  # Development server; use wsgi.py/gunicorn.conf.py in production
\ No newline at end of file
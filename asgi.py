@@ -0,0 +1,185 @@
+"""ASGI front end for the inventory app.
+
+Serves the Flask app from an asyncio event loop so a single process can keep
+hundreds of storefront/product requests in flight. Blocking pyodbc work never
+runs on the loop: the catalogue and product lookups for ``/storefront`` and
+``/product/<id>`` are prefetched on a bounded DB thread pool and handed to the
+Flask view (see ``app.prefetched``), which then only renders on a small
+CPU-sized pool. Every other route runs unchanged on the DB pool.
+
+Run with any ASGI server, e.g.::
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+or under the production launcher with
+``GUNICORN_APP=asgi:application GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker``.
+
+Tuning:
+    ASYNC_DB_WORKERS      max concurrent blocking DB calls (default 64)
+    ASYNC_RENDER_WORKERS  threads rendering prefetched pages (default: CPU count)
+"""
+
+import asyncio
+import io
+import itertools
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from app import PREFETCH_ENVIRON_KEY, PREFETCH_TIMINGS_ENVIRON_KEY, configure_app, fetch_catalog, fetch_product, logger
+from app import app as flask_app
+
+_PRODUCT_PATH = re.compile(r'^/product/([^/]+)$')
+
+
+def prefetch_plan(method, path):
+    """Return ``(name, loader, args)`` for routes whose DB work can be lifted off the view."""
+
+    if method not in ('GET', 'HEAD'):
+        return None
+    if path == '/storefront':
+        return 'catalog', fetch_catalog, ()
+    match = _PRODUCT_PATH.match(path)
+    if match:
+        return 'product', fetch_product, (match.group(1),)
+    return None
+
+
+def _run_prefetch(loader, args, environ):
+    with instrumentation.collect() as timings:
+        try:
+            # Whether reads may use a replica or the catalogue snapshot depends on the session (read-your-writes)
+            with flask_app.request_context(environ):
+                result = loader(*args)
+        except Exception as exc:  # re-raised inside the view so its own error handling applies
+            result = exc
+    return result, timings
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = f'HTTP_{name}'
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            value = f'{environ[key]}{separator}{value}'
+        environ[key] = value
+    return environ
+
+
+class AsyncCatalogApp:
+    def __init__(self, wsgi_app, db_workers=None, render_workers=None):
+        self.wsgi_app = wsgi_app
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=db_workers or int(os.getenv('ASYNC_DB_WORKERS', '64')),
+            thread_name_prefix='asgi-db',
+        )
+        self.render_executor = ThreadPoolExecutor(
+            max_workers=render_workers or int(os.getenv('ASYNC_RENDER_WORKERS', str(os.cpu_count() or 4))),
+            thread_name_prefix='asgi-render',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, await self._read_body(receive))
+        executor = self.db_executor
+        plan = prefetch_plan(scope['method'], scope['path'])
+        if plan:
+            name, loader, args = plan
+            result, timings = await loop.run_in_executor(self.db_executor, _run_prefetch, loader, args, environ)
+            environ[PREFETCH_ENVIRON_KEY] = {name: result}
+            environ[PREFETCH_TIMINGS_ENVIRON_KEY] = timings
+            executor = self.render_executor
+
+        status, headers, iterator, iterable = await loop.run_in_executor(executor, self._start, environ)
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while True:
+                chunk = await loop.run_in_executor(executor, next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(executor, iterable.close)
+
+    def _start(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+            return lambda data: None
+
+        iterable = self.wsgi_app(environ, start_response)
+        iterator = iter(iterable)
+        # Generators only call start_response once the first chunk is pulled
+        if 'status' not in response:
+            first = next(iterator, None)
+            iterator = itertools.chain([first] if first is not None else [], iterator)
+        return response['status'], response['headers'], iterator, iterable
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info("ASGI front end started")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.db_executor.shutdown(wait=False)
+                self.render_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = AsyncCatalogApp(configure_app())
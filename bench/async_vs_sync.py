@@ -0,0 +1,155 @@
+"""Compare requests/sec of the sync ``app.run`` server against the ASGI front end.
+
+Both servers are started as subprocesses against the latency-injected SQLite
+stand-in (bench/standin.py) and driven with the same concurrent
+``/storefront`` + ``/product/<id>`` mix:
+
+    python -m bench.async_vs_sync --requests 2000 --concurrency 200 --latency-ms 50
+
+The ASGI run needs an ASGI server (``pip install uvicorn``).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import standin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start listening on port {port}')
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode('ascii'))
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    status_line = response.split(b'\r\n', 1)[0]
+    return int(status_line.split()[1]) if status_line else 0
+
+
+async def drive(port, paths, concurrency):
+    queue = list(paths)
+    latencies, failures = [], 0
+
+    async def worker():
+        nonlocal failures
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, path)
+            except OSError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'failures': failures,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def run_server(command, env, paths, concurrency):
+    port = free_port()
+    process = subprocess.Popen(
+        [arg.format(port=port) for arg in command],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, process)
+        asyncio.run(drive(port, paths[:concurrency], concurrency))  # warm-up
+        return asyncio.run(drive(port, paths, concurrency))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='injected per-statement DB latency')
+    parser.add_argument('--connect-latency-ms', type=float, default=20.0, help='injected per-connection latency')
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--db-workers', type=int, default=256, help='ASYNC_DB_WORKERS for the ASGI run')
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='vvstore-bench-'), 'standin.db')
+    product_ids = standin.seed_products(args.products, path=db_path)
+    rng = random.Random(42)
+    paths = [
+        '/storefront' if rng.random() < 0.3 else f'/product/{rng.choice(product_ids)}'
+        for _ in range(args.requests)
+    ]
+
+    env = dict(
+        os.environ,
+        DB_CONNECT_FACTORY='bench.standin:connect',
+        STANDIN_DB_PATH=db_path,
+        STANDIN_LATENCY_MS=str(args.latency_ms),
+        STANDIN_CONNECT_LATENCY_MS=str(args.connect_latency_ms),
+        ASYNC_DB_WORKERS=str(args.db_workers),
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+    )
+    servers = {
+        'sync (app.run)': [sys.executable, '-c', 'import app; app.app.run(port={port})'],
+        'asgi (uvicorn)': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}', '--log-level', 'warning'],
+    }
+
+    results = {}
+    for name, command in servers.items():
+        try:
+            results[name] = run_server(command, env, paths, args.concurrency)
+        except RuntimeError as exc:
+            results[name] = {'error': str(exc)}
+        print(f'{name:16} {results[name]}')
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as handle:
+            json.dump({'args': vars(args), 'results': results}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
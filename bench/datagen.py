@@ -0,0 +1,260 @@
+"""Synthetic catalog, customer and order data for benchmarks and load tests.
+
+Distributions are chosen to look like a real storefront rather than uniform
+noise: category sizes are skewed, prices are log-normal around a
+per-category median, ~15% of products are on sale, ~60% have photos, and
+order lines follow a Zipf-like popularity curve so a few products are hot.
+
+    python -m bench.datagen --db /tmp/bench.db --products 5000 --orders 20000
+    python -m bench.datagen --csv import.csv --csv-rows 1000      # bulk_upload input
+    python -m bench.datagen --xlsx import.xlsx --csv-rows 100000  # the same as a workbook
+
+Generated databases are stand-in (SQLite) files with all migrations recorded,
+ready for ``DB_CONNECT_FACTORY=bench.standin:connect STANDIN_DB_PATH=...``.
+Every generated customer, and the supplier ``SUPPLIER_EMAIL``, signs in with
+``ACCOUNT_PASSWORD``; the supplier account runs the first supplier's console.
+"""
+
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import migrate
+import repository
+import stock
+from bench import standin
+
+# name: (share of catalog, median purchase price, price spread (log sigma), nouns)
+CATEGORIES = {
+    'Electronics': (0.22, 2500.0, 0.9, ('Headphones', 'Charger', 'Speaker', 'Smartwatch', 'Power Bank', 'Keyboard')),
+    'Home & Kitchen': (0.18, 800.0, 0.7, ('Mixer', 'Cookware Set', 'Kettle', 'Storage Jar', 'Lamp', 'Cushion')),
+    'Apparel': (0.16, 600.0, 0.6, ('T-Shirt', 'Kurta', 'Jeans', 'Jacket', 'Saree', 'Sneakers')),
+    'Grocery': (0.10, 150.0, 0.5, ('Basmati Rice', 'Green Tea', 'Masala Mix', 'Dry Fruits', 'Olive Oil')),
+    'Beauty': (0.10, 350.0, 0.6, ('Face Wash', 'Serum', 'Lipstick', 'Shampoo', 'Sunscreen')),
+    'Toys': (0.08, 450.0, 0.7, ('Puzzle', 'Building Blocks', 'Doll', 'RC Car', 'Board Game')),
+    'Sports': (0.08, 900.0, 0.8, ('Yoga Mat', 'Cricket Bat', 'Dumbbells', 'Football', 'Cycling Gloves')),
+    'Books': (0.08, 300.0, 0.4, ('Novel', 'Cookbook', 'Workbook', 'Biography', 'Comic')),
+}
+ADJECTIVES = ('Classic', 'Premium', 'Eco', 'Compact', 'Deluxe', 'Smart', 'Handmade', 'Essential', 'Pro', 'Organic')
+SUPPLIER_WORDS = ('Shakti', 'Ganga', 'Nova', 'Apex', 'Lotus', 'Indus', 'Orbit', 'Sun', 'Vista', 'Zenith', 'Kaveri', 'Tara')
+SUPPLIER_SUFFIXES = ('Traders', 'Enterprises', 'Retail', 'Exports', 'Industries', 'Distributors')
+ACCOUNT_PASSWORD = 'bench-password'
+SUPPLIER_EMAIL = 'supplier@bench.example'
+
+
+def supplier_names(count, rng):
+    names = [f'{first} {second}' for first, second in itertools.product(SUPPLIER_WORDS, SUPPLIER_SUFFIXES)]
+    rng.shuffle(names)
+    return [names[index] if index < len(names) else f'{names[index % len(names)]} {index // len(names) + 1}' for index in range(count)]
+
+
+def _weighted_categories(count, rng):
+    names = list(CATEGORIES)
+    return rng.choices(names, weights=[CATEGORIES[name][0] for name in names], k=count)
+
+
+def generate_products(count, suppliers, rng):
+    """Yield product dicts with vanshul_Products column names."""
+
+    supplier_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(suppliers))))
+    for index, category in enumerate(_weighted_categories(count, rng)):
+        _, median, sigma, nouns = CATEGORIES[category]
+        purchase_price = round(max(10.0, rng.lognormvariate(math.log(median), sigma)), 2)
+        margin = round(min(60.0, max(5.0, rng.gauss(25.0, 8.0))), 2)
+        selling_price = round(purchase_price * (1 + margin / 100), 2)
+        sale_price = round(selling_price * rng.uniform(0.7, 0.95), 2) if rng.random() < 0.15 else None
+        initial_quantity = max(1, int(rng.lognormvariate(math.log(60), 0.8)))
+        quantity = initial_quantity - int(initial_quantity * rng.betavariate(2, 3))
+        photos = [f'bench-{index}-{photo}.jpg' for photo in range(rng.randint(1, 3))] if rng.random() < 0.6 else []
+        yield {
+            'Id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'ItemName': f'{rng.choice(ADJECTIVES)} {rng.choice(nouns)} {index:05d}',
+            'Category': category,
+            'Supplier': rng.choices(suppliers, cum_weights=supplier_weights)[0],
+            'PurchasePrice': purchase_price,
+            'SalePrice': sale_price,
+            'ProfitMargin': margin,
+            'SellingPrice': selling_price,
+            'Quantity': quantity,
+            'InitialQuantity': initial_quantity,
+            'PhotoPaths': json.dumps(photos) if photos else None,
+        }
+
+
+def generate_import_csv(rows, rng=None):
+    """Return CSV text in the format ``/bulk_upload`` accepts."""
+
+    rng = rng or random.Random(7)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['item_name', 'category', 'supplier', 'purchase_price', 'profit_margin', 'quantity'])
+    for product in generate_products(rows, supplier_names(20, rng), rng):
+        writer.writerow(
+            [
+                product['ItemName'],
+                product['Category'],
+                product['Supplier'],
+                product['PurchasePrice'],
+                product['ProfitMargin'],
+                product['InitialQuantity'],
+            ]
+        )
+    return out.getvalue()
+
+
+def generate_import_xlsx(rows, rng=None):
+    """Return an XLSX workbook of ``generate_import_csv()``'s rows, with spreadsheet-style headers."""
+
+    from openpyxl import Workbook
+
+    rng = rng or random.Random(7)
+    reader = csv.reader(io.StringIO(generate_import_csv(rows, rng)))
+    next(reader)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Catalogue')
+    sheet.append(['Item Name', 'Category', 'Supplier', 'Purchase Price', 'Profit Margin (%)', 'Qty'])
+    for name, category, supplier, price, margin, quantity in reader:
+        sheet.append([name, category, supplier, float(price), float(margin), int(quantity)])
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def on_hand(conn):
+    """``{product_id: units}`` of stock on hand, read the way the app reads it (snapshot plus pending movements, or shards)."""
+
+    return {str(product['Id']): product['Quantity'] for product in repository.list_products(conn, 'Id, Quantity')}
+
+
+def restock(conn, product_ids, level):
+    """Bring each of ``product_ids`` to ``level`` units on hand with a stock adjustment (ledger and shards included)."""
+
+    stock_on_hand = on_hand(conn)
+    for product_id in product_ids:
+        change = level - stock_on_hand[str(product_id)]
+        if change:
+            stock.adjust(conn, product_id, change, note='bench restock')
+
+
+def _insert(cursor, table, row):
+    columns = ', '.join(row)
+    marks = ', '.join('?' for _ in row)
+    cursor.execute(f'INSERT INTO {table} ({columns}) VALUES ({marks})', tuple(row.values()))
+
+
+def generate(path, products=1000, suppliers=25, customers=None, orders=0, seed=42, days=180):
+    """Create a stand-in database at ``path`` and return the generated product ids."""
+
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = standin.connect(path, latency=0)
+    cursor = conn.cursor()
+    try:
+        migrate.migrate(conn)
+
+        names = supplier_names(suppliers, rng)
+        supplier_ids = {name: str(uuid.UUID(int=rng.getrandbits(128), version=4)) for name in names}
+        for name, supplier_id in supplier_ids.items():
+            # SUPPLIER_EMAIL signs in to the first supplier's console
+            _insert(cursor, 'vanshul_Suppliers', {'Id': supplier_id, 'Name': name, 'Email': SUPPLIER_EMAIL if name == names[0] else None})
+
+        catalog = list(generate_products(products, names, rng))
+        by_id = {product['Id']: product for product in catalog}
+        for product in catalog:
+            _insert(cursor, 'vanshul_Products', {**product, 'SupplierId': supplier_ids[product['Supplier']]})
+
+        customers = customers if customers is not None else max(1, orders // 3)
+        password_hash = generate_password_hash(ACCOUNT_PASSWORD)
+        _insert(cursor, 'SupplierUsers', {'FullName': 'Bench Supplier', 'Email': SUPPLIER_EMAIL, 'PasswordHash': password_hash})
+        emails = [f'customer{index:06d}@bench.example' for index in range(customers)]
+        for index, email in enumerate(emails):
+            _insert(cursor, 'Customers', {'FullName': f'Bench Customer {index}', 'Email': email, 'PasswordHash': password_hash})
+
+        # Zipf-like popularity: the product at rank r is ordered ~1/r^1.1 as often as the top seller
+        popularity = list(itertools.accumulate(1.0 / (rank + 1) ** 1.1 for rank in range(len(catalog))))
+        # The stand-in's GETDATE() clock, which stamps the app's own orders
+        now = datetime.now()
+        for index in range(orders):
+            order_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            created_at = now - timedelta(days=rng.random() * days)
+            line_count = rng.choices((1, 2, 3, 4), weights=(50, 30, 15, 5))[0]
+            quantities = collections.Counter()
+            for product in rng.choices(catalog, cum_weights=popularity, k=line_count):
+                quantities[product['Id']] += rng.choices((1, 2, 3), weights=(80, 15, 5))[0]
+            total = 0.0
+            for product_id, quantity in quantities.items():
+                product = by_id[product_id]
+                unit_price = product['SalePrice'] or product['SellingPrice']
+                total += unit_price * quantity
+                _insert(
+                    cursor,
+                    'vanshul_OrderItems',
+                    {
+                        'OrderItemId': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                        'OrderId': order_id,
+                        'ProductId': product_id,
+                        'Quantity': quantity,
+                        'UnitPrice': unit_price,
+                        'LineTotal': round(unit_price * quantity, 2),
+                    },
+                )
+            _insert(
+                cursor,
+                'vanshul_Orders',
+                {
+                    'Id': order_id,
+                    'OrderNumber': f"VV-{created_at.strftime('%Y%m%d')}-{index:06X}",
+                    'CustomerEmail': rng.choice(emails),
+                    'Status': 'Completed' if rng.random() < 0.95 else 'Cancelled',
+                    'TotalAmount': round(total, 2),
+                    'CreatedAt': created_at.isoformat(' '),
+                },
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return [product['Id'] for product in catalog]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='stand-in database file to (re)create')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--suppliers', type=int, default=25)
+    parser.add_argument('--customers', type=int, help='default: one per three orders')
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--csv', dest='csv_path', help='also write a bulk_upload CSV here')
+    parser.add_argument('--xlsx', dest='xlsx_path', help='also write a bulk_upload XLSX workbook here')
+    parser.add_argument('--csv-rows', type=int, default=1000, help='rows in the --csv and --xlsx files')
+    args = parser.parse_args(argv)
+    if not args.db and not args.csv_path and not args.xlsx_path:
+        parser.error('nothing to do: pass --db, --csv and/or --xlsx')
+
+    if args.db:
+        product_ids = generate(args.db, args.products, args.suppliers, args.customers, args.orders, args.seed)
+        print(f'{args.db}: {len(product_ids)} products, {args.orders} orders')
+    if args.csv_path:
+        with open(args.csv_path, 'w', encoding='utf-8', newline='') as handle:
+            handle.write(generate_import_csv(args.csv_rows, random.Random(args.seed)))
+        print(f'{args.csv_path}: {args.csv_rows} rows')
+    if args.xlsx_path:
+        with open(args.xlsx_path, 'wb') as handle:
+            handle.write(generate_import_xlsx(args.csv_rows, random.Random(args.seed)))
+        print(f'{args.xlsx_path}: {args.csv_rows} rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""A local stand-in for a downstream system receiving outbox events over HTTP.
+
+    python -m bench.eventsink --port 8765 --output instance/events.ndjson
+    OUTBOX_SINK=http://127.0.0.1:8765/events flask --app app outbox-relay
+
+Appends every NDJSON batch POSTed to it to ``--output`` and answers 204.
+With ``--fail-every N`` every Nth batch is answered 503 instead and not
+written, so the relay has to publish it again; ``--dedupe`` then keeps only
+the first copy of each event (by ``seq``), the way a consumer should.
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', required=True, help='NDJSON file the received events are appended to')
+    parser.add_argument('--fail-every', type=int, default=0, help='answer every Nth batch with a 503 (default: never)')
+    parser.add_argument('--dedupe', action='store_true', help='drop events whose seq was already received')
+    args = parser.parse_args(argv)
+
+    lock = threading.Lock()
+    state = {'batches': 0, 'seen': set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8')
+            with lock:
+                state['batches'] += 1
+                if args.fail_every and state['batches'] % args.fail_every == 0:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                lines = []
+                for line in body.splitlines():
+                    seq = json.loads(line)['seq']
+                    if args.dedupe and seq in state['seen']:
+                        continue
+                    state['seen'].add(seq)
+                    lines.append(line + '\n')
+                with open(args.output, 'a', encoding='utf-8') as handle:
+                    handle.writelines(lines)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    print(f"Receiving outbox events on http://127.0.0.1:{args.port}/ into {args.output}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
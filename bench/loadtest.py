@@ -0,0 +1,354 @@
+"""Drive a local instance with concurrent shopper and supplier sessions, then check stock integrity.
+
+    python -m bench.loadtest --shoppers 50 --suppliers 2 --duration 60
+    python -m bench.loadtest --server gunicorn --workers 4 --latency-ms 5 --json loadtest.json
+
+A fresh stand-in database is generated (bench/datagen.py), the app is
+started on it as a subprocess (``flask`` dev server, ``gunicorn`` or the
+``uvicorn`` ASGI front end), and asyncio virtual users run real journeys
+through the HTTP routes, each with its own session cookie:
+
+    shopper   sign in -> (storefront -> product_detail -> add_to_cart -> cart -> checkout)*
+    supplier  sign in -> (dashboard -> dashboard search -> bulk_upload)*
+
+The most popular products start with very little stock, so checkouts race
+for the last units. Afterwards every product's stock is reconciled against
+the order lines written during the run; negative stock or a mismatch is
+reported as oversell. Exit status is 1 on oversell or when the error rate
+exceeds ``--max-error-rate``. Needs nothing beyond the app's own
+requirements, so it runs offline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from bench import datagen, standin
+from bench.async_vs_sync import ROOT, free_port, wait_for_port
+
+SERVERS = {
+    'flask': [sys.executable, '-c', 'import app; app.app.run(port={port}, threaded=True)'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}'],
+    'uvicorn': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.checkouts = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self, elapsed):
+        rows = {}
+        for name in sorted(self.latencies):
+            timings = sorted(self.latencies[name])
+            rows[name] = _summary(timings, self.errors[name], elapsed)
+        everything = sorted(seconds for timings in self.latencies.values() for seconds in timings)
+        rows['TOTAL'] = _summary(everything, sum(self.errors.values()), elapsed)
+        return rows
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def _summary(ordered, errors, elapsed):
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'error_rate': round(errors / len(ordered), 4) if ordered else 0.0,
+        'requests_per_sec': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(_percentile(ordered, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(ordered, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(ordered, 0.99) * 1000, 1),
+    }
+
+
+class Session:
+    """Minimal HTTP/1.1 client that keeps cookies, one connection per request."""
+
+    def __init__(self, port, stats, timeout):
+        self.port = port
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, name, method, path, form=None, upload=None, expect=(200,)):
+        body, content_type = b'', None
+        if form is not None:
+            body, content_type = urlencode(form).encode('utf-8'), 'application/x-www-form-urlencoded'
+        elif upload is not None:
+            body, content_type = _multipart(*upload)
+        headers = [f'{method} {path} HTTP/1.1', f'Host: 127.0.0.1:{self.port}', 'Connection: close']
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(f'{key}={value}' for key, value in self.cookies.items()))
+        if content_type:
+            headers += [f'Content-Type: {content_type}', f'Content-Length: {len(body)}']
+
+        started = time.perf_counter()
+        status, response_headers = 0, {}
+        try:
+            status, response_headers = await asyncio.wait_for(
+                self._exchange('\r\n'.join(headers).encode('latin-1') + b'\r\n\r\n' + body), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError, ValueError):
+            pass
+        self.stats.record(name, time.perf_counter() - started, status in expect)
+        return status, response_headers
+
+    async def _exchange(self, payload):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            await reader.read()
+        finally:
+            writer.close()
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            key, value = key.strip().lower(), value.strip()
+            if key == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                if cookie_value and 'expires=thu, 01 jan 1970' not in value.lower():
+                    self.cookies[cookie_name] = cookie_value
+                else:
+                    self.cookies.pop(cookie_name, None)
+            elif key:
+                headers[key] = value
+        return status, headers
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+async def _think(rng, think_ms):
+    if think_ms:
+        await asyncio.sleep(rng.uniform(0, 2 * think_ms) / 1000.0)
+
+
+async def shopper(index, port, stats, deadline, catalog, args):
+    rng = random.Random(args.seed * 1000 + index)
+    session = Session(port, stats, args.timeout)
+    email = f'customer{index % args.customers:06d}@bench.example'
+    status, _ = await session.request(
+        'customer_login', 'POST', '/customer/login', form={'email': email, 'password': datagen.ACCOUNT_PASSWORD}, expect=(302,)
+    )
+    if status != 302:
+        return
+    while time.monotonic() < deadline:
+        await session.request('storefront', 'GET', '/storefront')
+        await _think(rng, args.think_ms)
+        product_id = rng.choices(catalog['ids'], cum_weights=catalog['popularity'])[0]
+        await session.request('product_detail', 'GET', f'/product/{product_id}')
+        await _think(rng, args.think_ms)
+        await session.request(
+            'add_to_cart', 'POST', f'/add_to_cart/{product_id}', form={'quantity': rng.choice((1, 1, 1, 2))}, expect=(302,)
+        )
+        if rng.random() < args.checkout_ratio:
+            await session.request('cart', 'GET', '/cart')
+            status, headers = await session.request('checkout', 'POST', '/checkout', form={'email': email}, expect=(302,))
+            if status == 302:
+                # Success sends the shopper back to the storefront, any failure to the cart
+                outcome = 'placed' if headers.get('location', '').rstrip('/').endswith('/storefront') else 'rejected'
+                stats.checkouts[outcome] += 1
+        await _think(rng, args.think_ms)
+
+
+async def supplier(index, port, stats, deadline, args):
+    rng = random.Random(args.seed * 7919 + index)
+    session = Session(port, stats, args.timeout)
+    status, _ = await session.request(
+        'supplier_login',
+        'POST',
+        '/supplier/login',
+        form={'identifier': datagen.SUPPLIER_EMAIL, 'password': datagen.ACCOUNT_PASSWORD},
+        expect=(302,),
+    )
+    if status != 302:
+        return
+    upload = datagen.generate_import_csv(args.import_rows, rng).encode('utf-8')
+    while time.monotonic() < deadline:
+        await session.request('dashboard', 'GET', '/')
+        await _think(rng, args.think_ms)
+        await session.request('dashboard_search', 'GET', '/?search=' + rng.choice(datagen.ADJECTIVES))
+        await _think(rng, args.think_ms)
+        if rng.random() < args.upload_ratio:
+            await session.request('bulk_upload', 'POST', '/bulk_upload', upload=('file', 'load.csv', upload), expect=(302,))
+        await _think(rng, args.think_ms)
+
+
+async def run_users(port, catalog, args):
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = [shopper(index, port, stats, deadline, catalog, args) for index in range(args.shoppers)]
+    users += [supplier(index, port, stats, deadline, args) for index in range(args.suppliers)]
+    await asyncio.gather(*users)
+    return stats, time.monotonic() - started
+
+
+def stock_snapshot(db_path):
+    """``{product_id: (quantity on hand, units_sold)}`` read straight from the database.
+
+    vanshul_Products.Quantity is only the compacted snapshot; on hand is read the way the app reads it.
+    """
+
+    conn = standin.connect(db_path, latency=0)
+    cursor = conn.cursor()
+    try:
+        stock_on_hand = datagen.on_hand(conn)
+        cursor.execute("SELECT ProductId, SUM(Quantity) FROM vanshul_OrderItems GROUP BY ProductId")
+        sold = {str(product_id): units for product_id, units in cursor.fetchall()}
+        return {product_id: (quantity, sold.get(product_id, 0)) for product_id, quantity in stock_on_hand.items()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def find_oversell(before, after):
+    problems = []
+    for product_id, (quantity, sold) in after.items():
+        if quantity < 0:
+            problems.append({'product_id': product_id, 'problem': 'negative stock', 'quantity': quantity})
+        if product_id not in before:
+            continue  # added by bulk_upload during the run
+        start_quantity, start_sold = before[product_id]
+        expected = start_quantity - (sold - start_sold)
+        if quantity != expected:
+            problems.append(
+                {'product_id': product_id, 'problem': 'stock does not match orders', 'quantity': quantity, 'expected': expected}
+            )
+    return problems
+
+
+def prepare_database(db_path, args):
+    product_ids = datagen.generate(db_path, products=args.products, customers=args.customers, orders=args.orders, seed=args.seed)
+    hot = product_ids[: args.hot_products]
+    conn = standin.connect(db_path, latency=0)
+    try:
+        datagen.restock(conn, hot, args.hot_stock)
+    finally:
+        conn.close()
+    popularity, running = [], 0.0
+    for rank in range(len(product_ids)):
+        running += 1.0 / (rank + 1) ** 1.1
+        popularity.append(running)
+    return {'ids': product_ids, 'popularity': popularity}
+
+
+def print_report(rows, checkouts, oversell):
+    print(f"\n{'endpoint':18} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, row in rows.items():
+        print(
+            f"{name:18} {row['requests']:9d} {row['requests_per_sec']:8.1f} {row['error_rate']:7.2%} "
+            f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f}"
+        )
+    print(f"\ncheckouts: {dict(checkouts)}")
+    if oversell:
+        print(f'OVERSELL: {len(oversell)} product(s) inconsistent, e.g. {oversell[:3]}')
+    else:
+        print('stock reconciled: no oversell')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=sorted(SERVERS), default='flask')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--shoppers', type=int, default=20)
+    parser.add_argument('--suppliers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load after sign-in starts')
+    parser.add_argument('--think-ms', type=float, default=50.0, help='mean pause between a user\'s requests')
+    parser.add_argument('--checkout-ratio', type=float, default=0.5, help='share of shopper loops that check out')
+    parser.add_argument('--upload-ratio', type=float, default=0.2, help='share of supplier loops that bulk upload')
+    parser.add_argument('--import-rows', type=int, default=50)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--hot-products', type=int, default=10, help='most popular products that start nearly sold out')
+    parser.add_argument('--hot-stock', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='injected per-statement DB latency')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='vvstore-load-')
+    db_path = os.path.join(workdir, 'standin.db')
+    catalog = prepare_database(db_path, args)
+    before = stock_snapshot(db_path)
+
+    env = dict(
+        os.environ,
+        DB_CONNECT_FACTORY='bench.standin:connect',
+        STANDIN_DB_PATH=db_path,
+        STANDIN_LATENCY_MS=str(args.latency_ms),
+        SKIP_SCHEMA_BOOTSTRAP='1',
+        WEB_CONCURRENCY=str(args.workers),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        # Every virtual user signs in from 127.0.0.1
+        LOGIN_IP_BURST=str(10 * (args.shoppers + args.suppliers)),
+        LOGIN_IP_PER_MINUTE=str(10 * (args.shoppers + args.suppliers)),
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING'),
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+    )
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    port = free_port()
+    process = subprocess.Popen(
+        [arg.format(port=port) for arg in SERVERS[args.server]],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, process)
+        stats, elapsed = asyncio.run(run_users(port, catalog, args))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    rows = stats.report(elapsed)
+    oversell = find_oversell(before, stock_snapshot(db_path))
+    print_report(rows, stats.checkouts, oversell)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as handle:
+            json.dump(
+                {'args': vars(args), 'endpoints': rows, 'checkouts': dict(stats.checkouts), 'oversell': oversell},
+                handle,
+                indent=2,
+            )
+    if oversell or rows['TOTAL']['error_rate'] > args.max_error_rate:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Guess at one account from many IPs and check the account's own limit stops it.
+
+    python -m bench.login_limits
+    python -m bench.login_limits --ips 50 --attempts 200 --backoff-seconds 3
+
+The app is imported in-process on a fresh stand-in database (bench/standin.py)
+and driven through its test client. Wrong passwords for one customer are sent
+round-robin from ``--ips`` client addresses, few enough per address that no
+IP reaches its own bucket, so every refusal comes from the per-account limit
+(security.py):
+
+    guessing     past LOGIN_ACCOUNT_BURST failures the account waits; attempts
+                 from any IP are refused with 429 and never reach the hash
+    waiting      the owner's correct password is refused too until the wait ends
+    owner        after the wait, the correct password signs in (302) and clears it
+    bystander    another account signs in from the guessing IPs all along
+
+Exit status is 1 if any of that does not hold.
+"""
+
+import argparse
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench import datagen
+
+TARGET = 'customer000000@bench.example'
+BYSTANDER = 'customer000001@bench.example'
+
+
+def sign_in(app, email, password, ip):
+    """POST the customer login form as ``ip``; return the status code."""
+
+    client = app.test_client()
+    response = client.post(
+        '/customer/login',
+        data={'email': email, 'password': password},
+        environ_base={'REMOTE_ADDR': ip},
+    )
+    return response.status_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ips', type=int, default=20, help='client addresses the guesses are spread over')
+    parser.add_argument('--attempts', type=int, default=40, help='wrong passwords sent at the account')
+    parser.add_argument('--backoff-seconds', type=float, default=3.0, help='LOGIN_BACKOFF_SECONDS for the app')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='vvstore-login-')
+    try:
+        db_path = os.path.join(workdir, 'login.db')
+        datagen.generate(db_path, products=20, customers=2)
+        os.environ.update(
+            DB_CONNECT_FACTORY='bench.standin:connect',
+            STANDIN_DB_PATH=db_path,
+            STANDIN_LATENCY_MS='0',
+            SKIP_SCHEMA_BOOTSTRAP='1',
+            LOGIN_BACKOFF_SECONDS=str(args.backoff_seconds),
+        )
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        import app as app_module
+
+        flask_app = app_module.configure_app({'TESTING': True})
+        security = app_module.security
+        ips = [f'10.0.{index // 250}.{index % 250 + 1}' for index in range(args.ips)]
+        problems = []
+
+        started = time.monotonic()
+        outcomes = collections.Counter()
+        for attempt in range(args.attempts):
+            outcomes[sign_in(flask_app, TARGET, f'wrong-{attempt}', ips[attempt % len(ips)])] += 1
+        guessing_seconds = time.monotonic() - started
+        verified = outcomes[200]
+        print(f'guessing   {args.attempts} wrong passwords from {len(ips)} IPs in {guessing_seconds:.1f}s: '
+              f'{verified} verified, {outcomes[429]} refused')
+        if guessing_seconds < args.backoff_seconds and verified > security.login_account_limiter.capacity + 1:
+            problems.append(f'{verified} wrong passwords were verified within the first wait')
+        if not outcomes[429]:
+            problems.append('no attempt at the account was refused')
+        if set(outcomes) - {200, 429}:
+            problems.append(f'unexpected statuses {sorted(set(outcomes) - {200, 429})}')
+
+        wait = security.login_backoff.retry_after(TARGET)
+        status = sign_in(flask_app, TARGET, datagen.ACCOUNT_PASSWORD, '10.9.0.1')
+        print(f'waiting    correct password {wait:.1f}s before the wait ends: {status}')
+        if wait and status != 429:
+            problems.append(f'the correct password got {status} during the wait, expected 429')
+
+        time.sleep(security.login_backoff.retry_after(TARGET) + 0.05)
+        status = sign_in(flask_app, TARGET, datagen.ACCOUNT_PASSWORD, '10.9.0.2')
+        print(f'owner      correct password after the wait: {status}')
+        if status != 302:
+            problems.append(f'the owner could not sign in after the wait ({status})')
+        elif security.login_backoff.retry_after(TARGET):
+            problems.append('signing in did not clear the wait')
+
+        status = sign_in(flask_app, BYSTANDER, datagen.ACCOUNT_PASSWORD, ips[0])
+        print(f'bystander  another account from a guessing IP: {status}')
+        if status != 302:
+            problems.append(f'another account was refused from a guessing IP ({status})')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if problems:
+        for problem in problems:
+            print(f'FAIL: {problem}')
+        sys.exit(1)
+    print('guesses spread across IPs were capped by the account, and its owner still signed in')
+
+
+if __name__ == '__main__':
+    main()
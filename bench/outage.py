@@ -0,0 +1,193 @@
+"""Take the database away from a running instance and check the storefront keeps serving.
+
+    python -m bench.outage
+    python -m bench.outage --server uvicorn --phase-seconds 20 --concurrency 16
+
+The app is started on a fresh stand-in database (bench/standin.py) and driven
+with a ``/storefront`` + ``/product/<id>`` mix through three phases:
+
+    healthy    the database answers normally
+    outage     the stand-in is "down": every connect() hangs for the connect timeout, then fails
+    recovered  the fault is cleared again
+
+During the outage the catalogue snapshot (resilience.py) should keep both
+pages rendering with products, and once the circuit breaker opens they
+should be served at cache speed rather than after a connect timeout each. A
+product added while the database was "down" must show up on the storefront
+after recovery, which proves the background refresh got through. Exit status
+is 1 if any of that does not hold.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+from bench import standin
+from bench.async_vs_sync import ROOT, free_port, wait_for_port
+from bench.loadtest import SERVERS, _percentile
+
+PRODUCT_MARKER = 'Bench Item'
+ARRIVAL_NAME = 'Arrived During Outage'
+
+
+def _get(port, path, timeout):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=timeout) as response:
+            status, body = response.status, response.read().decode('utf-8', 'replace')
+    except urllib.error.HTTPError as exc:
+        status, body = exc.code, ''
+    except OSError:
+        status, body = 0, ''
+    return status, body, time.perf_counter() - started
+
+
+def run_phase(port, product_ids, seconds, concurrency, timeout):
+    """Drive the page mix for ``seconds``; return per-page ``(latencies, failures)``."""
+
+    results = {'storefront': ([], []), 'product_detail': ([], [])}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            if rng.random() < 0.5:
+                name, path = 'storefront', '/storefront'
+            else:
+                name, path = 'product_detail', f'/product/{rng.choice(product_ids)}'
+            status, body, elapsed = _get(port, path, timeout)
+            # A page without products (an empty storefront, a redirect to it) counts as a failure
+            ok = status == 200 and PRODUCT_MARKER in body
+            with lock:
+                latencies, failures = results[name]
+                latencies.append(elapsed)
+                if not ok:
+                    failures.append(status)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def add_product_directly(db_path, name):
+    """Insert a product behind the app's back (the stand-in's faults only affect the app's connections)."""
+
+    product_id, now = str(uuid.uuid4()), datetime.now().isoformat(' ')
+    conn = sqlite3.connect(db_path)
+    try:
+        # Like repository.insert_product(): an empty snapshot and the stock as a receipt in the ledger
+        conn.execute(
+            """
+            INSERT INTO vanshul_Products (Id, ItemName, Category, Supplier, PurchasePrice, ProfitMargin, SellingPrice, Quantity, InitialQuantity, CreatedAt)
+            VALUES (?, ?, 'Home', 'Outage Supplier', 10, 20, 12, 0, 5, ?)
+            """,
+            (product_id, name, now),
+        )
+        conn.execute(
+            "INSERT INTO vanshul_InventoryMovements (ProductId, Kind, Quantity, CreatedAt) VALUES (?, 'receipt', 5, ?)",
+            (product_id, now),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def print_phase(phase, results):
+    for name, (latencies, failures) in results.items():
+        ordered = sorted(latencies)
+        print(
+            f"{phase:10} {name:15} {len(ordered):9d} {len(failures):9d} "
+            f"{_percentile(ordered, 0.50) * 1000:8.1f} {_percentile(ordered, 0.95) * 1000:8.1f} {max(ordered, default=0) * 1000:8.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=sorted(SERVERS), default='flask')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--phase-seconds', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--connect-timeout', type=float, default=2.0, help='DB_CONNECT_TIMEOUT for the app')
+    parser.add_argument('--breaker-reset', type=float, default=3.0, help='DB_BREAKER_RESET_SECONDS for the app')
+    parser.add_argument('--fresh-seconds', type=float, default=1.0, help='CATALOG_FRESH_SECONDS for the app')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='vvstore-outage-')
+    db_path = os.path.join(workdir, 'standin.db')
+    faults_path = os.path.join(workdir, 'faults.json')
+    product_ids = standin.seed_products(args.products, db_path)
+    standin.set_faults(faults_path)
+
+    env = dict(
+        os.environ,
+        DB_CONNECT_FACTORY='bench.standin:connect',
+        STANDIN_DB_PATH=db_path,
+        STANDIN_FAULTS=faults_path,
+        DB_CONNECT_TIMEOUT=str(args.connect_timeout),
+        DB_BREAKER_RESET_SECONDS=str(args.breaker_reset),
+        CATALOG_FRESH_SECONDS=str(args.fresh_seconds),
+        SKIP_SCHEMA_BOOTSTRAP='1',
+        WEB_CONCURRENCY=str(args.workers),
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING'),
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+    )
+    port = free_port()
+    process = subprocess.Popen(
+        [arg.format(port=port) for arg in SERVERS[args.server]],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    problems = []
+    print(f"{'phase':10} {'page':15} {'requests':>9} {'failures':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    try:
+        wait_for_port(port, process)
+        healthy = run_phase(port, product_ids, args.phase_seconds, args.concurrency, args.timeout)
+        print_phase('healthy', healthy)
+
+        standin.set_faults(faults_path, down=True)
+        add_product_directly(db_path, ARRIVAL_NAME)
+        outage = run_phase(port, product_ids, args.phase_seconds, args.concurrency, args.timeout)
+        print_phase('outage', outage)
+
+        standin.set_faults(faults_path)
+        recovered = run_phase(port, product_ids, args.phase_seconds, args.concurrency, args.timeout)
+        print_phase('recovered', recovered)
+        _, body, _ = _get(port, '/storefront', args.timeout)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    for name, (latencies, failures) in outage.items():
+        if failures:
+            problems.append(f'{len(failures)} {name} request(s) failed during the outage')
+        if _percentile(sorted(latencies), 0.50) >= args.connect_timeout:
+            problems.append(f'{name} waited out the connect timeout during the outage (p50)')
+    if ARRIVAL_NAME not in body:
+        problems.append('the catalogue was not refreshed after the database came back')
+    for problem in problems:
+        print(f'FAIL: {problem}')
+    if problems:
+        sys.exit(1)
+    print('storefront kept serving through the outage and caught up afterwards')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Keep a SQLite replica file trailing a primary, to exercise read/write splitting locally.
+
+    python -m bench.replicate instance/primary.db instance/replica.db --interval 2
+    python -m bench.replicate instance/primary.db instance/replica.db --once
+
+Copies the primary over the replica with SQLite's online backup API every
+``--interval`` seconds, so the replica trails the primary by up to that long,
+like an asynchronous replica. Point the app at the pair with:
+
+    DB_BACKEND=sqlite SQLITE_PATH=instance/primary.db DB_REPLICAS=instance/replica.db \\
+        flask --app app run
+
+``flask --app app replicas`` reports the replica's lag; stop this script and
+the lag grows past DB_REPLICA_MAX_LAG, after which reads go to the primary.
+"""
+
+import argparse
+import sqlite3
+import time
+
+
+def copy(primary, replica):
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('primary', help='SQLite file the app writes to (SQLITE_PATH)')
+    parser.add_argument('replica', help='SQLite file to keep trailing it (DB_REPLICAS)')
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between copies (default 2)')
+    parser.add_argument('--once', action='store_true', help='copy once and exit')
+    args = parser.parse_args(argv)
+
+    while True:
+        started = time.perf_counter()
+        copy(args.primary, args.replica)
+        print(f"Copied {args.primary} -> {args.replica} in {time.perf_counter() - started:.3f}s", flush=True)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
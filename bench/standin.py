@@ -0,0 +1,383 @@
+"""SQLite-backed stand-in for the SQL Server database used by app.py.
+
+Point the app at it with ``DB_CONNECT_FACTORY=bench.standin:connect``. The
+stand-in understands the small T-SQL subset app.py issues (``TOP``, ``NEWID()``,
+``GETDATE()``, ``CAST(... AS DATE)``, ``DATEADD``/``DATEDIFF`` hour truncation,
+``UPDLOCK`` hints, ``ICP.dbo.`` prefixes), raises pyodbc exception types so the
+existing error handling keeps working, and can inject latency per connection
+and per statement to mimic a remote SQL Server:
+
+    STANDIN_DB_PATH             SQLite file (default: <tmp>/vvstore-standin.db)
+    STANDIN_LATENCY_MS          delay added to every execute()
+    STANDIN_CONNECT_LATENCY_MS  delay added to every connect()
+
+For resilience testing it also injects faults, read from the JSON file named
+by ``STANDIN_FAULTS`` and re-read whenever that file changes, so an outage
+can be switched on and off under a running app (see ``set_faults()``):
+
+    {"down": true}                  connect() hangs for the connect timeout, then fails
+    {"connect_delay_ms": 8000}      connect() takes this long
+    {"query_delay_ms": 5000}        every execute() takes this long
+    {"error_rate": 0.2}             this share of execute() calls fail as a dropped link
+
+Like pyodbc, connecting gives up after ``DB_CONNECT_TIMEOUT`` seconds (default
+5) and a statement after ``DB_QUERY_TIMEOUT`` (default 30, 0 = never), raising
+``pyodbc.OperationalError`` (HYT00) -- what the app sees from a struggling
+SQL Server.
+"""
+
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pyodbc
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vanshul_Suppliers (
+    Id TEXT PRIMARY KEY DEFAULT (NEWID()),
+    Name TEXT NOT NULL UNIQUE,
+    Email TEXT,
+    CreatedAt TIMESTAMP DEFAULT (GETDATE())
+);
+CREATE TABLE IF NOT EXISTS vanshul_Products (
+    Id TEXT PRIMARY KEY DEFAULT (NEWID()),
+    ItemName TEXT NOT NULL,
+    Category TEXT,
+    Supplier TEXT,
+    PurchasePrice REAL NOT NULL,
+    SalePrice REAL,
+    ProfitMargin REAL DEFAULT 20.0,
+    SellingPrice REAL NOT NULL,
+    Quantity INTEGER NOT NULL,
+    PhotoPaths TEXT,
+    CreatedAt TIMESTAMP DEFAULT (GETDATE()),
+    InitialQuantity INTEGER,
+    SupplierId TEXT REFERENCES vanshul_Suppliers(Id)
+);
+CREATE TABLE IF NOT EXISTS vanshul_Orders (
+    Id TEXT PRIMARY KEY DEFAULT (NEWID()),
+    OrderNumber TEXT NOT NULL UNIQUE,
+    CustomerEmail TEXT,
+    Status TEXT DEFAULT 'Pending',
+    TotalAmount REAL NOT NULL DEFAULT 0,
+    CreatedAt TIMESTAMP DEFAULT (GETDATE())
+);
+CREATE TABLE IF NOT EXISTS vanshul_OrderItems (
+    OrderItemId TEXT PRIMARY KEY DEFAULT (NEWID()),
+    OrderId TEXT NOT NULL REFERENCES vanshul_Orders(Id),
+    ProductId TEXT NOT NULL REFERENCES vanshul_Products(Id),
+    Quantity INTEGER NOT NULL,
+    UnitPrice REAL NOT NULL,
+    LineTotal REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Customers (
+    Id TEXT PRIMARY KEY DEFAULT (NEWID()),
+    FullName TEXT NOT NULL,
+    Email TEXT NOT NULL UNIQUE,
+    PasswordHash TEXT NOT NULL,
+    CreatedAt TIMESTAMP DEFAULT (GETDATE())
+);
+CREATE TABLE IF NOT EXISTS SupplierUsers (
+    Id TEXT PRIMARY KEY DEFAULT (NEWID()),
+    FullName TEXT,
+    Email TEXT NOT NULL UNIQUE,
+    PasswordHash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IX_vanshul_OrderItems_OrderId ON vanshul_OrderItems (OrderId);
+CREATE INDEX IF NOT EXISTS IX_vanshul_OrderItems_ProductId ON vanshul_OrderItems (ProductId);
+CREATE INDEX IF NOT EXISTS IX_vanshul_Orders_CustomerEmail ON vanshul_Orders (CustomerEmail, CreatedAt DESC, Id DESC);
+CREATE INDEX IF NOT EXISTS IX_vanshul_Orders_CreatedAt ON vanshul_Orders (CreatedAt);
+CREATE INDEX IF NOT EXISTS IX_vanshul_Products_Category ON vanshul_Products (Category);
+CREATE INDEX IF NOT EXISTS IX_vanshul_Products_SupplierId ON vanshul_Products (SupplierId);
+CREATE TABLE IF NOT EXISTS vanshul_ReplicaHeartbeat (
+    Id INTEGER PRIMARY KEY,
+    BeatAt TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vanshul_SalesRollup (
+    Grain TEXT NOT NULL,
+    PeriodStart TIMESTAMP NOT NULL,
+    ProductId TEXT NOT NULL,
+    Category TEXT,
+    SupplierId TEXT,
+    Units INTEGER NOT NULL,
+    Revenue REAL NOT NULL,
+    Cost REAL NOT NULL,
+    PRIMARY KEY (Grain, PeriodStart, ProductId)
+);
+CREATE INDEX IF NOT EXISTS IX_vanshul_SalesRollup_SupplierId ON vanshul_SalesRollup (SupplierId, Grain, PeriodStart);
+CREATE TABLE IF NOT EXISTS vanshul_JobWatermarks (
+    Name TEXT PRIMARY KEY,
+    ProcessedThrough TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vanshul_InventoryMovements (
+    Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProductId TEXT NOT NULL,
+    Kind TEXT NOT NULL,
+    Quantity INTEGER NOT NULL,
+    Reference TEXT,
+    Note TEXT,
+    CreatedAt TIMESTAMP NOT NULL DEFAULT (GETDATE())
+);
+CREATE INDEX IF NOT EXISTS IX_vanshul_InventoryMovements_ProductId ON vanshul_InventoryMovements (ProductId, Seq, Quantity);
+CREATE TABLE IF NOT EXISTS vanshul_StockCompaction (
+    Id INTEGER PRIMARY KEY,
+    ThroughSeq INTEGER NOT NULL,
+    CompactedAt TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vanshul_StockShards (
+    ProductId TEXT NOT NULL,
+    Shard INTEGER NOT NULL,
+    Quantity INTEGER NOT NULL,
+    PRIMARY KEY (ProductId, Shard)
+);
+CREATE TABLE IF NOT EXISTS vanshul_Outbox (
+    Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    EventType TEXT NOT NULL,
+    SubjectId TEXT NOT NULL,
+    Payload TEXT NOT NULL,
+    CreatedAt TIMESTAMP NOT NULL DEFAULT (GETDATE())
+);
+CREATE TABLE IF NOT EXISTS vanshul_OutboxRelay (
+    Sink TEXT PRIMARY KEY,
+    PublishedThrough INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vanshul_SchemaVersion (
+    Version INTEGER PRIMARY KEY,
+    Name TEXT NOT NULL,
+    Checksum TEXT NOT NULL,
+    AppliedAt TIMESTAMP NOT NULL DEFAULT (GETDATE())
+);
+"""
+
+_TOP_RE = re.compile(r'\bSELECT\s+TOP\s*\(?\s*(\?|\d+)\s*\)?', re.IGNORECASE)
+_CAST_DATE_RE = re.compile(r'\bCAST\(([\w.]+) AS DATE\)', re.IGNORECASE)
+_LOCK_HINT_RE = re.compile(r'\s+WITH \(UPDLOCK, ROWLOCK\)', re.IGNORECASE)
+_HOUR_OF_RE = re.compile(r'\bDATEADD\(hour, DATEDIFF\(hour, 0, ([\w.]+)\), 0\)', re.IGNORECASE)
+
+
+_INFORMATION_SCHEMA_COLUMNS = (
+    "(SELECT m.name AS TABLE_NAME, c.name AS COLUMN_NAME "
+    "FROM sqlite_master m JOIN pragma_table_info(m.name) c WHERE m.type = 'table')"
+)
+
+
+def _translate(sql, params):
+    params = list(params or ())
+    text = sql.replace('ICP.dbo.', '').replace('dbo.', '')
+    text = text.replace('INFORMATION_SCHEMA.COLUMNS', _INFORMATION_SCHEMA_COLUMNS)
+    text = _CAST_DATE_RE.sub(r'date(\1)', text)
+    # SQLite has no row locks; the transaction's earlier write holds the database's write lock
+    text = _LOCK_HINT_RE.sub('', text)
+    text = _HOUR_OF_RE.sub(r"strftime('%Y-%m-%d %H:00:00', \1)", text)
+    match = _TOP_RE.search(text)
+    if match:
+        limit = match.group(1)
+        text = text[:match.start()] + 'SELECT' + text[match.end():]
+        if limit == '?':
+            limit_index = text[:match.start()].count('?')
+            params.append(params.pop(limit_index))
+        text = text.rstrip().rstrip(';') + (' LIMIT ?' if limit == '?' else f' LIMIT {limit}')
+    return text, params
+
+
+class StandinCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._raw.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        if self._connection.latency:
+            time.sleep(self._connection.latency)
+        faults = _faults()
+        if faults.get('query_delay_ms'):
+            _wait(faults['query_delay_ms'] / 1000.0, _timeout('DB_QUERY_TIMEOUT', 30.0), 'Query timeout expired')
+        if faults.get('error_rate') and random.random() < faults['error_rate']:
+            raise pyodbc.OperationalError('08S01', '[08S01] Communication link failure (injected)')
+        statement = '\n'.join(line for line in sql.strip().splitlines() if not line.strip().startswith('--'))
+        if statement.lstrip().upper().startswith(('IF ', 'DECLARE ')):
+            # T-SQL DDL batches from migrations/; SCHEMA already provisions tables and indexes
+            return self
+        text, values = _translate(sql, params)
+        try:
+            self._cursor.execute(text, values)
+        except sqlite3.IntegrityError as exc:
+            raise pyodbc.IntegrityError(str(exc)) from exc
+        except sqlite3.OperationalError as exc:
+            raise pyodbc.ProgrammingError(str(exc)) from exc
+        except sqlite3.Error as exc:
+            raise pyodbc.Error(str(exc)) from exc
+        return self
+
+    def executemany(self, sql, rows):
+        if self._connection.latency:
+            time.sleep(self._connection.latency)
+        text, _ = _translate(sql, ())
+        try:
+            self._cursor.executemany(text, [tuple(row) for row in rows])
+        except sqlite3.IntegrityError as exc:
+            raise pyodbc.IntegrityError(str(exc)) from exc
+        except sqlite3.Error as exc:
+            raise pyodbc.Error(str(exc)) from exc
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandinConnection:
+    def __init__(self, path, latency=0.0):
+        self.latency = latency
+        self._raw = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._raw.create_function('NEWID', 0, lambda: str(uuid.uuid4()))
+        # Local time, like SQL Server's GETDATE()
+        self._raw.create_function('GETDATE', 0, lambda: datetime.now().isoformat(' '))
+
+    def cursor(self):
+        return StandinCursor(self)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._raw.close()
+
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'vvstore-standin.db')
+
+_schema_lock = threading.Lock()
+_initialised_paths = set()
+
+
+def _env_seconds(name):
+    return float(os.getenv(name, '0') or 0) / 1000.0
+
+
+def _timeout(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+_fault_state = {'path': None, 'mtime': None, 'faults': {}}
+
+
+def _faults():
+    path = os.getenv('STANDIN_FAULTS')
+    if not path:
+        return {}
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if (path, mtime) != (_fault_state['path'], _fault_state['mtime']):
+        with open(path, encoding='utf-8') as handle:
+            content = handle.read()
+        _fault_state.update(path=path, mtime=mtime, faults=json.loads(content) if content.strip() else {})
+    return _fault_state['faults']
+
+
+def set_faults(path=None, **faults):
+    """Write ``faults`` (see the module docstring) to the STANDIN_FAULTS file; no arguments clears them."""
+
+    path = path or os.environ['STANDIN_FAULTS']
+    staging = f'{path}.tmp'
+    with open(staging, 'w', encoding='utf-8') as handle:
+        json.dump(faults, handle)
+    os.replace(staging, path)
+
+
+def _wait(seconds, timeout, message):
+    """Sleep ``seconds``, or give up after ``timeout`` the way pyodbc does."""
+
+    if timeout and seconds >= timeout:
+        time.sleep(timeout)
+        raise pyodbc.OperationalError('HYT00', f'[HYT00] {message} (injected)')
+    time.sleep(seconds)
+
+
+def connect(path=None, latency=None):
+    path = path or os.getenv('STANDIN_DB_PATH', DEFAULT_PATH)
+    connect_latency = _env_seconds('STANDIN_CONNECT_LATENCY_MS')
+    if connect_latency:
+        time.sleep(connect_latency)
+    faults = _faults()
+    connect_timeout = _timeout('DB_CONNECT_TIMEOUT', 5.0)
+    if faults.get('down'):
+        time.sleep(connect_timeout)
+        raise pyodbc.OperationalError('08001', '[08001] Server is not found or not accessible (injected)')
+    if faults.get('connect_delay_ms'):
+        _wait(faults['connect_delay_ms'] / 1000.0, connect_timeout, 'Login timeout expired')
+    conn = StandinConnection(path, _env_seconds('STANDIN_LATENCY_MS') if latency is None else latency)
+    if path not in _initialised_paths:
+        with _schema_lock:
+            if path not in _initialised_paths:
+                conn._raw.executescript(SCHEMA)
+                _initialised_paths.add(path)
+    return conn
+
+
+def seed_products(count, path=None):
+    """Insert ``count`` simple products and return their ids."""
+
+    conn = connect(path, latency=0)
+    cursor = conn.cursor()
+    product_ids = []
+    try:
+        for index in range(count):
+            product_id = str(uuid.uuid4())
+            price = 100 + (index % 50) * 10
+            cursor.execute(
+                """
+                INSERT INTO vanshul_Products (Id, ItemName, Category, Supplier, PurchasePrice, ProfitMargin, SellingPrice, Quantity, InitialQuantity, PhotoPaths)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    product_id,
+                    f"Bench Item {index}",
+                    ('Electronics', 'Home', 'Toys', 'Apparel')[index % 4],
+                    f"Supplier {index % 10}",
+                    price,
+                    20.0,
+                    price * 1.2,
+                    1000,
+                    1000,
+                    None,
+                ),
+            )
+            product_ids.append(product_id)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return product_ids
@@ -0,0 +1,440 @@
+"""Benchmark scenarios for the hot paths in app.py, with JSON results for regression tracking.
+
+    python -m bench.suite --products 2000 --orders 10000 --json bench-results/$(git rev-parse --short HEAD).json
+    python -m bench.suite --compare bench-results/baseline.json --threshold 10
+    python -m bench.suite --only storefront_render,dashboard_analytics --rounds 50
+
+Scenarios run in-process through Flask's test client against a database made
+by bench/datagen.py (the SQLite stand-in, optionally with injected latency),
+so they measure the app's own work: queries issued, row mapping, Python-side
+filtering and Jinja rendering. Write scenarios get a fresh copy of the
+database each run so they do not skew the read scenarios.
+
+Results use pytest-benchmark's JSON layout (``benchmarks[].stats`` with min,
+max, mean, median, stddev, iqr, ops...) so existing tooling can read them.
+``--compare`` prints the change in median against a previous result file and
+exits with status 1 when any scenario is slower by more than ``--threshold``
+percent.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from bench import datagen, standin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {}
+
+
+def scenario(name, group, writes=False):
+    """Register ``setup(ctx) -> run`` or ``-> (before_each_round, run)`` under ``name``."""
+
+    def register(setup):
+        SCENARIOS[name] = {'setup': setup, 'group': group, 'writes': writes}
+        return setup
+
+    return register
+
+
+class Context:
+    def __init__(self, app_module, args, product_ids):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.args = args
+        self.product_ids = product_ids
+        self.rng = random.Random(args.seed)
+        self.extra_info = {}
+
+    def client(self, supplier=False, admin=False):
+        """A test client; ``supplier`` signs it in to datagen's supplier console, ``admin`` to the all-supplier view."""
+
+        client = self.app.test_client()
+        if supplier:
+            conn = self.app_module.get_db()
+            try:
+                linked = self.app_module.repository.supplier_for_email(conn, datagen.SUPPLIER_EMAIL)
+            finally:
+                conn.close()
+            with client.session_transaction() as session:
+                session['supplier_user'] = {
+                    'id': None,
+                    'name': 'Bench Supplier',
+                    'email': datagen.SUPPLIER_EMAIL,
+                    'admin': admin,
+                    'supplier_id': str(linked['Id']),
+                    'supplier_name': linked['Name'],
+                }
+        return client
+
+
+def _expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}')
+    return response
+
+
+@scenario('storefront_render', group='storefront')
+def storefront_render(ctx):
+    client = ctx.client()
+    return lambda: _expect(client.get('/storefront'), 200)
+
+
+@scenario('storefront_search', group='storefront')
+def storefront_search(ctx):
+    client = ctx.client()
+    queries = ['/storefront?search=Premium', '/storefront?category=Electronics', '/storefront?search=Lamp&category=Home+%26+Kitchen']
+    return lambda: _expect(client.get(ctx.rng.choice(queries)), 200)
+
+
+@scenario('product_detail', group='storefront')
+def product_detail(ctx):
+    client = ctx.client()
+    return lambda: _expect(client.get(f'/product/{ctx.rng.choice(ctx.product_ids)}'), 200)
+
+
+@scenario('dashboard_analytics', group='dashboard')
+def dashboard_analytics(ctx):
+    client = ctx.client(supplier=True)
+    return lambda: _expect(client.get('/'), 200)
+
+
+@scenario('dashboard_search', group='dashboard')
+def dashboard_search(ctx):
+    client = ctx.client(supplier=True)
+    return lambda: _expect(client.get('/?search=Smart'), 200)
+
+
+@scenario('dashboard_all_suppliers', group='dashboard')
+def dashboard_all_suppliers(ctx):
+    client = ctx.client(supplier=True, admin=True)
+    return lambda: _expect(client.get('/'), 200)
+
+
+@scenario('reorder_suggestions', group='dashboard')
+def reorder_suggestions(ctx):
+    client = ctx.client(supplier=True, admin=True)
+    return lambda: _expect(client.get('/reorder?show=all'), 200)
+
+
+@scenario('sales_history_load', group='dashboard')
+def sales_history_load(ctx):
+    """A process's first, full-window read of the order history."""
+
+    forecasting = ctx.app_module.forecasting
+
+    def run():
+        conn = ctx.app_module.get_db()
+        try:
+            daily = forecasting.SalesHistory().refresh(conn)
+        finally:
+            conn.close()
+        ctx.extra_info['units'] = int(daily.sum())
+
+    return run
+
+
+@scenario('sales_report', group='dashboard', writes=True)
+def sales_report(ctx):
+    """A year's sales by product from the rollups, across all suppliers."""
+
+    conn = ctx.app_module.get_db()
+    try:
+        ctx.extra_info['product_hours'] = ctx.app_module.rollups.run(conn)
+    finally:
+        conn.close()
+    client = ctx.client(supplier=True, admin=True)
+    return lambda: _expect(client.get('/reports?range=12m&by=product'), 200)
+
+
+@scenario('rollup_backfill', group='writes', writes=True)
+def rollup_backfill(ctx):
+    """Folding the whole order history into empty rollups, as the first `flask rollups` does."""
+
+    rollups = ctx.app_module.rollups
+
+    def clear():
+        conn = ctx.app_module.get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM vanshul_SalesRollup")
+            cursor.execute("DELETE FROM vanshul_JobWatermarks WHERE Name = ?", (rollups.WATERMARK,))
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def run():
+        conn = ctx.app_module.get_db()
+        try:
+            ctx.extra_info['product_hours'] = rollups.run(conn)
+        finally:
+            conn.close()
+
+    return clear, run
+
+
+@scenario('bulk_import', group='writes', writes=True)
+def bulk_import(ctx):
+    rows = ctx.args.import_rows
+    payload = datagen.generate_import_csv(rows, random.Random(ctx.args.seed)).encode('utf-8')
+    # As an admin, so rows keep the suppliers the CSV names
+    client = ctx.client(supplier=True, admin=True)
+    ctx.extra_info['rows'] = rows
+
+    def clear_flashes():
+        # The redirect is not followed, so flashed messages would pile up in the session cookie
+        with client.session_transaction() as session:
+            session.pop('_flashes', None)
+
+    def run():
+        data = {'file': (io.BytesIO(payload), 'bench.csv')}
+        _expect(client.post('/bulk_upload', data=data, content_type='multipart/form-data'), 302)
+
+    return clear_flashes, run
+
+
+@scenario('bulk_import_xlsx', group='writes', writes=True)
+def bulk_import_xlsx(ctx):
+    """``bulk_import`` with the rows in a workbook, read through openpyxl's read-only reader."""
+
+    rows = ctx.args.import_rows
+    payload = datagen.generate_import_xlsx(rows, random.Random(ctx.args.seed))
+    client = ctx.client(supplier=True, admin=True)
+    ctx.extra_info['rows'] = rows
+
+    def clear_flashes():
+        with client.session_transaction() as session:
+            session.pop('_flashes', None)
+
+    def run():
+        data = {'file': (io.BytesIO(payload), 'bench.xlsx')}
+        _expect(client.post('/bulk_upload', data=data, content_type='multipart/form-data'), 302)
+
+    return clear_flashes, run
+
+
+@scenario('concurrent_checkout', group='writes', writes=True)
+def concurrent_checkout(ctx):
+    """``--checkout-threads`` threads each place ``--checkouts-per-thread`` orders for hot products.
+
+    Hot products are restocked before every round; outcome counts include warm-up rounds.
+    """
+
+    threads, per_thread = ctx.args.checkout_threads, ctx.args.checkouts_per_thread
+    hot_products = ctx.product_ids[:20]
+    items = {}
+    for product_id in hot_products:
+        product = ctx.app_module.fetch_product(product_id)
+        items[product_id] = {'product_id': product_id, 'name': product['ItemName'], 'quantity': 1, 'unit_price': float(product['display_price'])}
+    outcomes = {'placed': 0, 'rejected': 0, 'failed': 0}
+    lock = threading.Lock()
+    ctx.extra_info.update(threads=threads, checkouts_per_round=threads * per_thread, outcomes=outcomes)
+
+    def restock():
+        conn = standin.connect(latency=0)
+        try:
+            datagen.restock(conn, hot_products, 1000000)
+        finally:
+            conn.close()
+
+    def customer(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            try:
+                ctx.app_module.create_order_records([items[rng.choice(hot_products)]], 'bench@customer.example')
+                outcome = 'placed'
+            except ValueError:
+                outcome = 'rejected'
+            except Exception:
+                outcome = 'failed'
+            with lock:
+                outcomes[outcome] += 1
+
+    def run():
+        workers = [threading.Thread(target=customer, args=(ctx.rng.random(),)) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    return restock, run
+
+
+def measure(run, rounds, warmup, before_each_round=None):
+    for _ in range(warmup):
+        if before_each_round:
+            before_each_round()
+        run()
+    timings = []
+    for _ in range(rounds):
+        if before_each_round:
+            before_each_round()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarise(timings):
+    ordered = sorted(timings)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [ordered[0]] * 3
+    mean = statistics.fmean(ordered)
+    return {
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': mean,
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'median': statistics.median(ordered),
+        'q1': quartiles[0],
+        'q3': quartiles[2],
+        'iqr': quartiles[2] - quartiles[0],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'rounds': len(ordered),
+        'total': sum(ordered),
+        'ops': 1.0 / mean if mean else 0.0,
+        'data': ordered,
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def commit_info():
+    return {
+        'id': _git('rev-parse', 'HEAD'),
+        'branch': _git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def machine_info():
+    return {
+        'node': platform.node(),
+        'processor': platform.processor(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'release': platform.release(),
+        'python_implementation': platform.python_implementation(),
+        'python_version': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print median changes against ``baseline_path``; return the names that regressed."""
+
+    with open(baseline_path, encoding='utf-8') as handle:
+        baseline = {bench['name']: bench for bench in json.load(handle)['benchmarks']}
+    regressions = []
+    print(f"\n{'scenario':24} {'baseline ms':>12} {'current ms':>12} {'change':>9}")
+    for bench in results['benchmarks']:
+        previous = baseline.get(bench['name'])
+        if previous is None:
+            print(f"{bench['name']:24} {'-':>12} {bench['stats']['median'] * 1000:12.2f} {'new':>9}")
+            continue
+        before, after = previous['stats']['median'], bench['stats']['median']
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(bench['name'])
+            flag = '  REGRESSION'
+        print(f"{bench['name']:24} {before * 1000:12.2f} {after * 1000:12.2f} {change:+8.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='injected per-statement DB latency')
+    parser.add_argument('--import-rows', type=int, default=500)
+    parser.add_argument('--checkout-threads', type=int, default=8)
+    parser.add_argument('--checkouts-per-thread', type=int, default=10)
+    parser.add_argument('--only', help='comma-separated scenario names')
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    parser.add_argument('--compare', dest='baseline_path', help='previous --json output to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent slowdown in median counted as a regression')
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = sorted(set(selected) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    workdir = tempfile.mkdtemp(prefix='vvstore-suite-')
+    base_path = os.path.join(workdir, 'base.db')
+    product_ids = datagen.generate(base_path, products=args.products, orders=args.orders, seed=args.seed)
+
+    os.environ.update(
+        DB_CONNECT_FACTORY='bench.standin:connect',
+        STANDIN_DB_PATH=base_path,
+        STANDIN_LATENCY_MS=str(args.latency_ms),
+        SKIP_SCHEMA_BOOTSTRAP='1',
+    )
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SLOW_REQUEST_MS', '60000')
+    # Measure building the dashboard, not serving it from the per-supplier cache
+    os.environ.setdefault('DASHBOARD_CACHE_SECONDS', '0')
+    import app as app_module
+
+    results = {
+        'machine_info': machine_info(),
+        'commit_info': commit_info(),
+        'datetime': datetime.now(timezone.utc).isoformat(),
+        'version': 'vvstore-bench-1',
+        'params': vars(args),
+        'benchmarks': [],
+    }
+    try:
+        for name in selected:
+            spec = SCENARIOS[name]
+            db_path = base_path
+            if spec['writes']:
+                db_path = os.path.join(workdir, f'{name}.db')
+                shutil.copyfile(base_path, db_path)
+            os.environ['STANDIN_DB_PATH'] = db_path
+
+            ctx = Context(app_module, args, product_ids)
+            prepared = spec['setup'](ctx)
+            before_each_round, run = prepared if isinstance(prepared, tuple) else (None, prepared)
+            stats = summarise(measure(run, args.rounds, args.warmup, before_each_round))
+            results['benchmarks'].append(
+                {'name': name, 'group': spec['group'], 'params': None, 'extra_info': ctx.extra_info, 'stats': stats}
+            )
+            print(
+                f"{name:24} median {stats['median'] * 1000:9.2f} ms  p95 {stats['p95'] * 1000:9.2f} ms  "
+                f"{stats['ops']:8.1f} ops/s  {json.dumps(ctx.extra_info) if ctx.extra_info else ''}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_path)), exist_ok=True)
+        with open(args.json_path, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline_path and compare(results, args.baseline_path, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
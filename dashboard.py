@@ -0,0 +1,122 @@
+"""The supplier console's inventory view: one supplier's catalogue and its analytics.
+
+A supplier account only ever sees its own products; admins see the whole
+catalogue or pick a supplier (see ``app.supplier_scope()``). A supplier's rows
+are read by seeking IX_vanshul_Products_SupplierId, which covers
+``DASHBOARD_COLUMNS`` (migration 0005), so a dashboard costs in proportion to
+that supplier's catalogue however many other suppliers there are.
+
+The unfiltered view is kept per scope in ``DashboardCache`` for
+``DASHBOARD_CACHE_SECONDS`` (default 30): switching tabs back to the dashboard
+does not re-read the catalogue. Searches always go to the database. A
+product upload in this process drops the uploading supplier's view (and the
+full view); stock sold through the storefront shows up once entries expire.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import metrics
+import repository
+
+# What the dashboard renders; IX_vanshul_Products_SupplierId includes all of it (migration 0005)
+DASHBOARD_COLUMNS = 'Id, ItemName, Category, Supplier, PurchasePrice, SellingPrice, SalePrice, ProfitMargin, Quantity, InitialQuantity'
+
+LOW_STOCK_RATIO = 0.4
+
+EMPTY_ANALYTICS = {
+    'total_inventory_value': 0,
+    'potential_revenue': 0,
+    'average_margin': 0,
+    'low_stock_count': 0,
+    'category_distribution': [],
+}
+
+
+def load(conn, supplier_id=None, search_query=None):
+    """The dashboard's products (``supplier_id`` None: every supplier's) with their analytics."""
+
+    products = repository.list_products(conn, DASHBOARD_COLUMNS, search_query=search_query, supplier_id=supplier_id)
+    return summarise(products)
+
+
+def summarise(products):
+    total_quantity = sum(row.get('Quantity', 0) or 0 for row in products)
+    total_inventory_value = sum((row.get('Quantity', 0) or 0) * (row.get('PurchasePrice') or 0) for row in products)
+    potential_revenue = sum((row.get('Quantity', 0) or 0) * (row.get('SellingPrice') or 0) for row in products)
+    margins = [row.get('ProfitMargin') for row in products if row.get('ProfitMargin') is not None]
+    avg_margin = round(sum(margins) / len(margins), 2) if margins else 0.0
+
+    low_stock_items = []
+    category_distribution = defaultdict(int)
+    for row in products:
+        qty = row.get('Quantity') or 0
+        initial_qty = row.get('InitialQuantity') or qty
+        if initial_qty <= 0:
+            stock_ratio = 1
+        else:
+            stock_ratio = qty / initial_qty
+        row['InitialQuantity'] = initial_qty
+        row['stock_ratio'] = stock_ratio
+        row['is_low_stock'] = initial_qty > 0 and stock_ratio <= LOW_STOCK_RATIO
+        if row['is_low_stock']:
+            low_stock_items.append(row)
+        category_distribution[(row.get('Category') or 'Uncategorised').strip() or 'Uncategorised'] += qty
+
+    return {
+        'inventory': products,
+        'total_quantity': total_quantity,
+        'low_stock_items': low_stock_items,
+        'analytics': {
+            'total_inventory_value': total_inventory_value,
+            'potential_revenue': potential_revenue,
+            'average_margin': avg_margin,
+            'low_stock_count': len(low_stock_items),
+            'category_distribution': sorted(category_distribution.items(), key=lambda item: item[1], reverse=True),
+        },
+    }
+
+
+class DashboardCache:
+    """Dashboards by scope (a SupplierId, or None for the full view), each kept for ``ttl`` seconds."""
+
+    def __init__(self, ttl=30.0, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope, loader, refresh=False):
+        key = str(scope).lower() if scope is not None else None
+        now = time.monotonic()
+        if not refresh:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    metrics.cache_lookup('dashboard', True)
+                    return entry[0]
+        metrics.cache_lookup('dashboard', False)
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, scope):
+        """Drop ``scope``'s dashboard and the full view that includes it."""
+
+        with self._lock:
+            self._entries.pop(str(scope).lower(), None)
+            self._entries.pop(None, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = DashboardCache(ttl=float(os.getenv('DASHBOARD_CACHE_SECONDS', '30')))
@@ -0,0 +1,456 @@
+"""Database backends: everything that differs between SQL Server, PostgreSQL and SQLite.
+
+The rest of the app speaks DB-API in pyodbc's style -- ``?`` placeholders,
+``cursor.execute(sql, params)``, ``nextset()`` -- against the tables in
+schema.py. A ``Dialect`` supplies the connection, the driver's exception
+classes and the few fragments of SQL that are not portable (row limits,
+case-insensitive ``LIKE``, dates and hours of timestamps, the clock rows are
+stamped with, the column catalogue, multi-statement batches).
+PostgreSQL and SQLite connections are wrapped so they accept the same calls.
+
+Pick the backend with ``DB_BACKEND``:
+
+    mssql (default)   pyodbc; DB_SERVER, DB_NAME, DB_USER, DB_PASSWORD, DB_DRIVER
+    postgresql        psycopg 3 (or psycopg2); DATABASE_URL
+    sqlite            standard library; SQLITE_PATH (a file, or ``:memory:``)
+
+and bound how long the server may keep a request waiting with
+``DB_CONNECT_TIMEOUT`` (seconds to establish a connection, default 5) and
+``DB_QUERY_TIMEOUT`` (seconds a statement may run, default 30, 0 for no
+limit). Both apply to SQL Server and PostgreSQL; SQLite only waits on its own
+file locks.
+
+SQL Server stays the production backend and the only one whose schema comes
+from the T-SQL scripts in migrations/; the others are created from schema.py
+(see migrate.py). Drivers are imported on first use, so only the selected
+backend's driver needs to be installed. Read replicas of any backend are
+configured in replicas.py.
+"""
+
+import functools
+import itertools
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from sqlalchemy.dialects import mssql, postgresql
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+
+import schema
+
+DEFAULT_BACKEND = 'mssql'
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'vvstore.db')
+
+# Matches string literals (left untouched), literal percent signs and qmark placeholders
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|%|\?")
+
+
+def _env_seconds(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class Dialect:
+    name = None
+    # The schema is created and evolved by the T-SQL scripts in migrations/
+    runs_migration_scripts = False
+    # Several SELECTs can be sent as one batch and read back with nextset()
+    supports_batches = False
+    # Case-insensitive pattern match (SQL Server and SQLite's LIKE already are)
+    like_operator = 'LIKE'
+    # Table hint and statement suffix making a SELECT lock the rows it reads until the transaction ends
+    row_lock_hint = ''
+    row_lock_suffix = ' FOR UPDATE'
+    # The database's clock, as the CreatedAt defaults stamp rows with it (SQLite: UTC)
+    current_timestamp = 'CURRENT_TIMESTAMP'
+
+    def __init__(self):
+        self._driver = None
+        self.connect_timeout = _env_seconds('DB_CONNECT_TIMEOUT', 5.0)
+        self.query_timeout = _env_seconds('DB_QUERY_TIMEOUT', 30.0)
+
+    @property
+    def driver(self):
+        """The DB-API module; imported on first use (ImportError if it is not installed)."""
+
+        if self._driver is None:
+            self._driver = self._import_driver()
+        return self._driver
+
+    @property
+    def Error(self):
+        return self.driver.Error
+
+    @property
+    def IntegrityError(self):
+        return self.driver.IntegrityError
+
+    @property
+    def ProgrammingError(self):
+        """Raised for a missing table or column."""
+
+        return self.driver.ProgrammingError
+
+    def _import_driver(self):
+        raise NotImplementedError
+
+    def raw_connect(self):
+        """A connection straight from the driver (what SQLAlchemy's engine wants)."""
+
+        raise NotImplementedError
+
+    def connect(self):
+        """A connection accepting pyodbc-style calls (what the app's SQL wants)."""
+
+        return _Connection(self.raw_connect(), self)
+
+    def sqlalchemy_dialect(self):
+        """The SQLAlchemy dialect used to compile schema.py DDL for this backend."""
+
+        raise NotImplementedError
+
+    def sqlalchemy_url(self):
+        """Engine URL naming dialect and driver; connections come from raw_connect()."""
+
+        raise NotImplementedError
+
+    def engine_options(self):
+        """Extra ``create_engine()`` arguments; the default ``creator`` is raw_connect()."""
+
+        return {}
+
+    def describe(self):
+        return self.name
+
+    def replica(self, target):
+        """A dialect for a read replica of this database; ``target`` is a DB_REPLICAS entry (see replicas.py)."""
+
+        return type(self)(target)
+
+    def limit(self, select, params, count):
+        """Return ``(sql, params)`` for ``select`` restricted to its first ``count`` rows."""
+
+        return f"{select.rstrip()} LIMIT ?", (*params, count)
+
+    def date_of(self, expression):
+        """SQL for the calendar date of the timestamp ``expression``."""
+
+        return f"CAST({expression} AS DATE)"
+
+    def hour_of(self, expression):
+        """SQL for the timestamp ``expression`` truncated to the start of its hour."""
+
+        return f"date_trunc('hour', {expression})"
+
+    def executemany_bulk(self, cursor, sql, rows):
+        """``cursor.executemany(sql, rows)`` for a large batch of plain-typed rows, sent as efficiently as the driver can."""
+
+        cursor.executemany(sql, rows)
+
+    def columns_query(self, tables, columns):
+        """Return ``(sql, params)`` listing which of ``columns`` exist in which of ``tables``.
+
+        Rows are ``(table_name, column_name)``; names are matched case-insensitively.
+        """
+
+        table_marks = ', '.join('?' for _ in tables)
+        column_marks = ', '.join('?' for _ in columns)
+        return (
+            f"""
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE LOWER(TABLE_NAME) IN ({table_marks}) AND LOWER(COLUMN_NAME) IN ({column_marks})
+            """,
+            (*(name.lower() for name in tables), *(name.lower() for name in columns)),
+        )
+
+
+class MssqlDialect(Dialect):
+    name = 'mssql'
+    runs_migration_scripts = True
+    supports_batches = True
+    row_lock_hint = ' WITH (UPDLOCK, ROWLOCK)'
+    row_lock_suffix = ''
+    # The migrations' DEFAULT GETDATE(): the server's local time, not UTC
+    current_timestamp = 'GETDATE()'
+
+    def __init__(self, server=None, read_only=False):
+        super().__init__()
+        self.server = server or os.getenv('DB_SERVER', '208.91.198.196')
+        self.read_only = read_only
+
+    def _import_driver(self):
+        import pyodbc
+
+        return pyodbc
+
+    def raw_connect(self):
+        database = os.getenv('DB_NAME', 'ICP')
+        username = os.getenv('DB_USER', 'ICP')
+        password = os.getenv('DB_PASSWORD', 'Teams@@2578')
+        driver = os.getenv('DB_DRIVER', '{ODBC Driver 18 for SQL Server}')
+        conn_str = (
+            fr'DRIVER={driver};SERVER={self.server};DATABASE={database};'
+            fr'UID={username};PWD={password};Encrypt=yes;TrustServerCertificate=yes;'
+        )
+        if self.read_only:
+            # Lets an availability group listener route the session to a readable secondary
+            conn_str += 'ApplicationIntent=ReadOnly;'
+        conn = self.driver.connect(conn_str, timeout=int(self.connect_timeout))
+        # pyodbc cancels statements running longer than this (0 = wait forever)
+        conn.timeout = int(self.query_timeout)
+        return conn
+
+    def connect(self):
+        return self.raw_connect()
+
+    def sqlalchemy_dialect(self):
+        return mssql.dialect()
+
+    def sqlalchemy_url(self):
+        return 'mssql+pyodbc://'
+
+    def describe(self):
+        return f"mssql ({self.server}/{os.getenv('DB_NAME', 'ICP')})"
+
+    def replica(self, target):
+        return type(self)(target, read_only=True)
+
+    def limit(self, select, params, count):
+        # TOP (?) keeps the limit a parameter, so every page size shares one cached plan
+        return re.sub(r'^\s*SELECT\b', 'SELECT TOP (?)', select, count=1, flags=re.IGNORECASE), (count, *params)
+
+    def hour_of(self, expression):
+        return f"DATEADD(hour, DATEDIFF(hour, 0, {expression}), 0)"
+
+    def executemany_bulk(self, cursor, sql, rows):
+        # pyodbc otherwise sends one statement per row; this ships the parameter array in one go
+        cursor.fast_executemany = True
+        try:
+            cursor.executemany(sql, rows)
+        finally:
+            cursor.fast_executemany = False
+
+
+class PostgresDialect(Dialect):
+    name = 'postgresql'
+    like_operator = 'ILIKE'
+    # CURRENT_TIMESTAMP defaults are stored in TIMESTAMP columns as the session's local time
+    current_timestamp = 'LOCALTIMESTAMP'
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or os.getenv('DATABASE_URL', 'postgresql://localhost/vvstore')
+
+    def _import_driver(self):
+        try:
+            import psycopg
+        except ImportError:
+            import psycopg2 as psycopg
+        return psycopg
+
+    def raw_connect(self):
+        options = {'connect_timeout': int(self.connect_timeout)}
+        if self.query_timeout:
+            options['options'] = f'-c statement_timeout={int(self.query_timeout * 1000)}'
+        return self.driver.connect(self.url, **options)
+
+    def sqlalchemy_dialect(self):
+        return postgresql.dialect()
+
+    def sqlalchemy_url(self):
+        return f'postgresql+{self.driver.__name__}://'
+
+    def describe(self):
+        return f"postgresql ({self.url.rpartition('@')[2]})"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def translate(sql):
+        """qmark placeholders to the driver's ``%s`` (escaping literal ``%`` outside strings)."""
+
+        def replace(match):
+            token = match.group(0)
+            if token == '?':
+                return '%s'
+            return '%%' if token == '%' else token
+
+        return _PLACEHOLDER_RE.sub(replace, sql)
+
+    def canonical_description(self, description):
+        # schema.py names are created unquoted, so PostgreSQL folds them (and result columns) to lower case
+        return [(schema.CANONICAL_NAMES.get(column[0], column[0]), *tuple(column)[1:]) for column in description]
+
+
+class SqliteDialect(Dialect):
+    name = 'sqlite'
+    # A transaction that has written already holds the database's single write lock
+    row_lock_suffix = ''
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or os.getenv('SQLITE_PATH', DEFAULT_SQLITE_PATH)
+        self._keepalive = None
+        if self.path == ':memory:':
+            # One shared in-memory database per dialect, kept alive between connections
+            self._target = f'file:vvstore-{id(self)}?mode=memory&cache=shared'
+            self._keepalive = sqlite3.connect(self._target, uri=True, check_same_thread=False)
+        else:
+            self._target = self.path
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _import_driver(self):
+        sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+        sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+        return sqlite3
+
+    @property
+    def ProgrammingError(self):
+        # sqlite3 reports a missing table or column as OperationalError
+        return (sqlite3.ProgrammingError, sqlite3.OperationalError)
+
+    def raw_connect(self, detect_types=sqlite3.PARSE_DECLTYPES):
+        raw = self.driver.connect(
+            self._target,
+            uri=self._keepalive is not None,
+            detect_types=detect_types,
+            check_same_thread=False,
+            timeout=30,
+        )
+        raw.execute('PRAGMA foreign_keys = ON')
+        if self._keepalive is None:
+            raw.execute('PRAGMA journal_mode = WAL')
+        return raw
+
+    def sqlalchemy_dialect(self):
+        return sqlite_dialect.dialect()
+
+    def sqlalchemy_url(self):
+        # The path only picks SQLAlchemy's pool (per-thread for memory, queued for files)
+        return 'sqlite://' if self._keepalive is not None else f'sqlite:///{self.path}'
+
+    def engine_options(self):
+        # SQLAlchemy converts DATETIME text itself
+        return {'creator': lambda: self.raw_connect(detect_types=0)}
+
+    def describe(self):
+        return f'sqlite ({self.path})'
+
+    def date_of(self, expression):
+        # Timestamps are ISO text; CAST would keep only the year
+        return f"date({expression})"
+
+    def hour_of(self, expression):
+        return f"strftime('%Y-%m-%d %H:00:00', {expression})"
+
+    def columns_query(self, tables, columns):
+        table_marks = ', '.join('?' for _ in tables)
+        column_marks = ', '.join('?' for _ in columns)
+        return (
+            f"""
+            SELECT m.name, c.name
+            FROM sqlite_master m JOIN pragma_table_info(m.name) c
+            WHERE m.type = 'table' AND LOWER(m.name) IN ({table_marks}) AND LOWER(c.name) IN ({column_marks})
+            """,
+            (*(name.lower() for name in tables), *(name.lower() for name in columns)),
+        )
+
+
+class _Cursor:
+    """pyodbc-style cursor over another DB-API driver."""
+
+    def __init__(self, cursor, dialect):
+        self._cursor = cursor
+        self._dialect = dialect
+
+    @property
+    def description(self):
+        description = self._cursor.description
+        if description is None:
+            return None
+        canonical_description = getattr(self._dialect, 'canonical_description', None)
+        return canonical_description(description) if canonical_description else description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        translate = getattr(self._dialect, 'translate', None)
+        self._cursor.execute(translate(sql) if translate else sql, tuple(params))
+        return self
+
+    def executemany(self, sql, rows):
+        translate = getattr(self._dialect, 'translate', None)
+        self._cursor.executemany(translate(sql) if translate else sql, [tuple(row) for row in rows])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def nextset(self):
+        # Batches are only sent to backends with supports_batches
+        return False
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    def __init__(self, raw, dialect):
+        self._raw = raw
+        self._dialect = dialect
+
+    def cursor(self):
+        return _Cursor(self._raw.cursor(), self._dialect)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._raw.close()
+
+
+BACKENDS = {
+    'mssql': MssqlDialect,
+    'postgresql': PostgresDialect,
+    'sqlite': SqliteDialect,
+}
+_ALIASES = {'sqlserver': 'mssql', 'postgres': 'postgresql', 'sqlite3': 'sqlite'}
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def get(name, **options):
+    """Return a new dialect for backend ``name``; ValueError if it is unknown."""
+
+    key = _ALIASES.get(name.lower(), name.lower())
+    if key not in BACKENDS:
+        choices = ', '.join(itertools.chain(BACKENDS, _ALIASES))
+        raise ValueError(f"Unknown database backend {name!r}; choose from {choices}")
+    return BACKENDS[key](**options)
+
+
+def current():
+    """The process-wide dialect selected by ``DB_BACKEND``."""
+
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                _current = get(os.getenv('DB_BACKEND', DEFAULT_BACKEND))
+    return _current
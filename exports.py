@@ -0,0 +1,225 @@
+"""Catalogue and order exports as CSV, XLSX or Parquet, streamed from the database in batches.
+
+Suppliers used to copy the dashboard into spreadsheets by hand. An export runs
+one query and reads its cursor ``EXPORT_BATCH_SIZE`` rows at a time
+(``fetchmany``); each batch goes straight to the format's writer and is then
+dropped, so an export holds one batch in memory however many rows it has:
+
+    csv      written and sent batch by batch
+    xlsx     openpyxl's write-only workbook, which spools rows to a temporary file
+             instead of keeping them; the finished file is sent from disk. A sheet
+             holds up to 1,048,575 rows, further rows go on further sheets.
+    parquet  pyarrow, one row group per batch, each sent as soon as it is written
+
+Datasets, filtered like the supplier console's search (``index()``) and
+scoped to a supplier's catalogue:
+
+    products  the catalogue with stock on hand, by Id
+    orders    order lines of those products, oldest first, optionally placed in [since, until)
+
+``/export`` streams them to the console (from a replica where there is one);
+``flask export`` writes them to a file.
+
+Configured from the environment:
+
+    EXPORT_BATCH_SIZE  rows read and written at a time (default 5000)
+"""
+
+import csv
+import io
+import os
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import metrics
+import repository
+from rollups import to_datetime
+
+BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE') or 5000)
+
+# Rows per XLSX sheet, under Excel's 1,048,576 with the header
+XLSX_SHEET_ROWS = 1048575
+
+Dataset = namedtuple('Dataset', 'columns open')
+Format = namedtuple('Format', 'mimetype write')
+
+# (column, type): text, number, integer or datetime
+PRODUCT_COLUMNS = (
+    ('Id', 'text'),
+    ('ItemName', 'text'),
+    ('Category', 'text'),
+    ('Supplier', 'text'),
+    ('PurchasePrice', 'number'),
+    ('SellingPrice', 'number'),
+    ('SalePrice', 'number'),
+    ('ProfitMargin', 'number'),
+    ('Quantity', 'integer'),
+    ('InitialQuantity', 'integer'),
+    ('CreatedAt', 'datetime'),
+)
+ORDER_COLUMNS = (
+    ('OrderNumber', 'text'),
+    ('CreatedAt', 'datetime'),
+    ('Status', 'text'),
+    ('ProductId', 'text'),
+    ('ItemName', 'text'),
+    ('Category', 'text'),
+    ('Supplier', 'text'),
+    ('Quantity', 'integer'),
+    ('UnitPrice', 'number'),
+    ('LineTotal', 'number'),
+)
+
+
+def _open_products(conn, clauses, params, since=None, until=None):
+    columns = ', '.join(name for name, _ in PRODUCT_COLUMNS)
+    return repository.open_product_export(conn, clauses, params, columns)
+
+
+DATASETS = {
+    'products': Dataset(PRODUCT_COLUMNS, _open_products),
+    'orders': Dataset(ORDER_COLUMNS, repository.open_order_export),
+}
+
+
+def open_export(conn, dataset, search_query=None, supplier_id=None, since=None, until=None):
+    """Execute ``dataset``'s export query and return the cursor for ``stream()``."""
+
+    clauses, params = repository.catalogue_filters(search_query, supplier_id)
+    return DATASETS[dataset].open(conn, clauses, params, since=since, until=until)
+
+
+def _convert(value, kind):
+    if value is None:
+        return None
+    if kind == 'datetime':
+        return to_datetime(value)
+    if kind == 'integer':
+        return int(value)
+    if kind == 'number':
+        return float(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def batches(cursor, columns, size=BATCH_SIZE):
+    """The cursor's rows, ``size`` at a time, with values converted to ``columns``' types."""
+
+    kinds = [kind for _, kind in columns]
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield [[_convert(value, kind) for value, kind in zip(row, kinds)] for row in rows]
+
+
+def write_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for batch in rows:
+        writer.writerows([value.isoformat(' ') if isinstance(value, datetime) else value for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(columns, rows, chunk_size=1024 * 1024):
+    from openpyxl import Workbook
+
+    # Write-only: appended rows go to a temporary file, not an in-memory worksheet
+    workbook = Workbook(write_only=True)
+    header = [name for name, _ in columns]
+    sheet, sheet_rows, sheets = None, XLSX_SHEET_ROWS, 0
+    for batch in rows:
+        for row in batch:
+            if sheet_rows == XLSX_SHEET_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(f'Export {sheets}' if sheets > 1 else 'Export')
+                sheet.append(header)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet('Export').append(header)
+    with tempfile.TemporaryFile() as handle:
+        workbook.save(handle)
+        handle.seek(0)
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class _Chunks(io.RawIOBase):
+    """A write-only file whose contents so far can be taken away and sent."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_ARROW_TYPES = {'text': 'string', 'number': 'float64', 'integer': 'int64', 'datetime': 'timestamp[us]'}
+
+
+def write_parquet(columns, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.type_for_alias(_ARROW_TYPES[kind])) for name, kind in columns])
+    sink = _Chunks()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in rows:
+            # One row group per batch, handed over as soon as it is written
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+FORMATS = {
+    'csv': Format('text/csv', write_csv),
+    'xlsx': Format('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', write_xlsx),
+    'parquet': Format('application/vnd.apache.parquet', write_parquet),
+}
+
+
+def stream(cursor, dataset, fmt):
+    """The export file, in chunks, from the open ``cursor`` of ``open_export(dataset)``."""
+
+    started = time.perf_counter()
+    columns = DATASETS[dataset].columns
+    counted = _count(batches(cursor, columns), dataset, fmt)
+    try:
+        yield from FORMATS[fmt].write(columns, counted)
+    finally:
+        metrics.EXPORT_LATENCY.labels(fmt).observe(time.perf_counter() - started)
+
+
+def _count(rows, dataset, fmt):
+    for batch in rows:
+        metrics.EXPORT_ROWS.labels(dataset, fmt).inc(len(batch))
+        yield batch
@@ -0,0 +1,223 @@
+"""Reorder suggestions from each product's sales velocity.
+
+The dashboard flags stock that has fallen below 40% of what was first loaded,
+however fast or slowly it sells. Here each product's daily unit sales over the
+last ``FORECAST_HISTORY_DAYS`` are averaged, recent days weighted more (a day
+``FORECAST_HALF_LIFE_DAYS`` old counts half), into its sales velocity, and:
+
+    days_of_cover    Quantity / velocity: days until it sells out at the current pace
+    safety_stock     z * deviation of daily sales * sqrt(lead time): cover for a busier lead time than usual
+    reorder_point    velocity * lead time + safety stock: at or below it, reorder now
+    suggested_order  units bringing stock up to velocity * (lead time + review period) + safety stock
+
+Days before a product was added do not count, and today counts for the part
+of it that has passed, so new products and today's sales are not diluted.
+Days are those of the database's clock (``repository.database_now()``), which
+stamps the orders and products, so they split at the same midnight.
+
+Configured from the environment:
+
+    FORECAST_HISTORY_DAYS     days of order history considered (default 90)
+    FORECAST_HALF_LIFE_DAYS   age in days at which a day's sales count half (default 14)
+    FORECAST_LEAD_TIME_DAYS   days from placing a reorder to receiving it (default 7)
+    FORECAST_REVIEW_DAYS      days until stock is next reviewed (default 14)
+    FORECAST_SERVICE_Z        safety factor; 1.65 covers demand on ~95% of lead times (default)
+    FORECAST_REFRESH_SECONDS  how often a process picks up new orders (default 60)
+
+Each process keeps ``history``, the per-product daily totals of the window, in
+memory. Its first refresh reads the window's totals, summed per product and
+day by the database; later refreshes only re-read orders from the start of
+the last day already loaded and replace those days' totals, so a refresh
+costs a day's orders however long the history. The forecast is numpy over a
+products x days matrix. Orders placed before a refresh but committed after it
+are picked up on the next one unless they straddle midnight.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import repository
+
+logger = logging.getLogger('app.forecasting')
+
+# What forecast() needs of each product; the dashboard's columns plus CreatedAt
+PRODUCT_COLUMNS = 'Id, ItemName, Category, Supplier, Quantity, CreatedAt'
+
+BATCH_SIZE = 50000
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+HISTORY_DAYS = int(_env_float('FORECAST_HISTORY_DAYS', 90))
+HALF_LIFE_DAYS = _env_float('FORECAST_HALF_LIFE_DAYS', 14.0)
+LEAD_TIME_DAYS = _env_float('FORECAST_LEAD_TIME_DAYS', 7.0)
+REVIEW_DAYS = _env_float('FORECAST_REVIEW_DAYS', 14.0)
+SERVICE_Z = _env_float('FORECAST_SERVICE_Z', 1.65)
+
+_EMPTY = pd.Series([], index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=['ProductId', 'Day']), dtype='int64')
+
+
+def _day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def daily_units(conn, since):
+    """Units sold per ``(ProductId, Day)`` by orders placed since ``since``."""
+
+    # Summed per day by the database: the driver handing over every order line was most of the cost
+    cursor = repository.open_daily_sales(conn, since)
+    totals = []
+    try:
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            product_ids, sale_dates, units = zip(*rows)
+            index = pd.MultiIndex.from_arrays(
+                [pd.Index(product_ids).astype(str), pd.to_datetime(pd.Series(sale_dates), format='ISO8601')],
+                names=['ProductId', 'Day'],
+            )
+            totals.append(pd.Series(np.asarray(units, dtype='int64'), index=index))
+    finally:
+        cursor.close()
+    if not totals:
+        return _EMPTY
+    return pd.concat(totals)
+
+
+class SalesHistory:
+    """Daily unit sales per product over the last ``history_days``, kept current incrementally."""
+
+    def __init__(self, history_days=HISTORY_DAYS, refresh_seconds=60.0):
+        self.history_days = history_days
+        self.refresh_seconds = refresh_seconds
+        self._daily = None
+        self._loaded_from = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def daily(self, connect):
+        """The daily totals, first refreshing them from ``connect()`` if they are due."""
+
+        if self._daily is None:
+            with self._lock:
+                if self._daily is None:
+                    self._refresh_with(connect)
+        elif time.monotonic() - self._refreshed_at >= self.refresh_seconds and self._lock.acquire(blocking=False):
+            # One thread refreshes; the others keep using the last totals meanwhile
+            try:
+                self._refresh_with(connect)
+            except Exception as e:
+                # Retried after another refresh_seconds; the last totals are still good
+                self._refreshed_at = time.monotonic()
+                logger.warning("Could not refresh sales history: %s", e)
+            finally:
+                self._lock.release()
+        return self._daily
+
+    def _refresh_with(self, connect):
+        conn = connect()
+        try:
+            self.refresh(conn)
+        finally:
+            conn.close()
+
+    def refresh(self, conn):
+        """Load order lines placed since the last refresh's day (the whole window the first time)."""
+
+        started = time.perf_counter()
+        # Sale days are dates of GETDATE() stamps (server local time), so "today" is the database's
+        now = repository.database_now(conn)
+        window_start = _day(now) - timedelta(days=self.history_days - 1)
+        mode = 'full' if self._daily is None else 'incremental'
+        since = window_start if mode == 'full' else max(window_start, self._loaded_from)
+        fresh = daily_units(conn, since)
+        if mode == 'full':
+            daily = fresh
+        else:
+            days = self._daily.index.get_level_values('Day')
+            kept = self._daily[(days >= window_start) & (days < since)]
+            daily = pd.concat([kept, fresh])
+        self._daily = daily.sort_index()
+        self._loaded_from = _day(now)
+        self._refreshed_at = time.monotonic()
+        elapsed = time.perf_counter() - started
+        metrics.FORECAST_REFRESH_LATENCY.labels(mode).observe(elapsed)
+        logger.info("Sales history %s refresh since %s: %d product-days in %.2fs", mode, since.date(), len(fresh), elapsed)
+        return self._daily
+
+
+def forecast(products, daily, now):
+    """Add velocity, cover and reorder fields to ``products`` (with PRODUCT_COLUMNS); most urgent first.
+
+    ``now`` is by the database's clock (``repository.database_now()``).
+    """
+
+    if not products:
+        return []
+    today = pd.Timestamp(_day(now))
+    days = pd.date_range(end=today, periods=HISTORY_DAYS, freq='D')
+    ids = pd.Index([str(product['Id']) for product in products])
+
+    in_scope = daily[daily.index.get_level_values('ProductId').isin(ids)]
+    units = (
+        in_scope.unstack('Day', fill_value=0).reindex(index=ids, columns=days, fill_value=0).to_numpy(dtype='float64')
+        if len(in_scope)
+        else np.zeros((len(ids), len(days)))
+    )
+
+    # How much of each day counts: none before the product existed, the elapsed part of today
+    created = pd.to_datetime(pd.Series([product.get('CreatedAt') for product in products]), format='ISO8601')
+    created_day = created.dt.floor('D').fillna(days[0]).to_numpy(dtype='datetime64[D]')
+    exposure = (days.to_numpy(dtype='datetime64[D]')[None, :] >= created_day[:, None]).astype('float64')
+    exposure[:, -1] *= max((now - _day(now)).total_seconds() / 86400.0, 1e-3)
+
+    age = np.arange(len(days) - 1, -1, -1, dtype='float64')
+    decay = 0.5 ** (age / HALF_LIFE_DAYS)[None, :]
+    weight = exposure * decay
+    weight_total = weight.sum(axis=1)
+    observed = weight_total > 0
+    # Units per whole day of exposure: sum(decay * units) / sum(decay * exposure)
+    velocity = np.divide((units * decay).sum(axis=1), weight_total, out=np.zeros(len(ids)), where=observed)
+    # Spread over whole days only: a few minutes into today, its rate says little
+    full_weight = weight[:, :-1]
+    full_total = full_weight.sum(axis=1)
+    deviation = units[:, :-1] - velocity[:, None]
+    variance = np.divide((full_weight * deviation**2).sum(axis=1), full_total, out=np.zeros(len(ids)), where=full_total > 0)
+
+    quantity = np.array([product.get('Quantity') or 0 for product in products], dtype='float64')
+    safety_stock = SERVICE_Z * np.sqrt(variance) * math.sqrt(LEAD_TIME_DAYS)
+    reorder_point = velocity * LEAD_TIME_DAYS + safety_stock
+    order_up_to = velocity * (LEAD_TIME_DAYS + REVIEW_DAYS) + safety_stock
+    selling = velocity > 0
+    days_of_cover = np.divide(quantity, velocity, out=np.full(len(ids), np.inf), where=selling)
+    suggested = np.where(selling, np.ceil(np.maximum(order_up_to - quantity, 0)), 0)
+    needs_reorder = selling & (quantity <= reorder_point)
+
+    for index, product in enumerate(products):
+        cover = days_of_cover[index]
+        product.update(
+            velocity=round(float(velocity[index]), 2),
+            days_of_cover=None if math.isinf(cover) else round(float(cover), 1),
+            stockout_date=None if math.isinf(cover) else (now + timedelta(days=float(cover))).date(),
+            safety_stock=math.ceil(safety_stock[index]),
+            reorder_point=math.ceil(reorder_point[index]),
+            suggested_order=int(suggested[index]),
+            needs_reorder=bool(needs_reorder[index]),
+        )
+    order = np.lexsort((-velocity, days_of_cover, ~needs_reorder))
+    return [products[index] for index in order]
+
+
+history = SalesHistory(refresh_seconds=_env_float('FORECAST_REFRESH_SECONDS', 60.0))
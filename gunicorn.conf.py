@@ -0,0 +1,72 @@
+"""Gunicorn settings for the inventory app.
+
+Preforked workers, each serving ``GUNICORN_THREADS`` requests concurrently.
+``kill -HUP <master>`` performs a graceful reload: new workers are started with
+freshly imported code and old ones finish their in-flight requests before
+exiting. Workers are recycled after ``GUNICORN_MAX_REQUESTS`` requests (plus
+jitter so they do not all restart together) to bound memory growth.
+
+Behind a reverse proxy or load balancer, set ``TRUSTED_PROXY_HOPS`` to the
+number of proxies in front of gunicorn so the app sees clients' addresses
+(X-Forwarded-For) rather than the proxy's; sign-in rate limits key on them.
+
+Workers share ``PROMETHEUS_MULTIPROC_DIR`` (a fresh temporary directory unless
+set) so ``/metrics`` on any worker reports totals for the whole server.
+"""
+
+import glob
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+wsgi_app = os.getenv('GUNICORN_APP', 'wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+# Workers import the app themselves so a HUP reload picks up new code
+preload_app = False
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Apply pending schema migrations once, before the first worker is forked.
+
+    Runs in a child process so the master never imports the app module;
+    otherwise forked workers would inherit the master's copy and reloads
+    would keep serving stale code.
+    """
+    if os.getenv('SKIP_SCHEMA_BOOTSTRAP') != '1':
+        server.log.info('Applying pending schema migrations')
+        subprocess.run(
+            [sys.executable, '-m', 'flask', '--app', 'app', 'migrate'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        )
+    _prepare_metrics_dir(server)
+
+
+def _prepare_metrics_dir(server):
+    # Inherited by every worker; must be set before they import prometheus_client
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(stale)
+    else:
+        metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='vvstore-metrics-')
+    server.log.info('Collecting worker metrics in %s', metrics_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,193 @@
+"""Reading supplier catalogue uploads (/bulk_upload) as rows keyed by static/bulk_template.csv's columns.
+
+Suppliers send their catalogues as CSV or as Excel workbooks; both are read
+row by row into the same validation and insert loop:
+
+    .csv   read as UTF-8 (with or without a byte order mark), one row at a time;
+           other encodings are refused as a whole
+    .xlsx  openpyxl's read-only workbook, which parses a sheet's XML as its rows
+           are iterated instead of loading the workbook, so a large workbook is
+           never held in memory whole. Formulas are read as their saved values.
+           The first sheet whose header has the required columns is imported.
+
+The header is the first non-blank row. Its names are matched to
+``TEMPLATE_COLUMNS`` ignoring case, spaces and punctuation ("Item Name",
+"PURCHASE-PRICE"), and a few common alternatives are understood ("Qty",
+"Cost", "Vendor"; see ``ALIASES``). Other columns are ignored, as are blank
+rows; blank cells are left out of the row, so the loop's defaults apply.
+
+Quantities must be whole numbers in either format: "5", "5.0" and a workbook's
+5.0 are read as 5, while "5.7" or 5.7 stops the import with the row's number
+rather than being truncated.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+TEMPLATE_COLUMNS = ('item_name', 'category', 'supplier', 'purchase_price', 'profit_margin', 'quantity')
+REQUIRED_COLUMNS = ('item_name', 'purchase_price', 'quantity')
+EXTENSIONS = ('.csv', '.xlsx')
+
+# Normalised header name -> template column
+ALIASES = {
+    'item': 'item_name',
+    'name': 'item_name',
+    'product': 'item_name',
+    'product_name': 'item_name',
+    'itemname': 'item_name',
+    'product_category': 'category',
+    'supplier_name': 'supplier',
+    'vendor': 'supplier',
+    'vendor_name': 'supplier',
+    'purchaseprice': 'purchase_price',
+    'cost': 'purchase_price',
+    'cost_price': 'purchase_price',
+    'unit_cost': 'purchase_price',
+    'buy_price': 'purchase_price',
+    'margin': 'profit_margin',
+    'profitmargin': 'profit_margin',
+    'margin_percent': 'profit_margin',
+    'profit_margin_percent': 'profit_margin',
+    'qty': 'quantity',
+    'stock': 'quantity',
+    'units': 'quantity',
+    'on_hand': 'quantity',
+    'quantity_on_hand': 'quantity',
+}
+
+
+class UploadError(Exception):
+    """The upload cannot be imported at all: not a readable file (or not UTF-8), no header with the required columns, or a quantity that is not a whole number."""
+
+
+def accepts(filename):
+    return filename.lower().endswith(EXTENSIONS)
+
+
+def template_column(name):
+    """The template column a header cell names, or None."""
+
+    if name is None:
+        return None
+    normalised = re.sub(r'[^a-z0-9]+', '_', str(name).strip().lower()).strip('_')
+    if normalised in TEMPLATE_COLUMNS:
+        return normalised
+    return ALIASES.get(normalised)
+
+
+def _header(cells):
+    """Each header cell's template column (None for other columns), the first of duplicates only."""
+
+    seen = set()
+    columns = []
+    for cell in cells:
+        column = template_column(cell)
+        if column in seen:
+            column = None
+        seen.add(column)
+        columns.append(column)
+    return columns
+
+
+def _missing(columns):
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+def _value(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _quantity(value, number):
+    """``value`` as a whole number of units, for CSV text and workbook numbers alike."""
+
+    try:
+        units = None if isinstance(value, bool) else Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        units = None
+    if units is None or not units.is_finite() or units != units.to_integral_value():
+        raise UploadError(f'Row {number}: quantity {value} is not a whole number')
+    return int(units)
+
+
+def _records(columns, rows):
+    for number, cells in rows:
+        row = {}
+        for column, value in zip(columns, cells):
+            value = _value(value)
+            if column is not None and value is not None:
+                row[column] = value
+        if 'quantity' in row:
+            row['quantity'] = _quantity(row['quantity'], number)
+        if any(_value(value) is not None for value in cells):
+            yield row
+
+
+def _first_filled(rows):
+    for _, cells in rows:
+        if any(_value(value) is not None for value in cells):
+            return cells
+    return None
+
+
+def _utf8(reader):
+    # Decoding happens as rows are read, so a bad byte can turn up anywhere in the file
+    try:
+        yield from reader
+    except UnicodeDecodeError as e:
+        raise UploadError('The file is not UTF-8 text; save it as "CSV UTF-8" and upload it again') from e
+
+
+def _csv_rows(stream):
+    # Uploads arrive as a binary stream; csv needs text
+    # Rows are numbered as a spreadsheet shows them, header included
+    reader = enumerate(_utf8(csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))), start=1)
+    header = _first_filled(reader)
+    columns = _header(header or [])
+    missing = _missing(columns)
+    if missing:
+        raise UploadError(f"Missing columns: {', '.join(missing)}")
+    return _records(columns, reader)
+
+
+def _xlsx_rows(workbook):
+    for sheet in workbook.worksheets:
+        rows = enumerate(sheet.iter_rows(values_only=True), start=1)
+        header = _first_filled(rows)
+        if header is None:
+            continue
+        columns = _header(header)
+        if not _missing(columns):
+            return _records(columns, rows)
+    raise UploadError(f"No sheet has the columns {', '.join(REQUIRED_COLUMNS)}")
+
+
+@contextmanager
+def open_rows(file):
+    """The uploaded ``file``'s rows as dicts keyed by template column.
+
+    Raises ``UploadError`` before the first row, or for a CSV that is not UTF-8, while its rows are read.
+    """
+
+    if file.filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            # The upload is spooled to a seekable file, which the zip reader needs
+            workbook = load_workbook(file.stream, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError) as e:
+            raise UploadError(f'Not a readable .xlsx workbook ({e})') from e
+        try:
+            yield _xlsx_rows(workbook)
+        finally:
+            # Read-only workbooks keep the archive open until closed
+            workbook.close()
+    else:
+        yield _csv_rows(file.stream)
@@ -0,0 +1,91 @@
+"""Report how the app's indexes are used, and which ones SQL Server thinks are missing.
+
+    python index_usage.py            # uses the same DB_* settings as app.py
+
+Usage counters come from sys.dm_db_index_usage_stats and reset when SQL Server
+restarts, so read them after the app has served representative traffic.
+"""
+
+import sys
+
+TABLE_FILTER = "(t.name LIKE 'vanshul[_]%' OR t.name = 'Customers')"
+
+USAGE_QUERY = f"""
+SELECT
+    t.name AS TableName,
+    i.name AS IndexName,
+    i.type_desc AS IndexType,
+    COALESCE(s.user_seeks, 0) AS Seeks,
+    COALESCE(s.user_scans, 0) AS Scans,
+    COALESCE(s.user_lookups, 0) AS Lookups,
+    COALESCE(s.user_updates, 0) AS Updates,
+    ps.row_count AS RowsCount,
+    ps.used_page_count * 8 AS UsedKB
+FROM sys.indexes i
+JOIN sys.tables t ON t.object_id = i.object_id
+LEFT JOIN sys.dm_db_index_usage_stats s
+    ON s.object_id = i.object_id AND s.index_id = i.index_id AND s.database_id = DB_ID()
+LEFT JOIN sys.dm_db_partition_stats ps
+    ON ps.object_id = i.object_id AND ps.index_id = i.index_id
+WHERE {TABLE_FILTER} AND i.type > 0
+ORDER BY t.name, i.index_id
+"""
+
+MISSING_QUERY = f"""
+SELECT
+    t.name AS TableName,
+    d.equality_columns AS EqualityColumns,
+    d.inequality_columns AS InequalityColumns,
+    d.included_columns AS IncludedColumns,
+    gs.user_seeks AS Seeks,
+    CAST(gs.avg_user_impact AS DECIMAL(5, 1)) AS AvgImpactPct
+FROM sys.dm_db_missing_index_details d
+JOIN sys.dm_db_missing_index_groups g ON g.index_handle = d.index_handle
+JOIN sys.dm_db_missing_index_group_stats gs ON gs.group_handle = g.index_group_handle
+JOIN sys.tables t ON t.object_id = d.object_id
+WHERE d.database_id = DB_ID() AND {TABLE_FILTER}
+ORDER BY gs.user_seeks * gs.avg_user_impact DESC
+"""
+
+
+def fetch(conn, query):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        columns = [column[0] for column in cursor.description]
+        return columns, [list(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def format_table(columns, rows):
+    cells = [[str(value) if value is not None else '' for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[index]) for row in cells]) for index, column in enumerate(columns)]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append('  '.join('-' * width for width in widths))
+    lines.extend('  '.join(value.ljust(width) for value, width in zip(row, widths)) for row in cells)
+    return '\n'.join(lines)
+
+
+def report(conn, out=sys.stdout):
+    columns, rows = fetch(conn, USAGE_QUERY)
+    out.write('Index usage since last SQL Server restart\n')
+    out.write(format_table(columns, rows) + '\n')
+    unused = [row for row in rows if row[3] + row[4] + row[5] == 0 and row[6] > 0]
+    if unused:
+        out.write('\nWritten but never read (candidates to drop):\n')
+        out.write(''.join(f'  {row[0]}.{row[1]}\n' for row in unused))
+
+    columns, rows = fetch(conn, MISSING_QUERY)
+    out.write('\nMissing-index suggestions\n')
+    out.write((format_table(columns, rows) if rows else '  none') + '\n')
+
+
+if __name__ == '__main__':
+    from app import get_db
+
+    connection = get_db()
+    try:
+        report(connection)
+    finally:
+        connection.close()
@@ -0,0 +1,263 @@
+"""Per-request timing: where does a request's time go?
+
+Every request accumulates time per phase:
+
+    db-connect  opening connections in get_db()
+    db          execute()/fetch*()/commit() on instrumented cursors
+    render      Jinja template rendering
+    app         everything else (Python work in the view, hooks)
+
+and reports them in a ``Server-Timing`` response header, which browsers'
+devtools and most load-testing tools display. Each statement is timed with
+its normalised SQL text; statements slower than ``SLOW_QUERY_MS`` (default
+200) and requests slower than ``SLOW_REQUEST_MS`` (default 1000) are logged.
+Other modules can observe every statement via ``query_listeners`` and every
+connection opened/closed via ``connection_listeners``.
+"""
+
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', '200')) / 1000.0
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_MS', '1000')) / 1000.0
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', '1') == '1'
+
+slow_query_logger = logging.getLogger('app.slow_query')
+slow_request_logger = logging.getLogger('app.slow_request')
+
+# Callables ``listener(normalised_sql, seconds, failed)`` invoked after every statement
+query_listeners = []
+# Callables ``listener(event, seconds)``; event is 'connect' (with the time taken) or 'close'
+connection_listeners = []
+
+_local = threading.local()
+
+_STRING_LITERAL_RE = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w@#$])-?\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def normalise_sql(sql):
+    """Collapse whitespace and literals so identical statements group together."""
+
+    text = _STRING_LITERAL_RE.sub('?', sql)
+    text = _NUMBER_RE.sub('?', text)
+    text = _IN_LIST_RE.sub('IN (...)', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+class Timings:
+    def __init__(self):
+        self.phases = {}
+        # Wall-clock seconds covered, for timings collected outside the request
+        self.wall = 0.0
+
+    def add(self, phase, seconds, count=1):
+        total, calls = self.phases.get(phase, (0.0, 0))
+        self.phases[phase] = (total + seconds, calls + count)
+
+    def merge(self, other):
+        for phase, (seconds, count) in other.phases.items():
+            self.add(phase, seconds, count)
+
+    def seconds(self, phase):
+        return self.phases.get(phase, (0.0, 0))[0]
+
+
+def current_timings():
+    timings = getattr(_local, 'timings', None)
+    if timings is None and has_request_context():
+        timings = getattr(g, 'timings', None)
+    return timings
+
+
+def record(phase, seconds, count=1):
+    timings = current_timings()
+    if timings is not None:
+        timings.add(phase, seconds, count)
+
+
+@contextmanager
+def collect():
+    """Collect timings for work done ahead of the request's own hooks (e.g. asgi.py prefetches)."""
+
+    previous = getattr(_local, 'timings', None)
+    timings = _local.timings = Timings()
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.wall = time.perf_counter() - started
+        _local.timings = previous
+
+
+class TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Driver options (pyodbc's fast_executemany) are set on the driver's cursor
+        if name == '_cursor':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *params):
+        started = time.perf_counter()
+        failed = True
+        try:
+            self._cursor.execute(sql, *params)
+            failed = False
+            return self
+        finally:
+            elapsed = time.perf_counter() - started
+            record('db', elapsed)
+            _observe(sql, elapsed, failed)
+
+    def executemany(self, sql, rows):
+        started = time.perf_counter()
+        failed = True
+        try:
+            self._cursor.executemany(sql, rows)
+            failed = False
+            return self
+        finally:
+            elapsed = time.perf_counter() - started
+            record('db', elapsed)
+            _observe(sql, elapsed, failed)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record('db', time.perf_counter() - started, count=0)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def fetchmany(self, size=1):
+        return self._timed(self._cursor.fetchmany, size)
+
+    def nextset(self):
+        return self._timed(self._cursor.nextset)
+
+
+class TimedConnection:
+    def __init__(self, connection):
+        self._connection = connection
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self):
+        return TimedCursor(self._connection.cursor())
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._connection.commit()
+        finally:
+            record('db', time.perf_counter() - started, count=0)
+
+    def close(self):
+        try:
+            return self._connection.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                for listener in connection_listeners:
+                    listener('close', 0.0)
+
+
+def instrument_connection(connection, connect_seconds):
+    record('db-connect', connect_seconds)
+    for listener in connection_listeners:
+        listener('connect', connect_seconds)
+    return TimedConnection(connection)
+
+
+def _observe(sql, seconds, failed):
+    if not query_listeners and seconds < SLOW_QUERY_SECONDS:
+        return
+    normalised = normalise_sql(sql)
+    if seconds >= SLOW_QUERY_SECONDS:
+        slow_query_logger.warning("Slow query (%.1f ms%s): %s", seconds * 1000, ', failed' if failed else '', normalised)
+    for listener in query_listeners:
+        listener(normalised, seconds, failed)
+
+
+def _server_timing(timings, total):
+    parts = []
+    accounted = 0.0
+    for phase in ('db-connect', 'db', 'render'):
+        seconds, count = timings.phases.get(phase, (0.0, 0))
+        if not count and not seconds:
+            continue
+        accounted += seconds
+        description = f';desc="{count} queries"' if phase == 'db' else ''
+        parts.append(f'{phase};dur={seconds * 1000:.1f}{description}')
+    parts.append(f'app;dur={max(total - accounted, 0.0) * 1000:.1f}')
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def init_app(app, prefetch_timings_key=None):
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.timings = Timings()
+        prefetched = request.environ.get(prefetch_timings_key) if prefetch_timings_key else None
+        if prefetched is not None:
+            # Work the ASGI front end did before handing the request to Flask
+            g.timings.merge(prefetched)
+            g.request_started -= prefetched.wall
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = getattr(g, 'timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - g.request_started
+        if SERVER_TIMING_HEADER:
+            response.headers.add('Server-Timing', _server_timing(timings, total))
+        if total >= SLOW_REQUEST_SECONDS:
+            slow_request_logger.warning(
+                "Slow request %s %s (%.1f ms): %s",
+                request.method,
+                request.path,
+                total * 1000,
+                _server_timing(timings, total),
+            )
+        return response
+
+    def render_started(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        started = g.pop('render_started', None)
+        if started is not None:
+            record('render', time.perf_counter() - started)
+
+    # weak=False: the receivers are closures that nothing else keeps alive
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
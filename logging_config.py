@@ -0,0 +1,129 @@
+"""Process-wide logging setup.
+
+* Levels come from the environment: ``LOG_LEVEL`` (default INFO) for the app,
+  and per-logger overrides such as ``LOG_LEVEL_APP_HOT=DEBUG``.
+* ``LOG_FORMAT=json`` (default) emits one JSON object per line carrying the
+  request id; ``LOG_FORMAT=text`` keeps a human-readable line for local work.
+* Request threads only enqueue records; a ``QueueListener`` thread does the
+  formatting and the actual I/O, so a slow stderr/pipe never stalls a request.
+* High-volume per-request chatter goes to the ``<app>.hot`` logger, which is
+  sampled (``LOG_HOT_SAMPLE_EVERY``, default 100: keep 1 record in N per
+  message template). Warnings and errors are never sampled.
+
+Call sites should use lazy ``%``-style arguments (``logger.info("x=%s", x)``)
+so nothing is formatted for records below the active level.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+from flask import g, has_request_context
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - [%(request_id)s] %(message)s'
+
+_configured = False
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being served (``-`` outside requests)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = getattr(g, 'request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one record in ``every`` per message template below WARNING."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.every == 1 or record.levelno >= logging.WARNING:
+            return True
+        counter = self._counters.get(record.msg)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(record.msg, itertools.count())
+        seen = next(counter)
+        if seen % self.every:
+            return False
+        record.sample_rate = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'thread': record.threadName,
+        }
+        if getattr(record, 'sample_rate', None):
+            payload['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _Formatter(logging.Formatter):
+    def format(self, record):
+        record.request_id = getattr(record, 'request_id', '-')
+        return super().format(record)
+
+
+def _level(name, default):
+    value = os.getenv(name, default).upper()
+    return getattr(logging, value, None) if not value.isdigit() else int(value)
+
+
+def configure(app_logger_name):
+    """Install the queue-backed handler on the root logger (idempotent per process)."""
+
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'json').lower() == 'json' else _Formatter(TEXT_FORMAT)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(_level('LOG_ROOT_LEVEL', 'WARNING') or logging.WARNING)
+
+    logging.getLogger(app_logger_name).setLevel(_level('LOG_LEVEL', 'INFO') or logging.INFO)
+    hot_logger = logging.getLogger(f'{app_logger_name}.hot')
+    hot_logger.addFilter(SamplingFilter(os.getenv('LOG_HOT_SAMPLE_EVERY', '100')))
+    for key, value in os.environ.items():
+        if key.startswith('LOG_LEVEL_'):
+            logger_name = key[len('LOG_LEVEL_'):].lower().replace('_', '.')
+            level = _level(key, value)
+            if level:
+                logging.getLogger(logger_name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
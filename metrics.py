@@ -0,0 +1,211 @@
+"""Prometheus metrics, exposed at ``/metrics``.
+
+Collected series (all prefixed ``vvstore_``):
+
+    http_requests_total{endpoint,method,status}     requests served
+    http_request_duration_seconds{endpoint,method}  latency histogram
+    http_requests_in_progress                       requests being served right now
+    db_query_duration_seconds{operation}            per-statement latency (SELECT/INSERT/...)
+    db_query_errors_total{operation}                statements that raised
+    db_connect_duration_seconds                     time to open a connection
+    db_connections_open                             connections currently checked out
+    db_reads_total{target}                          get_db(readonly=True) connections by primary/replica
+    db_replica_usable{replica}                      1 while a replica is in the read rotation
+    db_replica_lag_seconds{replica}                 replica lag at its last health check
+    cart_operations_total{operation,outcome}        cart add/update/remove
+    checkouts_total{outcome}                        create_order_records() results
+    checkout_duration_seconds                       create_order_records() latency
+    import_rows_total{outcome}                      bulk CSV/XLSX rows imported/rejected
+    import_duration_seconds                         bulk CSV upload latency
+    cache_requests_total{cache,result}              hit/miss/stale per in-process cache
+    cache_age_seconds{cache}                        age of a stale-while-revalidate snapshot when last read
+    db_breaker_state{breaker}                       circuit breaker: 0 closed, 1 half-open, 2 open
+    db_breaker_rejections_total{breaker}            calls refused while a breaker was open
+    forecast_refresh_duration_seconds{mode}         sales history loads, full window or incremental
+    rollup_run_duration_seconds                     sales rollup runs (rollups.run())
+    rollup_lag_seconds                              how far the sales rollups trail the clock after a run
+    inventory_compaction_duration_seconds           stock movements folded into the on-hand snapshot (stock.compact())
+    inventory_movements_folded_total                movements folded by those compactions
+    outbox_publish_duration_seconds                 outbox relay batches published to a sink (outbox.relay())
+    outbox_events_published_total                   outbox events published by those batches
+    export_rows_total{dataset,format}               rows written by catalogue/order exports
+    export_duration_seconds{format}                 export latency, first row to last byte
+
+``endpoint`` is the Flask endpoint name rather than the URL, so ids in paths
+do not create new series. DB timings come from ``instrumentation``'s
+listeners.
+
+Multiple worker processes: when ``PROMETHEUS_MULTIPROC_DIR`` is set (before
+this module is first imported) every process writes its samples to files in
+that directory and ``/metrics`` aggregates all of them, whichever worker
+answers the scrape. ``gunicorn.conf.py`` sets it up and cleans up after
+workers that exit. Without it each process reports only its own samples.
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+import instrumentation
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUESTS = Counter(
+    'vvstore_http_requests_total', 'HTTP requests served', ['endpoint', 'method', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'vvstore_http_request_duration_seconds',
+    'HTTP request latency',
+    ['endpoint', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    'vvstore_http_requests_in_progress', 'HTTP requests being served', multiprocess_mode='livesum'
+)
+DB_QUERY_LATENCY = Histogram(
+    'vvstore_db_query_duration_seconds', 'Database statement latency', ['operation'], buckets=DB_BUCKETS
+)
+DB_QUERY_ERRORS = Counter('vvstore_db_query_errors_total', 'Database statements that raised', ['operation'])
+DB_CONNECT_LATENCY = Histogram(
+    'vvstore_db_connect_duration_seconds', 'Time to open a database connection', buckets=DB_BUCKETS
+)
+DB_CONNECTIONS_OPEN = Gauge(
+    'vvstore_db_connections_open', 'Database connections currently open', multiprocess_mode='livesum'
+)
+DB_READS = Counter('vvstore_db_reads_total', 'Read-only connections handed out', ['target'])
+DB_REPLICA_USABLE = Gauge(
+    'vvstore_db_replica_usable', 'Replica is in the read rotation', ['replica'], multiprocess_mode='min'
+)
+DB_REPLICA_LAG = Gauge(
+    'vvstore_db_replica_lag_seconds', 'Replica lag at its last health check', ['replica'], multiprocess_mode='max'
+)
+CART_OPERATIONS = Counter('vvstore_cart_operations_total', 'Cart changes', ['operation', 'outcome'])
+CHECKOUTS = Counter('vvstore_checkouts_total', 'Order placement attempts', ['outcome'])
+CHECKOUT_LATENCY = Histogram(
+    'vvstore_checkout_duration_seconds', 'Order placement latency', buckets=LATENCY_BUCKETS
+)
+IMPORT_ROWS = Counter('vvstore_import_rows_total', 'Bulk import rows', ['outcome'])
+IMPORT_LATENCY = Histogram(
+    'vvstore_import_duration_seconds',
+    'Bulk import latency',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+CACHE_REQUESTS = Counter('vvstore_cache_requests_total', 'In-process cache lookups', ['cache', 'result'])
+CACHE_AGE = Gauge('vvstore_cache_age_seconds', 'Age of a cached snapshot when last read', ['cache'], multiprocess_mode='max')
+DB_BREAKER_STATE = Gauge(
+    'vvstore_db_breaker_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)', ['breaker'], multiprocess_mode='max'
+)
+DB_BREAKER_REJECTIONS = Counter(
+    'vvstore_db_breaker_rejections_total', 'Calls refused by an open circuit breaker', ['breaker']
+)
+FORECAST_REFRESH_LATENCY = Histogram(
+    'vvstore_forecast_refresh_duration_seconds',
+    'Sales history refresh latency',
+    ['mode'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+ROLLUP_RUN_LATENCY = Histogram(
+    'vvstore_rollup_run_duration_seconds',
+    'Sales rollup run latency',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+ROLLUP_LAG = Gauge(
+    'vvstore_rollup_lag_seconds', 'How far the sales rollups trail the clock', multiprocess_mode='max'
+)
+INVENTORY_COMPACTION_LATENCY = Histogram(
+    'vvstore_inventory_compaction_duration_seconds', 'Stock ledger compaction latency', buckets=DB_BUCKETS
+)
+INVENTORY_MOVEMENTS_FOLDED = Counter(
+    'vvstore_inventory_movements_folded_total', 'Stock movements folded into the on-hand snapshot'
+)
+OUTBOX_PUBLISH_LATENCY = Histogram(
+    'vvstore_outbox_publish_duration_seconds', 'Outbox relay batch latency', buckets=LATENCY_BUCKETS
+)
+OUTBOX_EVENTS_PUBLISHED = Counter('vvstore_outbox_events_published_total', 'Outbox events published to the sink')
+EXPORT_ROWS = Counter('vvstore_export_rows_total', 'Rows written by exports', ['dataset', 'format'])
+EXPORT_LATENCY = Histogram(
+    'vvstore_export_duration_seconds',
+    'Export latency',
+    ['format'],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+
+_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC'})
+_UNMATCHED_ENDPOINT = '<unmatched>'
+
+
+def cache_lookup(cache, hit, stale=False):
+    CACHE_REQUESTS.labels(cache, 'stale' if stale else 'hit' if hit else 'miss').inc()
+
+
+def _operation(normalised_sql):
+    keyword = normalised_sql.split(' ', 1)[0].upper()
+    return keyword if keyword in _OPERATIONS else 'OTHER'
+
+
+def _observe_query(normalised_sql, seconds, failed):
+    operation = _operation(normalised_sql)
+    DB_QUERY_LATENCY.labels(operation).observe(seconds)
+    if failed:
+        DB_QUERY_ERRORS.labels(operation).inc()
+
+
+def _observe_connection(event, seconds):
+    if event == 'connect':
+        DB_CONNECT_LATENCY.observe(seconds)
+        DB_CONNECTIONS_OPEN.inc()
+    else:
+        DB_CONNECTIONS_OPEN.dec()
+
+
+def render_latest():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def init_app(app):
+    instrumentation.query_listeners.append(_observe_query)
+    instrumentation.connection_listeners.append(_observe_connection)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_in_progress = True
+        HTTP_IN_PROGRESS.inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or _UNMATCHED_ENDPOINT
+            HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # An earlier before_request hook may have answered before ours ran
+        if g.pop('metrics_in_progress', False):
+            HTTP_IN_PROGRESS.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_latest(), content_type=CONTENT_TYPE_LATEST)
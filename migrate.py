@@ -0,0 +1,183 @@
+"""Versioned schema migrations.
+
+Migrations live in ``migrations/`` as ``NNNN_description.sql`` T-SQL scripts,
+split into batches on ``GO`` lines. Each applied migration is recorded in
+``vanshul_SchemaVersion`` together with a SHA-256 checksum of its script; an
+applied script must never be edited afterwards (add a new migration instead),
+and ``migrate()`` refuses to run while any recorded checksum disagrees with the
+file on disk.
+
+Apply pending migrations with ``flask --app app migrate``. The app itself only
+checks ``current_version()`` -- a single query -- on its first request.
+
+The scripts are T-SQL and only run on SQL Server. Other backends (see
+dialects.py) are brought to the latest schema in one step from schema.py when
+the first pending migration is applied, then any data changes the scripts make
+run from ``PORTABLE_STEPS``; the migrations are still recorded, with the same
+checksums, so versions compare across backends.
+"""
+
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+import dialects
+import repository
+import schema
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SCHEMA_VERSION_TABLE = 'vanshul_SchemaVersion'
+
+_FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_BATCH_SEPARATOR_RE = re.compile(r'^\s*GO\s*$', re.IGNORECASE | re.MULTILINE)
+
+Migration = namedtuple('Migration', 'version name checksum batches')
+
+# version -> callable(cursor) repeating a script's data changes on backends that do not run it
+PORTABLE_STEPS = {
+    3: repository.link_product_suppliers,
+}
+
+
+class MigrationError(Exception):
+    pass
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_RE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as handle:
+            script = handle.read().replace('\r\n', '\n')
+        batches = [batch.strip() for batch in _BATCH_SEPARATOR_RE.split(script)]
+        migrations.append(
+            Migration(
+                version=int(match.group(1)),
+                name=match.group(2),
+                checksum=hashlib.sha256(script.encode('utf-8')).hexdigest(),
+                batches=[batch for batch in batches if batch and not _is_comment_only(batch)],
+            )
+        )
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _is_comment_only(batch):
+    return all(not line.strip() or line.strip().startswith('--') for line in batch.splitlines())
+
+
+def latest_version(migrations=None):
+    migrations = load_migrations() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+def ensure_version_table(conn, dialect=None):
+    dialect = dialect or dialects.current()
+    cursor = conn.cursor()
+    try:
+        if not dialect.runs_migration_scripts:
+            schema.create_all(cursor, dialect, tables=[schema.schema_version])
+            conn.commit()
+            return
+        cursor.execute(
+            f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{SCHEMA_VERSION_TABLE}' AND xtype='U')
+            BEGIN
+                CREATE TABLE {SCHEMA_VERSION_TABLE} (
+                    Version INT NOT NULL PRIMARY KEY,
+                    Name NVARCHAR(255) NOT NULL,
+                    Checksum CHAR(64) NOT NULL,
+                    AppliedAt DATETIME NOT NULL DEFAULT GETDATE()
+                )
+            END
+            """
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def applied_migrations(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT Version, Name, Checksum FROM {SCHEMA_VERSION_TABLE} ORDER BY Version")
+        return {row[0]: (row[1], row[2].strip()) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def current_version(conn):
+    """Return the highest applied migration version (the app's cheap startup check)."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MAX(Version) FROM {SCHEMA_VERSION_TABLE}")
+        row = cursor.fetchone()
+        return (row[0] or 0) if row else 0
+    finally:
+        cursor.close()
+
+
+def verify_checksums(migrations, applied):
+    known = {migration.version: migration for migration in migrations}
+    problems = []
+    for version, (name, checksum) in sorted(applied.items()):
+        migration = known.get(version)
+        if migration is None:
+            problems.append(f"{version:04d}_{name} is applied but missing from {MIGRATIONS_DIR}")
+        elif migration.checksum != checksum:
+            problems.append(f"{version:04d}_{name} was modified after it was applied")
+    if problems:
+        raise MigrationError('; '.join(problems))
+
+
+def pending_migrations(conn, migrations=None, dialect=None):
+    migrations = load_migrations() if migrations is None else migrations
+    ensure_version_table(conn, dialect)
+    applied = applied_migrations(conn)
+    verify_checksums(migrations, applied)
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def migrate(conn, target=None, log=None, dialect=None):
+    """Apply pending migrations up to ``target`` (default: all), one transaction each.
+
+    On backends without migration scripts ``target`` only limits what is recorded:
+    the tables are created as schema.py defines them.
+    """
+
+    dialect = dialect or dialects.current()
+    applied = []
+    for migration in pending_migrations(conn, dialect=dialect):
+        if target is not None and migration.version > target:
+            break
+        cursor = conn.cursor()
+        try:
+            if dialect.runs_migration_scripts:
+                for batch in migration.batches:
+                    cursor.execute(batch)
+            else:
+                if not applied:
+                    schema.create_all(cursor, dialect)
+                if migration.version in PORTABLE_STEPS:
+                    PORTABLE_STEPS[migration.version](cursor)
+            cursor.execute(
+                f"INSERT INTO {SCHEMA_VERSION_TABLE} (Version, Name, Checksum) VALUES (?, ?, ?)",
+                (migration.version, migration.name, migration.checksum),
+            )
+            conn.commit()
+        except Exception as exc:
+            conn.rollback()
+            raise MigrationError(f"Migration {migration.version:04d}_{migration.name} failed: {exc}") from exc
+        finally:
+            cursor.close()
+        if log:
+            log(f"Applied migration {migration.version:04d}_{migration.name}")
+        applied.append(migration)
+    return applied
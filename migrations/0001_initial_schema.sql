@@ -0,0 +1,70 @@
+-- Baseline schema: the tables previously created by app.create_table().
+-- Every batch is idempotent so databases created before migrations existed adopt it cleanly.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Products' AND xtype='U')
+BEGIN
+    CREATE TABLE ICP.dbo.vanshul_Products (
+        Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
+        ItemName NVARCHAR(255) NOT NULL,
+        Category NVARCHAR(100),
+        Supplier NVARCHAR(100),
+        PurchasePrice FLOAT NOT NULL,
+        SalePrice FLOAT,
+        ProfitMargin FLOAT DEFAULT 20.0,
+        SellingPrice FLOAT NOT NULL,
+        Quantity INT NOT NULL,
+        PhotoPaths NVARCHAR(MAX),
+        CreatedAt DATETIME DEFAULT GETDATE()
+    )
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Orders' AND xtype='U')
+BEGIN
+    CREATE TABLE ICP.dbo.vanshul_Orders (
+        Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
+        OrderNumber NVARCHAR(50) NOT NULL UNIQUE,
+        CustomerEmail NVARCHAR(255),
+        Status NVARCHAR(50) DEFAULT 'Pending',
+        TotalAmount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+        CreatedAt DATETIME DEFAULT GETDATE()
+    )
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_OrderItems' AND xtype='U')
+BEGIN
+    CREATE TABLE ICP.dbo.vanshul_OrderItems (
+        OrderItemId UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
+        OrderId UNIQUEIDENTIFIER NOT NULL,
+        ProductId UNIQUEIDENTIFIER NOT NULL,
+        Quantity INT NOT NULL,
+        UnitPrice DECIMAL(18, 2) NOT NULL,
+        LineTotal DECIMAL(18, 2) NOT NULL,
+        CONSTRAINT FK_Order_OrderId FOREIGN KEY (OrderId) REFERENCES vanshul_Orders(Id),
+        CONSTRAINT FK_Order_ProductId FOREIGN KEY (ProductId) REFERENCES vanshul_Products(Id)
+    )
+END
+GO
+
+IF COL_LENGTH('dbo.vanshul_Products', 'InitialQuantity') IS NULL
+BEGIN
+    ALTER TABLE ICP.dbo.vanshul_Products
+    ADD InitialQuantity INT NULL;
+
+    -- Deferred via EXEC: the column does not exist yet when this batch is compiled
+    EXEC('UPDATE ICP.dbo.vanshul_Products SET InitialQuantity = Quantity WHERE InitialQuantity IS NULL');
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Customers' AND xtype='U')
+BEGIN
+    CREATE TABLE ICP.dbo.Customers (
+        Id UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
+        FullName NVARCHAR(255) NOT NULL,
+        Email NVARCHAR(255) NOT NULL UNIQUE,
+        PasswordHash NVARCHAR(255) NOT NULL,
+        CreatedAt DATETIME DEFAULT GETDATE()
+    )
+END
+GO
@@ -0,0 +1,111 @@
+-- Indexing for the hot paths.
+--
+-- 1. Every table was clustered on a random NEWID() key, so each insert landed on a
+--    random page and split it. Tables now cluster on an ever-increasing RowId
+--    surrogate (inserts append to the last page); the GUID Id stays the primary key,
+--    backed by a nonclustered index, and server-generated Ids use NEWSEQUENTIALID().
+-- 2. Nonclustered indexes for the foreign-key and filter columns that were scanned.
+-- 3. A covering index for the storefront/API listing projection.
+--
+-- Adding the RowId identity column rewrites each table once; run during a quiet window.
+
+-- Foreign keys must be dropped before the primary keys they reference can be rebuilt
+IF OBJECT_ID('FK_Order_OrderId', 'F') IS NOT NULL
+    ALTER TABLE vanshul_OrderItems DROP CONSTRAINT FK_Order_OrderId;
+IF OBJECT_ID('FK_Order_ProductId', 'F') IS NOT NULL
+    ALTER TABLE vanshul_OrderItems DROP CONSTRAINT FK_Order_ProductId;
+GO
+
+DECLARE @tables TABLE (TableName SYSNAME, KeyColumn SYSNAME);
+INSERT INTO @tables (TableName, KeyColumn)
+VALUES
+    (N'vanshul_Products', N'Id'),
+    (N'vanshul_Orders', N'Id'),
+    (N'vanshul_OrderItems', N'OrderItemId'),
+    (N'Customers', N'Id');
+
+DECLARE @table SYSNAME, @key SYSNAME, @sql NVARCHAR(MAX);
+DECLARE table_cursor CURSOR LOCAL FAST_FORWARD FOR SELECT TableName, KeyColumn FROM @tables;
+OPEN table_cursor;
+FETCH NEXT FROM table_cursor INTO @table, @key;
+WHILE @@FETCH_STATUS = 0
+BEGIN
+    IF COL_LENGTH(@table, 'RowId') IS NULL
+    BEGIN
+        SET @sql = N'ALTER TABLE ' + QUOTENAME(@table) + N' ADD RowId BIGINT IDENTITY(1, 1) NOT NULL';
+        EXEC sp_executesql @sql;
+    END
+
+    -- Demote the clustered GUID primary key to a nonclustered one
+    SET @sql = NULL;
+    SELECT @sql = N'ALTER TABLE ' + QUOTENAME(@table) + N' DROP CONSTRAINT ' + QUOTENAME(kc.name)
+    FROM sys.key_constraints kc
+    JOIN sys.indexes i ON i.object_id = kc.parent_object_id AND i.index_id = kc.unique_index_id
+    WHERE kc.parent_object_id = OBJECT_ID(@table) AND kc.type = 'PK' AND i.type_desc = 'CLUSTERED';
+    IF @sql IS NOT NULL
+        EXEC sp_executesql @sql;
+
+    IF NOT EXISTS (SELECT 1 FROM sys.key_constraints WHERE parent_object_id = OBJECT_ID(@table) AND type = 'PK')
+    BEGIN
+        SET @sql = N'ALTER TABLE ' + QUOTENAME(@table) + N' ADD CONSTRAINT ' + QUOTENAME(N'PK_' + @table)
+            + N' PRIMARY KEY NONCLUSTERED (' + QUOTENAME(@key) + N')';
+        EXEC sp_executesql @sql;
+    END
+
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(@table) AND name = N'CX_' + @table + N'_RowId')
+    BEGIN
+        SET @sql = N'CREATE UNIQUE CLUSTERED INDEX ' + QUOTENAME(N'CX_' + @table + N'_RowId')
+            + N' ON ' + QUOTENAME(@table) + N' (RowId)';
+        EXEC sp_executesql @sql;
+    END
+
+    -- Server-generated keys become sequential GUIDs
+    SET @sql = NULL;
+    SELECT @sql = N'ALTER TABLE ' + QUOTENAME(@table) + N' DROP CONSTRAINT ' + QUOTENAME(dc.name)
+    FROM sys.default_constraints dc
+    JOIN sys.columns c ON c.object_id = dc.parent_object_id AND c.column_id = dc.parent_column_id
+    WHERE dc.parent_object_id = OBJECT_ID(@table) AND c.name = @key AND dc.definition NOT LIKE N'%newsequentialid%';
+    IF @sql IS NOT NULL
+    BEGIN
+        EXEC sp_executesql @sql;
+        SET @sql = N'ALTER TABLE ' + QUOTENAME(@table) + N' ADD CONSTRAINT ' + QUOTENAME(N'DF_' + @table + N'_' + @key)
+            + N' DEFAULT NEWSEQUENTIALID() FOR ' + QUOTENAME(@key);
+        EXEC sp_executesql @sql;
+    END
+
+    FETCH NEXT FROM table_cursor INTO @table, @key;
+END
+CLOSE table_cursor;
+DEALLOCATE table_cursor;
+GO
+
+IF OBJECT_ID('FK_Order_OrderId', 'F') IS NULL
+    ALTER TABLE vanshul_OrderItems ADD CONSTRAINT FK_Order_OrderId FOREIGN KEY (OrderId) REFERENCES vanshul_Orders(Id);
+IF OBJECT_ID('FK_Order_ProductId', 'F') IS NULL
+    ALTER TABLE vanshul_OrderItems ADD CONSTRAINT FK_Order_ProductId FOREIGN KEY (ProductId) REFERENCES vanshul_Products(Id);
+GO
+
+-- Order lines by order (order history, API) and by product (sales history, analytics)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_OrderItems_OrderId' AND object_id = OBJECT_ID('vanshul_OrderItems'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_OrderItems_OrderId
+        ON vanshul_OrderItems (OrderId)
+        INCLUDE (ProductId, Quantity, UnitPrice, LineTotal);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_OrderItems_ProductId' AND object_id = OBJECT_ID('vanshul_OrderItems'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_OrderItems_ProductId
+        ON vanshul_OrderItems (ProductId)
+        INCLUDE (OrderId, Quantity, UnitPrice, LineTotal);
+
+-- A customer's orders, newest first (covers /api/v1/orders)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_Orders_CustomerEmail' AND object_id = OBJECT_ID('vanshul_Orders'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_Orders_CustomerEmail
+        ON vanshul_Orders (CustomerEmail, CreatedAt DESC, Id DESC)
+        INCLUDE (OrderNumber, Status, TotalAmount);
+
+-- Category filter + storefront/API listing projection (app.STOREFRONT_COLUMNS, CreatedAt)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_Products_Category_Listing' AND object_id = OBJECT_ID('vanshul_Products'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_Products_Category_Listing
+        ON vanshul_Products (Category)
+        INCLUDE (Id, ItemName, Supplier, SellingPrice, SalePrice, Quantity, PhotoPaths, CreatedAt);
+
+-- Customers.Email is already covered by the unique index behind its UNIQUE constraint
+GO
@@ -0,0 +1,48 @@
+-- Suppliers become rows of their own, referenced by vanshul_Products.SupplierId.
+--
+-- The free-text Supplier column stays as the display name stored with each product;
+-- every distinct (trimmed) name becomes one vanshul_Suppliers row and existing
+-- products are linked to it. Supplier-scoped listings then seek on
+-- IX_vanshul_Products_SupplierId instead of comparing strings.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Suppliers' AND xtype='U')
+BEGIN
+    CREATE TABLE vanshul_Suppliers (
+        RowId BIGINT IDENTITY(1, 1) NOT NULL,
+        Id UNIQUEIDENTIFIER NOT NULL CONSTRAINT DF_vanshul_Suppliers_Id DEFAULT NEWSEQUENTIALID(),
+        Name NVARCHAR(100) NOT NULL,
+        Email NVARCHAR(255) NULL,
+        CreatedAt DATETIME DEFAULT GETDATE(),
+        CONSTRAINT PK_vanshul_Suppliers PRIMARY KEY NONCLUSTERED (Id),
+        CONSTRAINT UQ_vanshul_Suppliers_Name UNIQUE (Name)
+    );
+    CREATE UNIQUE CLUSTERED INDEX CX_vanshul_Suppliers_RowId ON vanshul_Suppliers (RowId);
+END
+GO
+
+IF COL_LENGTH('dbo.vanshul_Products', 'SupplierId') IS NULL
+    ALTER TABLE vanshul_Products ADD SupplierId UNIQUEIDENTIFIER NULL;
+GO
+
+-- One supplier per distinct name; blank names stay unlinked
+INSERT INTO vanshul_Suppliers (Name)
+SELECT DISTINCT LTRIM(RTRIM(p.Supplier))
+FROM vanshul_Products p
+WHERE NULLIF(LTRIM(RTRIM(p.Supplier)), '') IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM vanshul_Suppliers s WHERE s.Name = LTRIM(RTRIM(p.Supplier)))
+GO
+
+UPDATE vanshul_Products
+SET SupplierId = (SELECT s.Id FROM vanshul_Suppliers s WHERE s.Name = LTRIM(RTRIM(vanshul_Products.Supplier)))
+WHERE SupplierId IS NULL AND NULLIF(LTRIM(RTRIM(Supplier)), '') IS NOT NULL
+GO
+
+IF OBJECT_ID('FK_vanshul_Products_SupplierId', 'F') IS NULL
+    ALTER TABLE vanshul_Products ADD CONSTRAINT FK_vanshul_Products_SupplierId FOREIGN KEY (SupplierId) REFERENCES vanshul_Suppliers(Id);
+
+-- A supplier's catalogue: the supplier console's listing and analytics columns
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_Products_SupplierId' AND object_id = OBJECT_ID('vanshul_Products'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_Products_SupplierId
+        ON vanshul_Products (SupplierId)
+        INCLUDE (ItemName, Category, PurchasePrice, SellingPrice, SalePrice, ProfitMargin, Quantity, InitialQuantity);
+GO
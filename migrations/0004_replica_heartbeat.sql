@@ -0,0 +1,12 @@
+-- Heartbeat for read replicas.
+--
+-- The app stamps the single row with the current time on the primary and reads
+-- it back from each replica in DB_REPLICAS; how old a replica's copy is tells
+-- how far it trails the primary (see replicas.py).
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_ReplicaHeartbeat' AND xtype='U')
+    CREATE TABLE vanshul_ReplicaHeartbeat (
+        Id INT NOT NULL CONSTRAINT PK_vanshul_ReplicaHeartbeat PRIMARY KEY,
+        BeatAt DATETIME NOT NULL
+    );
+GO
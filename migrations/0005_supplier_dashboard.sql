@@ -0,0 +1,20 @@
+-- Supplier-scoped console: one seek per supplier dashboard.
+--
+-- The supplier console shows only the signed-in supplier's products (see
+-- dashboard.py). IX_vanshul_Products_SupplierId is rebuilt to include every
+-- column the dashboard renders (dashboard.DASHBOARD_COLUMNS) -- Id and
+-- Supplier were missing, which sent each row on a lookup into the clustered
+-- index.
+
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes i
+    JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+    JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+    WHERE i.name = 'IX_vanshul_Products_SupplierId' AND i.object_id = OBJECT_ID('vanshul_Products') AND c.name = 'Supplier'
+)
+    CREATE NONCLUSTERED INDEX IX_vanshul_Products_SupplierId
+        ON vanshul_Products (SupplierId)
+        INCLUDE (Id, ItemName, Category, Supplier, PurchasePrice, SellingPrice, SalePrice, ProfitMargin, Quantity, InitialQuantity)
+        WITH (DROP_EXISTING = ON);
+GO
@@ -0,0 +1,11 @@
+-- Orders by placement time, for the sales history behind reorder suggestions.
+--
+-- forecasting.py reads the order lines placed since a given moment: the whole
+-- forecast window once per process, then only the latest day's on each
+-- refresh. Without this index every refresh scanned all of vanshul_Orders.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_Orders_CreatedAt' AND object_id = OBJECT_ID('vanshul_Orders'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_Orders_CreatedAt
+        ON vanshul_Orders (CreatedAt)
+        INCLUDE (Status);
+GO
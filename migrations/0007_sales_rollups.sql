@@ -0,0 +1,35 @@
+-- Sales rollups for reporting.
+--
+-- vanshul_SalesRollup holds units, revenue and cost (units x PurchasePrice)
+-- per product per hour, day and month; rollups.py folds new orders into it
+-- and the supplier console's reports read nothing else. It clusters on its
+-- key, so a report over a range of periods is one range seek, and inserts
+-- append at the newest period of each grain. vanshul_JobWatermarks records
+-- how far the folding has got.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_SalesRollup' AND xtype='U')
+    CREATE TABLE vanshul_SalesRollup (
+        Grain NVARCHAR(5) NOT NULL,
+        PeriodStart DATETIME NOT NULL,
+        ProductId UNIQUEIDENTIFIER NOT NULL,
+        Category NVARCHAR(100),
+        SupplierId UNIQUEIDENTIFIER,
+        Units INT NOT NULL,
+        Revenue DECIMAL(18, 2) NOT NULL,
+        Cost DECIMAL(18, 2) NOT NULL,
+        CONSTRAINT PK_vanshul_SalesRollup PRIMARY KEY CLUSTERED (Grain, PeriodStart, ProductId)
+    );
+GO
+
+-- A supplier's reports
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_SalesRollup_SupplierId' AND object_id = OBJECT_ID('vanshul_SalesRollup'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_SalesRollup_SupplierId
+        ON vanshul_SalesRollup (SupplierId, Grain, PeriodStart)
+        INCLUDE (ProductId, Category, Units, Revenue, Cost);
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_JobWatermarks' AND xtype='U')
+    CREATE TABLE vanshul_JobWatermarks (
+        Name NVARCHAR(50) NOT NULL CONSTRAINT PK_vanshul_JobWatermarks PRIMARY KEY,
+        ProcessedThrough DATETIME NOT NULL
+    );
+GO
@@ -0,0 +1,35 @@
+-- Inventory movement ledger.
+--
+-- Every stock change -- a receipt, a sale, an adjustment -- is appended to
+-- vanshul_InventoryMovements as a signed quantity; rows are never updated.
+-- vanshul_Products.Quantity becomes the on-hand snapshot as of the movement
+-- recorded in vanshul_StockCompaction, and on hand is that snapshot plus the
+-- movements after it (stock.py folds them in periodically). The ledger
+-- clusters on Seq, so compaction reads the movements since the last one as a
+-- range seek at the end of the table; IX_vanshul_InventoryMovements_ProductId
+-- serves each product read's pending movements and a product's history.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_InventoryMovements' AND xtype='U')
+    CREATE TABLE vanshul_InventoryMovements (
+        Seq BIGINT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_vanshul_InventoryMovements PRIMARY KEY CLUSTERED,
+        ProductId UNIQUEIDENTIFIER NOT NULL,
+        Kind NVARCHAR(20) NOT NULL,
+        Quantity INT NOT NULL,
+        Reference NVARCHAR(100),
+        Note NVARCHAR(255),
+        CreatedAt DATETIME NOT NULL DEFAULT GETDATE()
+    );
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vanshul_InventoryMovements_ProductId' AND object_id = OBJECT_ID('vanshul_InventoryMovements'))
+    CREATE NONCLUSTERED INDEX IX_vanshul_InventoryMovements_ProductId
+        ON vanshul_InventoryMovements (ProductId, Seq)
+        INCLUDE (Quantity);
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_StockCompaction' AND xtype='U')
+    CREATE TABLE vanshul_StockCompaction (
+        Id INT NOT NULL CONSTRAINT PK_vanshul_StockCompaction PRIMARY KEY,
+        ThroughSeq BIGINT NOT NULL,
+        CompactedAt DATETIME NOT NULL
+    );
+GO
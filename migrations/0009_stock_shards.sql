@@ -0,0 +1,18 @@
+-- Sharded stock counters for hot products.
+--
+-- A product flagged hot (`flask shard-stock`) has its stock on hand split
+-- across a few vanshul_StockShards rows. A sale takes its units from one
+-- shard with a conditional UPDATE, locking that row only, so concurrent
+-- sales of the product queue per shard rather than all on its
+-- vanshul_Products row. Its movements are still recorded in the ledger
+-- (0008); the shards add up to the same stock on hand. Products without
+-- shards are unaffected.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_StockShards' AND xtype='U')
+    CREATE TABLE vanshul_StockShards (
+        ProductId UNIQUEIDENTIFIER NOT NULL,
+        Shard INT NOT NULL,
+        Quantity INT NOT NULL,
+        CONSTRAINT PK_vanshul_StockShards PRIMARY KEY CLUSTERED (ProductId, Shard)
+    );
+GO
@@ -0,0 +1,25 @@
+-- Transactional outbox of inventory events.
+--
+-- Every write that changes the catalogue or places an order appends an event
+-- to vanshul_Outbox in the same transaction (repository.record_event()), so an
+-- event exists if and only if its change committed. The outbox clusters on
+-- Seq: the change feed (/api/v1/changes) and the relay (outbox.py) read the
+-- events after a position as a range seek. vanshul_OutboxRelay records, per
+-- sink, the last event the relay has published to it.
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_Outbox' AND xtype='U')
+    CREATE TABLE vanshul_Outbox (
+        Seq BIGINT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_vanshul_Outbox PRIMARY KEY CLUSTERED,
+        EventType NVARCHAR(50) NOT NULL,
+        SubjectId UNIQUEIDENTIFIER NOT NULL,
+        Payload NVARCHAR(MAX) NOT NULL,
+        CreatedAt DATETIME NOT NULL DEFAULT GETDATE()
+    );
+GO
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='vanshul_OutboxRelay' AND xtype='U')
+    CREATE TABLE vanshul_OutboxRelay (
+        Sink NVARCHAR(255) NOT NULL CONSTRAINT PK_vanshul_OutboxRelay PRIMARY KEY,
+        PublishedThrough BIGINT NOT NULL
+    );
+GO
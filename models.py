@@ -1,34 +1,97 @@
-# models.py
-import uuid
-from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
+"""ORM classes mapped onto the tables in schema.py.
 
-db = SQLAlchemy()
+The mapped attributes carry the column names (``Product.ItemName``,
+``Order.TotalAmount``...), the same keys repository.py returns, so either
+layer's rows read alike. Request handlers do not use the ORM: they read
+through repository.py's SQL on ``app.get_db()`` connections, which go to a
+replica where there is one, through the circuit breaker and the Server-Timing
+instrumentation (and to the stand-in under ``DB_CONNECT_FACTORY``); an ORM
+session opens its own engine and would bypass all of them. Stock on hand is
+also only known to that SQL: ``Product.Quantity`` here is the compacted
+snapshot, without the ledger movements after it (see stock.py).
 
-class Supplier(db.Model):
-    __tablename__ = 'suppliers'
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    address = db.Column(db.String(255))
-    phone = db.Column(db.String(20))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+Every relationship is ``lazy='raise'``: touching one that was not loaded is
+an error rather than a silent query per row. Load what you need up front,
+``joinedload`` for many-to-one links and ``selectinload`` for collections:
 
-    products = db.relationship('Product', backref='supplier', lazy=True)
+    with models.session() as db:
+        query = sa.select(models.Order).options(selectinload(models.Order.items).joinedload(models.OrderItem.product))
+        for order in db.scalars(query):
+            print(order.OrderNumber, [item.product.ItemName for item in order.items])
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.orm import DeclarativeBase, relationship, sessionmaker
+
+import dialects
+import schema
+
+
+class Base(DeclarativeBase):
+    metadata = schema.metadata
+
+
+class Supplier(Base):
+    __table__ = schema.suppliers
+
+    products = relationship('Product', back_populates='supplier', lazy='raise')
+
+    def __repr__(self):
+        return f'<Supplier {self.Name}>'
+
+
+class Product(Base):
+    __table__ = schema.products
+
+    supplier = relationship(Supplier, back_populates='products', lazy='raise')
+    order_items = relationship('OrderItem', back_populates='product', lazy='raise')
 
     def __repr__(self):
-        return f'<Supplier {self.name}>'
-
-
-class Product(db.Model):
-    __tablename__ = 'products'
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    item_name = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50))
-    purchase_price = db.Column(db.Float)
-    profit_margin = db.Column(db.Float)
-    selling_price = db.Column(db.Float)
-    quantity = db.Column(db.Integer)
-    photo_path = db.Column(db.String(255))
-    supplier_id = db.Column(db.String(36), db.ForeignKey('suppliers.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        return f'<Product {self.ItemName}>'
+
+
+class Order(Base):
+    __table__ = schema.orders
+
+    items = relationship('OrderItem', back_populates='order', lazy='raise')
+
+    def __repr__(self):
+        return f'<Order {self.OrderNumber}>'
+
+
+class OrderItem(Base):
+    __table__ = schema.order_items
+
+    order = relationship(Order, back_populates='items', lazy='raise')
+    product = relationship(Product, back_populates='order_items', lazy='raise')
+
+
+class Customer(Base):
+    __table__ = schema.customers
+
+    # Orders record the customer's email rather than a key
+    orders = relationship(
+        Order,
+        primaryjoin='foreign(Order.CustomerEmail) == Customer.Email',
+        viewonly=True,
+        lazy='raise',
+    )
+
+    def __repr__(self):
+        return f'<Customer {self.Email}>'
+
+
+_session_factory = None
+
+
+def session():
+    """A new Session on the active backend (``dialects.current()``); use it as a context manager."""
+
+    global _session_factory
+    if _session_factory is None:
+        dialect = dialects.current()
+        options = {'creator': dialect.raw_connect, 'pool_pre_ping': True, **dialect.engine_options()}
+        engine = sa.create_engine(dialect.sqlalchemy_url(), **options)
+        _session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    return _session_factory()
+
@@ -0,0 +1,166 @@
+"""Inventory events for downstream systems: a transactional outbox, its relay and the change feed.
+
+Marketplace sync and the warehouse used to find out what had changed by
+re-reading vanshul_Products and vanshul_Orders in full. Now every write that
+changes them appends an event to vanshul_Outbox (migration 0010) in its own
+transaction (``repository.record_event()``), so an event exists exactly when
+its change committed:
+
+    product.created   a product uploaded (/upload, /bulk_upload): its columns and opening stock
+    order.placed      an order placed (checkout, buy now, the API): its number, total and lines
+    stock.adjusted    a stock count or write-off (flask adjust-stock): the change and stock on hand after it
+
+Consumers either page through ``/api/v1/changes?since=<cursor>`` themselves or
+are sent the events by ``flask outbox-relay``, which publishes them to a sink
+in batches and then records the last one published (vanshul_OutboxRelay,
+compare-and-set, so two relays never both move a sink's position). Delivery is
+at least once: a batch published but not recorded -- the relay stopped in
+between, or another relay got there first -- is published again, so consumers
+should skip events whose ``seq`` they have already seen. Events are kept;
+consumers can start from the beginning.
+
+Seq is an identity, handed out at insert, so an event can commit after a later
+one. The feed and the relay stop at the first event younger than
+``OUTBOX_SETTLE_SECONDS``; the transactions appending events are assumed to
+commit within that time, so no event is passed over. Ages are measured by the
+database's clock, which stamps CreatedAt (``repository.database_now()``), not
+the app server's.
+
+Sinks, named by ``OUTBOX_SINK`` or ``--sink``:
+
+    file:PATH (or PATH)    NDJSON appended to PATH, one event per line
+    http://HOST:PORT/PATH  each batch POSTed as NDJSON (bench/eventsink.py is a local stand-in)
+
+Configured from the environment:
+
+    OUTBOX_SINK             where flask outbox-relay publishes to
+    OUTBOX_SETTLE_SECONDS   how old an event must be before it is served or published (default 5)
+    OUTBOX_BATCH_SIZE       events per relay batch (default 500)
+"""
+
+import json
+import logging
+import os
+import time
+import urllib.request
+from datetime import timedelta
+
+import metrics
+import repository
+from rollups import to_datetime
+
+logger = logging.getLogger('app.outbox')
+
+EVENT_TYPES = ('product.created', 'order.placed', 'stock.adjusted')
+
+SETTLE_SECONDS = float(os.getenv('OUTBOX_SETTLE_SECONDS') or 5)
+BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE') or 500)
+
+
+def settled_events(conn, after, limit, now=None):
+    """Up to ``limit`` events after Seq ``after`` (None: from the first), oldest first, stopping at the first unsettled one.
+
+    ``now`` is by the database's clock (default: read from it).
+    """
+
+    cutoff = (now or repository.database_now(conn)) - timedelta(seconds=SETTLE_SECONDS)
+    events = []
+    for event in repository.outbox_events(conn, after or 0, limit):
+        if to_datetime(event['CreatedAt']) >= cutoff:
+            break
+        events.append(event)
+    return events
+
+
+def event_document(event):
+    """An outbox row as consumers see it, in the feed and from the relay."""
+
+    return {
+        'seq': event['Seq'],
+        'type': event['EventType'],
+        'subject_id': str(event['SubjectId']).lower(),
+        'occurred_at': to_datetime(event['CreatedAt']).isoformat(),
+        'data': json.loads(event['Payload']),
+    }
+
+
+def ndjson(events):
+    return ''.join(json.dumps(event_document(event), separators=(',', ':')) + '\n' for event in events)
+
+
+class FileSink:
+    """Appends each batch to a local NDJSON file, synced before the batch counts as published."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = f'file:{path}'
+
+    def publish(self, body):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(body)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+class HttpSink:
+    """POSTs each batch as NDJSON; any answer but a 2xx is a failure and the batch is sent again later."""
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.name = url
+        self.timeout = timeout
+
+    def publish(self, body):
+        request = urllib.request.Request(
+            self.url, data=body.encode('utf-8'), method='POST', headers={'Content-Type': 'application/x-ndjson'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def open_sink(spec):
+    if spec.startswith(('http://', 'https://')):
+        return HttpSink(spec)
+    return FileSink(spec[len('file:'):] if spec.startswith('file:') else spec)
+
+
+def relay(conn, sink, batch_size=BATCH_SIZE, now=None):
+    """Publish the next batch of settled events ``sink`` has not had; returns how many were published."""
+
+    started = time.perf_counter()
+    previous = repository.outbox_published_through(conn, sink.name)
+    events = settled_events(conn, previous, batch_size, now)
+    conn.rollback()
+    if not events:
+        return 0
+    # Not holding a transaction open while the sink answers
+    sink.publish(ndjson(events))
+    through = events[-1]['Seq']
+    cursor = conn.cursor()
+    try:
+        if not repository.advance_outbox_relay(cursor, sink.name, previous, through):
+            conn.rollback()
+            logger.warning("Outbox events %s-%s were also published to %s by another relay", (previous or 0) + 1, through, sink.name)
+            return 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - started
+    metrics.OUTBOX_PUBLISH_LATENCY.observe(elapsed)
+    metrics.OUTBOX_EVENTS_PUBLISHED.inc(len(events))
+    logger.info("Published outbox events %s-%s to %s in %.3fs", (previous or 0) + 1, through, sink.name, elapsed)
+    return len(events)
+
+
+def drain(conn, sink, batch_size=BATCH_SIZE):
+    """Publish batches until the settled events run out; returns how many were published."""
+
+    published = 0
+    while True:
+        count = relay(conn, sink, batch_size)
+        published += count
+        if count < batch_size:
+            return published
@@ -0,0 +1,233 @@
+"""On-demand profiling of a live worker, without restarting it.
+
+Two tools, both reachable only by signed-in suppliers (see the routes in app.py):
+
+* ``sample()`` — a sampling profiler. The calling thread snapshots every other
+  thread's Python stack (``sys._current_frames``) every few milliseconds for
+  N seconds. Nothing is installed into the interpreter, so the profiled
+  requests run at full speed; the cost is one stack walk per thread per tick.
+  Results come back as collapsed stacks (``flamegraph.pl`` / speedscope
+  input) or as a self-contained SVG flame graph.
+* Per-request cProfile: a request carrying ``X-Profile: 1`` from a supplier
+  session is run under ``cProfile``; the response gets an ``X-Profile-Id``
+  header naming the saved ``.prof`` file, which can be read back as a pstats
+  report or downloaded for snakeviz.
+
+Only the worker process that serves the profiling request is sampled. Saved
+request profiles go to ``PROFILE_DIR`` (shared by all workers on the host).
+
+Tuning (environment):
+    PROFILE_MAX_SECONDS    longest sampling run allowed (default 30)
+    PROFILE_DIR            where request profiles are written (default <tmp>/vvstore-profiles)
+    PROFILE_KEEP           request profiles kept before the oldest are deleted (default 50)
+"""
+
+import cProfile
+import collections
+import html
+import io
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+from flask import g, request
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '30'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'vvstore-profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+MAX_STACK_DEPTH = 128
+REPORT_SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+# Leaf frames of threads parked waiting for work; dropped unless include_idle
+IDLE_FRAMES = frozenset(
+    {
+        ('threading.py', 'wait'),
+        ('selectors.py', 'select'),
+        ('socket.py', 'accept'),
+        ('socketserver.py', 'serve_forever'),
+        ('queue.py', 'get'),
+        ('thread.py', '_worker'),
+        ('handlers.py', 'dequeue'),
+        ('base_events.py', '_run_once'),
+    }
+)
+
+_PROFILE_ID_RE = re.compile(r'^[0-9]{14}-[0-9]+-[0-9a-f]{8}$')
+_sampling = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SampleProfile:
+    def __init__(self, stacks, ticks, seconds, interval):
+        self.stacks = stacks
+        self.ticks = ticks
+        self.seconds = seconds
+        self.interval = interval
+
+    def collapsed(self):
+        """``frame;frame;frame count`` lines, hottest first."""
+
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def flame_graph_svg(self, width=1200, row_height=16):
+        return _flame_graph_svg(self.stacks, self.ticks, self.seconds, width, row_height)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def _stack_key(thread_name, frame, include_idle):
+    code = frame.f_code
+    if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+def sample(seconds, interval=0.005, include_idle=False):
+    """Sample every other thread of this process for ``seconds``; raise ProfilerBusy if already running."""
+
+    if not _sampling.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        seconds = min(max(seconds, interval), MAX_SECONDS)
+        own_id = threading.get_ident()
+        stacks = collections.Counter()
+        ticks = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                key = _stack_key(names.get(thread_id, f'thread-{thread_id}'), frame, include_idle)
+                if key is not None:
+                    stacks[key] += 1
+            ticks += 1
+            time.sleep(interval)
+        return SampleProfile(stacks, ticks, seconds, interval)
+    finally:
+        _sampling.release()
+
+
+def _flame_graph_svg(stacks, ticks, seconds, width, row_height):
+    root = {'children': {}, 'count': 0}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for label in stack.split(';'):
+            node = node['children'].setdefault(label, {'children': {}, 'count': 0})
+            node['count'] += count
+
+    total = root['count'] or 1
+    rects = []
+    depth_reached = 0
+
+    def draw(node, x, depth):
+        nonlocal depth_reached
+        for label, child in sorted(node['children'].items()):
+            child_width = width * child['count'] / total
+            if child_width >= 0.5:
+                depth_reached = max(depth_reached, depth)
+                hue = zlib.crc32(label.split(':')[0].encode()) % 60
+                title = html.escape(f"{label} ({child['count']} samples, {100.0 * child['count'] / total:.1f}%)")
+                text = html.escape(label[: int(child_width / 7)]) if child_width > 35 else ''
+                rects.append((x, depth, child_width, hue, title, text))
+                draw(child, x, depth + 1)
+            x += child_width
+
+    draw(root, 0.0, 0)
+    height = (depth_reached + 2) * row_height
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="{row_height - 4}">{total} samples over {ticks} ticks ({seconds:.1f}s)</text>',
+    ]
+    for x, depth, rect_width, hue, title, text in rects:
+        y = height - (depth + 1) * row_height
+        parts.append(
+            f'<g><title>{title}</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{rect_width:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue + 10},85%,60%)"/>'
+            f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{text}</text></g>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def request_profile_path(profile_id):
+    if not _PROFILE_ID_RE.match(profile_id or ''):
+        return None
+    path = os.path.join(PROFILE_DIR, f'{profile_id}.prof')
+    return path if os.path.exists(path) else None
+
+
+def request_profile_report(profile_id, sort='cumulative', limit=60):
+    path = request_profile_path(profile_id)
+    if path is None:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def _save_request_profile(profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f'{profile_id}.prof'))
+    saved = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof'))
+    for name in saved[: max(0, len(saved) - PROFILE_KEEP)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+    return profile_id
+
+
+def init_app(app, authorised):
+    """Profile requests that send ``X-Profile: 1`` when ``authorised()`` is true."""
+
+    @app.before_request
+    def start_request_profile():
+        if request.headers.get(PROFILE_HEADER) != '1' or not authorised():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return
+        g.request_profiler = profiler
+
+    @app.after_request
+    def finish_request_profile(response):
+        profiler = g.pop('request_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response.headers[PROFILE_ID_HEADER] = _save_request_profile(profiler)
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(exc):
+        # Never leave a profiler running on a pooled thread if after_request did not run
+        profiler = g.pop('request_profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,203 @@
+"""Read/write splitting: read-only work on replicas, everything else on the primary.
+
+Configured from the environment:
+
+    DB_REPLICAS               comma-separated replicas of the active backend: SQL Server
+                              host names (same DB_NAME and credentials, read-only intent),
+                              PostgreSQL URLs or SQLite paths. Unset: no routing at all.
+    DB_REPLICA_MAX_LAG        seconds a replica may trail the primary and still serve reads (default 30)
+    DB_REPLICA_CHECK_SECONDS  how often each process re-checks replica health and lag (default 5)
+    DB_STICKY_SECONDS         how long a session's reads stay on the primary after it
+                              writes -- an order, a product upload (default: DB_REPLICA_MAX_LAG)
+
+``app.get_db(readonly=True)`` asks the router for a connection; reads take
+healthy replicas in turn (round-robin) and fall back to the primary when none
+qualifies or the chosen one fails to connect. Writes, checkout and anything
+that must see its own changes keep using ``get_db()``.
+
+Lag is measured with a heartbeat: each check stamps the current time into
+vanshul_ReplicaHeartbeat on the primary (migration 0004), then reads it back
+from every replica. A replica's lag is the age of the newest stamp it has
+(so it is known to within one check interval), measured on this process's
+clock only. Checks run inline on whichever read first finds them due -- one
+thread at a time, the others keep using the last result -- so no background
+thread has to survive gunicorn's fork.
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+logger = logging.getLogger('app.replicas')
+
+PRIMARY_PIN_SESSION_KEY = 'db_primary_until'
+
+
+class Replica:
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.name = dialect.describe()
+        self.reachable = False
+        self.lag = None
+        self.error = 'not checked yet'
+
+    def usable(self, max_lag):
+        return self.reachable and self.lag is not None and self.lag <= max_lag
+
+    def record(self, max_lag, lag=None, error=None):
+        was_usable = self.usable(max_lag)
+        self.reachable = error is None
+        self.lag = lag
+        self.error = error
+        usable = self.usable(max_lag)
+        metrics.DB_REPLICA_USABLE.labels(self.name).set(1 if usable else 0)
+        if lag is not None:
+            metrics.DB_REPLICA_LAG.labels(self.name).set(lag)
+        if was_usable and not usable:
+            if error is not None:
+                logger.warning("Replica %s taken out of rotation: %s", self.name, error)
+            else:
+                logger.warning("Replica %s taken out of rotation: %.1fs behind the primary", self.name, lag)
+        elif usable and not was_usable:
+            logger.info("Replica %s back in rotation (%.1fs behind the primary)", self.name, lag)
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, connect_primary, max_lag=30.0, check_interval=5.0, sticky_seconds=None):
+        self.replicas = list(replicas)
+        self.connect_primary = connect_primary
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = max_lag if sticky_seconds is None else sticky_seconds
+        self._turn = itertools.count()
+        self._check_lock = threading.Lock()
+        self._checked_at = None
+
+    def connect_read(self):
+        """A connection to the next usable replica, or None when reads should go to the primary."""
+
+        self._check_if_due()
+        candidates = [replica for replica in self.replicas if replica.usable(self.max_lag)]
+        if not candidates:
+            return None
+        start = next(self._turn)
+        for offset in range(len(candidates)):
+            replica = candidates[(start + offset) % len(candidates)]
+            try:
+                return replica.dialect.connect()
+            except replica.dialect.Error as e:
+                # Out of rotation until the next check finds it answering again
+                replica.record(self.max_lag, error=str(e))
+        return None
+
+    def _check_if_due(self):
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self.check()
+        finally:
+            self._check_lock.release()
+
+    def check(self):
+        """Stamp the primary's heartbeat and measure every replica's health and lag."""
+
+        self._checked_at = time.monotonic()
+        self._beat()
+        for replica in self.replicas:
+            try:
+                seen = self._last_beat(replica)
+            except replica.dialect.Error as e:
+                replica.record(self.max_lag, error=str(e))
+                continue
+            if seen is None:
+                replica.record(self.max_lag, error='no heartbeat yet (is migration 0004 applied?)')
+            else:
+                lag = max(0.0, (datetime.utcnow() - seen).total_seconds())
+                replica.record(self.max_lag, lag=lag)
+
+    def _beat(self):
+        try:
+            conn = self.connect_primary()
+        except Exception as e:
+            # Replicas are still measured: their lag grows until the primary is back
+            logger.warning("Could not reach the primary to stamp the replica heartbeat: %s", e)
+            return
+        try:
+            cursor = conn.cursor()
+            now = datetime.utcnow()
+            cursor.execute("UPDATE vanshul_ReplicaHeartbeat SET BeatAt = ? WHERE Id = 1", (now,))
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO vanshul_ReplicaHeartbeat (Id, BeatAt) VALUES (1, ?)", (now,))
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            # Another process inserting the first row at the same moment, or the table is missing
+            logger.warning("Could not stamp the replica heartbeat: %s", e)
+            conn.rollback()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _last_beat(replica):
+        conn = replica.dialect.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT BeatAt FROM vanshul_ReplicaHeartbeat WHERE Id = 1")
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+        if row is None or row[0] is None:
+            return None
+        seen = row[0]
+        return seen if isinstance(seen, datetime) else datetime.fromisoformat(str(seen))
+
+    def status(self):
+        return [
+            {'replica': replica.name, 'usable': replica.usable(self.max_lag), 'lag': replica.lag, 'error': replica.error}
+            for replica in self.replicas
+        ]
+
+
+def pin_to_primary(session, seconds):
+    """Send ``session``'s reads to the primary for ``seconds``, until its latest write has reached the replicas."""
+
+    session[PRIMARY_PIN_SESSION_KEY] = time.time() + seconds
+
+
+def pinned_to_primary(session):
+    until = session.get(PRIMARY_PIN_SESSION_KEY)
+    if until is None:
+        return False
+    if until > time.time():
+        return True
+    session.pop(PRIMARY_PIN_SESSION_KEY, None)
+    return False
+
+
+def _env_seconds(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def from_env(dialect, connect_primary):
+    """The router for ``DB_REPLICAS`` (replicas of ``dialect``'s backend), or None when it is unset."""
+
+    targets = [target.strip() for target in os.getenv('DB_REPLICAS', '').split(',') if target.strip()]
+    if not targets:
+        return None
+    max_lag = _env_seconds('DB_REPLICA_MAX_LAG', 30.0)
+    return ReplicaRouter(
+        [Replica(dialect.replica(target)) for target in targets],
+        connect_primary,
+        max_lag=max_lag,
+        check_interval=_env_seconds('DB_REPLICA_CHECK_SECONDS', 5.0),
+        sticky_seconds=_env_seconds('DB_STICKY_SECONDS', max_lag),
+    )
@@ -0,0 +1,804 @@
+"""Catalog, order and customer queries, written once for every database backend.
+
+Functions take an open connection from ``app.get_db()`` and return plain dicts
+keyed by the column names in schema.py, so views and templates are unaware of
+the backend. Whatever is not portable SQL (row limits, case-insensitive
+search, generated ids) is asked of the active dialect (dialects.py).
+
+Writes leave the transaction to the caller, except ``create_order()`` which
+is a unit of work of its own.
+"""
+
+import json
+import random
+import uuid
+from datetime import datetime
+
+import dialects
+import schema
+
+# Columns the storefront renders; served by IX_vanshul_Products_Category_Listing (migration 0002)
+STOREFRONT_COLUMNS = 'Id, ItemName, Category, Supplier, SellingPrice, SalePrice, Quantity, PhotoPaths'
+API_PRODUCT_COLUMNS = f'{STOREFRONT_COLUMNS}, CreatedAt'
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+def rows_as_dicts(cursor, rows):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _fetch_all(conn, sql, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return rows_as_dicts(cursor, cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _where(clauses):
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+
+def product_filters(search_query=None, category=None):
+    """Return ``(clauses, params)`` for the storefront's search box and category filter."""
+
+    clauses, params = [], []
+    if search_query:
+        like = dialects.current().like_operator
+        like_query = f"%{search_query}%"
+        clauses.append(f"(ItemName {like} ? OR Category {like} ? OR Supplier {like} ?)")
+        params.extend([like_query, like_query, like_query])
+    if category:
+        if category.lower() == 'general':
+            clauses.append("(Category = ? OR Category IS NULL)")
+        else:
+            clauses.append("Category = ?")
+        params.append(category)
+    return clauses, params
+
+
+# vanshul_Products.Quantity is the snapshot as of the last compaction (stock.py); the
+# product's movements appended since are summed on top, a seek of
+# IX_vanshul_InventoryMovements_ProductId past the compaction mark
+_PENDING_STOCK = """
+    COALESCE((
+        SELECT SUM(m.Quantity) FROM vanshul_InventoryMovements m
+        WHERE m.ProductId = {product}.Id
+          AND m.Seq > COALESCE((SELECT ThroughSeq FROM vanshul_StockCompaction WHERE Id = 1), 0)
+    ), 0)
+"""
+# A sharded product's stock on hand is what its shards hold (stock.py); they are few, and its
+# pending movements, a hot product's sales since the last compaction, may not be
+_ON_HAND = f"""COALESCE(
+        (SELECT SUM(s.Quantity) FROM vanshul_StockShards s WHERE s.ProductId = vanshul_Products.Id),
+        vanshul_Products.Quantity + {_PENDING_STOCK.format(product='vanshul_Products').strip()}
+    ) AS Quantity"""
+
+
+def _product_columns(columns):
+    """The SELECT list for ``columns`` of vanshul_Products ('*' or comma-separated) with Quantity on hand."""
+
+    names = [column.name for column in schema.products.columns] if columns.strip() == '*' else columns.split(',')
+    return ', '.join(
+        _ON_HAND if name.strip() == 'Quantity' else f"vanshul_Products.{name.strip()}" for name in names
+    )
+
+
+def _select_products(columns, clauses, order_by=''):
+    return f"SELECT {_product_columns(columns)} FROM vanshul_Products {_where(clauses)} {order_by}"
+
+
+def catalogue_filters(search_query=None, supplier_id=None):
+    """Return ``(clauses, params)`` for the supplier console's search within ``supplier_id``'s catalogue (None: all)."""
+
+    clauses, params = product_filters(search_query)
+    if supplier_id is not None:
+        # Seeks IX_vanshul_Products_SupplierId, which covers dashboard.DASHBOARD_COLUMNS (migration 0005)
+        clauses.append("SupplierId = ?")
+        params.append(supplier_id)
+    return clauses, params
+
+
+def list_products(conn, columns='*', search_query=None, supplier_id=None):
+    clauses, params = catalogue_filters(search_query, supplier_id)
+    return _fetch_all(conn, _select_products(columns, clauses), params)
+
+
+def get_product(conn, product_id):
+    products = _fetch_all(conn, _select_products('*', ["Id = ?"]), (product_id,))
+    return products[0] if products else None
+
+
+def page_products(conn, clauses, params, limit, after_id=None, columns=API_PRODUCT_COLUMNS):
+    """Return up to ``limit`` products ordered by Id (keyset pagination) and whether more follow."""
+
+    clauses, params = list(clauses), list(params)
+    if after_id is not None:
+        clauses.append("Id > ?")
+        params.append(after_id)
+    sql, params = dialects.current().limit(_select_products(columns, clauses, "ORDER BY Id"), params, limit + 1)
+    products = _fetch_all(conn, sql, params)
+    return products[:limit], len(products) > limit
+
+
+def open_product_export(conn, clauses, params, columns=API_PRODUCT_COLUMNS):
+    """Execute the catalogue export query and return the cursor for the caller to page through and close."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_select_products(columns, clauses, "ORDER BY Id"), params)
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+def open_order_export(conn, clauses, params, since=None, until=None):
+    """Execute the order-line export query for products matching ``clauses``, oldest order first, and return the cursor.
+
+    ``since``/``until`` bound the orders' CreatedAt, ``[since, until)``.
+    """
+
+    clauses, params = list(clauses), list(params)
+    if since is not None:
+        clauses.append("o.CreatedAt >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("o.CreatedAt < ?")
+        params.append(until)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT o.OrderNumber, o.CreatedAt, o.Status, oi.ProductId, p.ItemName, p.Category, p.Supplier,
+                   oi.Quantity, oi.UnitPrice, oi.LineTotal
+            FROM vanshul_OrderItems oi
+            JOIN vanshul_Orders o ON o.Id = oi.OrderId
+            JOIN vanshul_Products p ON p.Id = oi.ProductId
+            {_where(clauses)}
+            ORDER BY o.CreatedAt, o.Id
+            """,
+            params,
+        )
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+# Orders that count as sales
+_SOLD = "(o.Status IS NULL OR o.Status <> 'Cancelled')"
+
+
+def open_daily_sales(conn, since):
+    """Execute the query for units sold per ``(ProductId, SaleDate)`` since ``since``, cancelled orders excluded, and return the cursor."""
+
+    day = dialects.current().date_of('o.CreatedAt')
+    cursor = conn.cursor()
+    try:
+        # Seeks IX_vanshul_Orders_CreatedAt (migration 0006), then each order's lines on IX_vanshul_OrderItems_OrderId
+        cursor.execute(
+            f"""
+            SELECT oi.ProductId, {day} AS SaleDate, SUM(oi.Quantity) AS Units
+            FROM vanshul_Orders o
+            JOIN vanshul_OrderItems oi ON oi.OrderId = o.Id
+            WHERE o.CreatedAt >= ? AND {_SOLD}
+            GROUP BY oi.ProductId, {day}
+            """,
+            (since,),
+        )
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+def hourly_sales(conn, since, until):
+    """Units, revenue and cost (units x PurchasePrice) per product and hour of orders placed in ``[since, until)``.
+
+    Rows are ``(ProductId, Category, SupplierId, SaleHour, Units, Revenue, Cost)``.
+    """
+
+    hour = dialects.current().hour_of('o.CreatedAt')
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT oi.ProductId, p.Category, p.SupplierId, {hour} AS SaleHour,
+                   SUM(oi.Quantity) AS Units, SUM(oi.LineTotal) AS Revenue, SUM(oi.Quantity * p.PurchasePrice) AS Cost
+            FROM vanshul_Orders o
+            JOIN vanshul_OrderItems oi ON oi.OrderId = o.Id
+            JOIN vanshul_Products p ON p.Id = oi.ProductId
+            WHERE o.CreatedAt >= ? AND o.CreatedAt < ? AND {_SOLD}
+            GROUP BY oi.ProductId, p.Category, p.SupplierId, {hour}
+            """,
+            (since, until),
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def database_now(conn):
+    """The database's current time, by the clock that stamps CreatedAt (on SQL Server its local time, not UTC)."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {dialects.current().current_timestamp}")
+        value = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def first_order_at(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(CreatedAt) FROM vanshul_Orders")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return row[0] if row else None
+
+
+def job_watermark(conn, name):
+    """How far job ``name`` has processed (a datetime), or None before its first run."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT ProcessedThrough FROM vanshul_JobWatermarks WHERE Name = ?", (name,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return row[0] if isinstance(row[0], datetime) else datetime.fromisoformat(str(row[0]))
+
+
+def advance_job_watermark(cursor, name, previous, through):
+    """Move job ``name``'s watermark from ``previous`` to ``through``; False if another run moved it first.
+
+    Run it first in the job's transaction: the row lock it takes keeps a concurrent run waiting until this one commits.
+    """
+
+    if previous is None:
+        cursor.execute("INSERT INTO vanshul_JobWatermarks (Name, ProcessedThrough) VALUES (?, ?)", (name, through))
+        return True
+    cursor.execute(
+        "UPDATE vanshul_JobWatermarks SET ProcessedThrough = ? WHERE Name = ? AND ProcessedThrough = ?",
+        (through, name, previous),
+    )
+    return cursor.rowcount == 1
+
+
+_ROLLUP_DIMENSIONS = {
+    'product': ("r.ProductId", "p.ItemName", "LEFT JOIN vanshul_Products p ON p.Id = r.ProductId"),
+    'category': ("r.Category", "r.Category", ""),
+    'supplier': ("r.SupplierId", "s.Name", "LEFT JOIN vanshul_Suppliers s ON s.Id = r.SupplierId"),
+}
+
+
+def _rollup_filter(grain, start, end, supplier_id):
+    # Seeks the clustered key (Grain, PeriodStart, ProductId), or IX_vanshul_SalesRollup_SupplierId (migration 0007)
+    clauses = ["r.Grain = ?", "r.PeriodStart >= ?", "r.PeriodStart < ?"]
+    params = [grain, start, end]
+    if supplier_id is not None:
+        clauses.append("r.SupplierId = ?")
+        params.append(supplier_id)
+    return _where(clauses), params
+
+
+def rollup_series(conn, grain, start, end, supplier_id=None):
+    """Units, Revenue and Cost per period of ``grain`` in ``[start, end)``, oldest first."""
+
+    where, params = _rollup_filter(grain, start, end, supplier_id)
+    return _fetch_all(
+        conn,
+        f"""
+        SELECT r.PeriodStart, SUM(r.Units) AS Units, SUM(r.Revenue) AS Revenue, SUM(r.Cost) AS Cost
+        FROM vanshul_SalesRollup r {where}
+        GROUP BY r.PeriodStart
+        ORDER BY r.PeriodStart
+        """,
+        params,
+    )
+
+
+def rollup_breakdown(conn, grain, start, end, by, supplier_id=None):
+    """Units, Revenue and Cost in ``[start, end)`` per product, category or supplier (``by``), best-selling first."""
+
+    key, name, join = _ROLLUP_DIMENSIONS[by]
+    where, params = _rollup_filter(grain, start, end, supplier_id)
+    return _fetch_all(
+        conn,
+        f"""
+        SELECT {key} AS KeyId, {name} AS Name, SUM(r.Units) AS Units, SUM(r.Revenue) AS Revenue, SUM(r.Cost) AS Cost
+        FROM vanshul_SalesRollup r {join} {where}
+        GROUP BY {key}, {name}
+        ORDER BY SUM(r.Revenue) DESC
+        """,
+        params,
+    )
+
+
+def open_rollup_export(conn, grain, start, end, by, supplier_id=None):
+    """Execute the query for ``(PeriodStart, Name, Units, Revenue, Cost)`` per period and ``by``, and return the cursor."""
+
+    key, name, join = _ROLLUP_DIMENSIONS[by]
+    where, params = _rollup_filter(grain, start, end, supplier_id)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT r.PeriodStart, {name} AS Name, SUM(r.Units) AS Units, SUM(r.Revenue) AS Revenue, SUM(r.Cost) AS Cost
+            FROM vanshul_SalesRollup r {join} {where}
+            GROUP BY r.PeriodStart, {key}, {name}
+            ORDER BY r.PeriodStart, SUM(r.Revenue) DESC
+            """,
+            params,
+        )
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+def supplier_id_for(cursor, name, known=None):
+    """Return the vanshul_Suppliers Id for ``name``, adding the supplier if it is new (None for a blank name).
+
+    ``known`` is an optional name -> Id dict reused across calls, e.g. for every row of an import.
+    """
+
+    name = (name or '').strip()
+    if not name:
+        return None
+    if known is not None and name in known:
+        return known[name]
+    cursor.execute("SELECT Id FROM vanshul_Suppliers WHERE Name = ?", (name,))
+    row = cursor.fetchone()
+    supplier_id = row[0] if row else None
+    if supplier_id is None:
+        supplier_id = new_id()
+        cursor.execute("INSERT INTO vanshul_Suppliers (Id, Name) VALUES (?, ?)", (supplier_id, name))
+    if known is not None:
+        known[name] = supplier_id
+    return supplier_id
+
+
+def list_suppliers(conn):
+    return _fetch_all(conn, "SELECT Id, Name FROM vanshul_Suppliers ORDER BY Name")
+
+
+def supplier_for_email(conn, email):
+    """The vanshul_Suppliers row (Id, Name) whose Email is ``email`` (case-insensitive), or None."""
+
+    suppliers = _fetch_all(conn, "SELECT Id, Name FROM vanshul_Suppliers WHERE LOWER(Email) = ?", ((email or '').strip().lower(),))
+    return suppliers[0] if suppliers else None
+
+
+def link_supplier_email(cursor, name, email):
+    """Record ``email`` as the sign-in of supplier ``name`` (added if new); returns the supplier's Id (None for a blank name)."""
+
+    supplier_id = supplier_id_for(cursor, name)
+    if supplier_id is None:
+        return None
+    cursor.execute("UPDATE vanshul_Suppliers SET Email = ? WHERE Id = ?", (email.strip().lower(), supplier_id))
+    return supplier_id
+
+
+def link_product_suppliers(cursor):
+    """Point SupplierId at a supplier row for products that only have a Supplier name."""
+
+    cursor.execute("SELECT DISTINCT Supplier FROM vanshul_Products WHERE SupplierId IS NULL AND Supplier IS NOT NULL")
+    known = {}
+    for (name,) in cursor.fetchall():
+        supplier_id = supplier_id_for(cursor, name, known)
+        if supplier_id is not None:
+            cursor.execute(
+                "UPDATE vanshul_Products SET SupplierId = ? WHERE SupplierId IS NULL AND Supplier = ?",
+                (supplier_id, name),
+            )
+
+
+def insert_product(cursor, product, known_suppliers=None):
+    """Insert ``product`` (column -> value), linking it to its supplier by name.
+
+    Its Quantity is recorded as a receipt in the inventory ledger, the product
+    starting from an empty snapshot, and a ``product.created`` event in the
+    outbox. ``known_suppliers`` is passed to supplier_id_for().
+    """
+
+    product = dict(product)
+    received = product.get('Quantity') or 0
+    product['Quantity'] = 0
+    if 'SupplierId' not in product:
+        product['SupplierId'] = supplier_id_for(cursor, product.get('Supplier'), known_suppliers)
+    # Generated here even where the server has a default: the receipt and the event need it
+    product.setdefault('Id', new_id())
+    columns = ', '.join(product)
+    marks = ', '.join('?' for _ in product)
+    cursor.execute(f"INSERT INTO vanshul_Products ({columns}) VALUES ({marks})", tuple(product.values()))
+    if received:
+        record_movement(cursor, product['Id'], 'receipt', received)
+    record_event(cursor, 'product.created', product['Id'], {**product, 'Quantity': received})
+    return product['Id']
+
+
+def record_movement(cursor, product_id, kind, quantity, reference=None, note=None):
+    """Append a stock movement: ``quantity`` units in (positive) or out (negative) of ``product_id``."""
+
+    cursor.execute(
+        """
+        INSERT INTO vanshul_InventoryMovements (ProductId, Kind, Quantity, Reference, Note)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (product_id, kind, quantity, reference, note),
+    )
+
+
+def record_event(cursor, event_type, subject_id, payload):
+    """Append an event about ``subject_id`` to the outbox; it commits or rolls back with the caller's transaction."""
+
+    cursor.execute(
+        "INSERT INTO vanshul_Outbox (EventType, SubjectId, Payload) VALUES (?, ?, ?)",
+        (event_type, subject_id, json.dumps(payload, default=str, separators=(',', ':'))),
+    )
+
+
+def outbox_events(conn, after, limit):
+    """Up to ``limit`` outbox events after Seq ``after``, oldest first; a range seek of the clustered key."""
+
+    sql, params = dialects.current().limit(
+        """
+        SELECT Seq, EventType, SubjectId, Payload, CreatedAt
+        FROM vanshul_Outbox
+        WHERE Seq > ?
+        ORDER BY Seq
+        """,
+        (after,),
+        limit,
+    )
+    return _fetch_all(conn, sql, params)
+
+
+def outbox_published_through(conn, sink):
+    """The last outbox Seq published to ``sink``, or None before its first publish."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT PublishedThrough FROM vanshul_OutboxRelay WHERE Sink = ?", (sink,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return None if row is None else row[0]
+
+
+def advance_outbox_relay(cursor, sink, previous, through):
+    """Move ``sink``'s relay position from ``previous`` to ``through``; False if another relay moved it first."""
+
+    if previous is None:
+        cursor.execute("INSERT INTO vanshul_OutboxRelay (Sink, PublishedThrough) VALUES (?, ?)", (sink, through))
+        return True
+    cursor.execute(
+        "UPDATE vanshul_OutboxRelay SET PublishedThrough = ? WHERE Sink = ? AND PublishedThrough = ?",
+        (through, sink, previous),
+    )
+    return cursor.rowcount == 1
+
+
+def lock_on_hand(cursor, product_id):
+    """Lock ``product_id``'s row until the transaction ends and return its stock on hand (None if there is no such product).
+
+    Movements that take stock out take this lock first (``draw_stock()``; a sharded
+    product's sales lock a shard instead), so two of them never both spend the
+    same units; receipts just append.
+    """
+
+    dialect = dialects.current()
+    cursor.execute(
+        f"""
+        SELECT p.Quantity + {_PENDING_STOCK.format(product='p').strip()}
+        FROM vanshul_Products p{dialect.row_lock_hint}
+        WHERE p.Id = ?{dialect.row_lock_suffix}
+        """,
+        (product_id,),
+    )
+    row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def draw_stock(cursor, product_id, quantity):
+    """Take ``quantity`` units of ``product_id`` for a movement about to be recorded; False if too few are on hand.
+
+    A sharded product's units come out of one of its shards, locking that row only;
+    any other product's row is locked as by ``lock_on_hand()``.
+    """
+
+    drawn = _draw_from_shards(cursor, product_id, quantity)
+    if drawn is None:
+        on_hand = lock_on_hand(cursor, product_id)
+        # Sharding takes this lock too, so the product cannot have been sharded since we looked
+        drawn = _draw_from_shards(cursor, product_id, quantity)
+        if drawn is None:
+            drawn = on_hand is not None and on_hand >= quantity
+    return drawn
+
+
+def _draw_from_shards(cursor, product_id, quantity):
+    cursor.execute("SELECT COUNT(*) FROM vanshul_StockShards WHERE ProductId = ?", (product_id,))
+    shards = cursor.fetchone()[0]
+    if not shards:
+        return None
+    # A random shard first, then its siblings, so concurrent sales of the product spread over the rows
+    first = random.randrange(shards)
+    for offset in range(shards):
+        cursor.execute(
+            """
+            UPDATE vanshul_StockShards SET Quantity = Quantity - ?
+            WHERE ProductId = ? AND Shard = ? AND Quantity >= ?
+            """,
+            (quantity, product_id, (first + offset) % shards, quantity),
+        )
+        if cursor.rowcount == 1:
+            return True
+    # No one shard holds enough: take the units from all of them together
+    total = spread_over_shards(cursor, product_id, -quantity)
+    return None if total is None else total >= quantity
+
+
+def lock_stock_shards(cursor, product_id):
+    """Lock ``product_id``'s shards until the transaction ends and return their quantities in shard order ([] if it has none)."""
+
+    dialect = dialects.current()
+    cursor.execute(
+        f"""
+        SELECT Quantity FROM vanshul_StockShards{dialect.row_lock_hint}
+        WHERE ProductId = ?
+        ORDER BY Shard{dialect.row_lock_suffix}
+        """,
+        (product_id,),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def spread_over_shards(cursor, product_id, change):
+    """Lock ``product_id``'s shards and share their total plus ``change`` out evenly among them again.
+
+    Returns their total before the change, which is not made if it would leave less
+    than nothing; None if the product is not sharded.
+    """
+
+    quantities = lock_stock_shards(cursor, product_id)
+    if not quantities:
+        return None
+    total = sum(quantities)
+    if total + change >= 0:
+        cursor.executemany(
+            "UPDATE vanshul_StockShards SET Quantity = ? WHERE ProductId = ? AND Shard = ?",
+            [(quantity, product_id, shard) for shard, quantity in enumerate(_split(total + change, len(quantities)))],
+        )
+    return total
+
+
+def replace_stock_shards(cursor, product_id, on_hand, shards):
+    """Split ``on_hand`` across ``shards`` new shards of ``product_id`` (0: none, the product row holds its stock)."""
+
+    cursor.execute("DELETE FROM vanshul_StockShards WHERE ProductId = ?", (product_id,))
+    if shards:
+        cursor.executemany(
+            "INSERT INTO vanshul_StockShards (ProductId, Shard, Quantity) VALUES (?, ?, ?)",
+            [(product_id, shard, quantity) for shard, quantity in enumerate(_split(on_hand, shards))],
+        )
+
+
+def _split(quantity, parts):
+    share, extra = divmod(quantity, parts)
+    return [share + 1 if part < extra else share for part in range(parts)]
+
+
+def product_movements(conn, product_id, limit=50):
+    """``product_id``'s latest stock movements, newest first."""
+
+    sql, params = dialects.current().limit(
+        """
+        SELECT Seq, Kind, Quantity, Reference, Note, CreatedAt
+        FROM vanshul_InventoryMovements
+        WHERE ProductId = ?
+        ORDER BY Seq DESC
+        """,
+        (product_id,),
+        limit,
+    )
+    return _fetch_all(conn, sql, params)
+
+
+def stock_compacted_through(conn):
+    """The last movement Seq folded into vanshul_Products.Quantity, or None before the first compaction."""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT ThroughSeq FROM vanshul_StockCompaction WHERE Id = 1")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return None if row is None else row[0]
+
+
+def settled_movements(conn, after, before):
+    """The last Seq after ``after`` recorded before ``before``, and the net quantity per product up to it.
+
+    Returns ``(through, [(ProductId, Quantity)...])`` ordered by ProductId, or ``(None, [])`` if there are none.
+    """
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT MAX(Seq) FROM vanshul_InventoryMovements WHERE Seq > ? AND CreatedAt < ?", (after or 0, before)
+        )
+        through = cursor.fetchone()[0]
+        if through is None:
+            return None, []
+        cursor.execute(
+            """
+            SELECT ProductId, SUM(Quantity)
+            FROM vanshul_InventoryMovements
+            WHERE Seq > ? AND Seq <= ?
+            GROUP BY ProductId
+            """,
+            (after or 0, through),
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return through, sorted(((str(product_id).lower(), quantity) for product_id, quantity in rows if quantity))
+
+
+def fold_movements(cursor, totals, previous, through, compacted_at):
+    """Add ``totals`` (ProductId, Quantity) to the snapshot and move the compaction mark from ``previous`` to ``through``.
+
+    False if another compaction moved the mark first; the caller must then roll back.
+    """
+
+    if totals:
+        cursor.executemany(
+            "UPDATE vanshul_Products SET Quantity = Quantity + ? WHERE Id = ?",
+            [(quantity, product_id) for product_id, quantity in totals],
+        )
+    # Last, after the product rows: sales lock those first too, so neither waits on the other in reverse
+    if previous is None:
+        cursor.execute(
+            "INSERT INTO vanshul_StockCompaction (Id, ThroughSeq, CompactedAt) VALUES (1, ?, ?)", (through, compacted_at)
+        )
+        return True
+    cursor.execute(
+        "UPDATE vanshul_StockCompaction SET ThroughSeq = ?, CompactedAt = ? WHERE Id = 1 AND ThroughSeq = ?",
+        (through, compacted_at, previous),
+    )
+    return cursor.rowcount == 1
+
+
+def create_order(conn, order_items, customer_email, status):
+    """Record an order with its ledger sales and ``order.placed`` event; commits, or rolls back and raises ValueError if stock is short."""
+
+    if not order_items:
+        raise ValueError('No order items provided')
+
+    cursor = conn.cursor()
+    try:
+        order_id = new_id()
+        order_number = f"VV-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
+        total_amount = sum(item['quantity'] * item['unit_price'] for item in order_items)
+
+        cursor.execute(
+            """
+            INSERT INTO vanshul_Orders (Id, OrderNumber, CustomerEmail, Status, TotalAmount)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (order_id, order_number, customer_email, status, total_amount),
+        )
+
+        # Products are locked in one order, the one compaction uses, so no two transactions wait on each other in reverse
+        for item in sorted(order_items, key=lambda item: str(item['product_id']).lower()):
+            if not draw_stock(cursor, item['product_id'], item['quantity']):
+                raise ValueError(f"Insufficient inventory for {item['name']}")
+            record_movement(cursor, item['product_id'], 'sale', -item['quantity'], reference=order_id)
+
+            cursor.execute(
+                """
+                INSERT INTO vanshul_OrderItems (OrderItemId, OrderId, ProductId, Quantity, UnitPrice, LineTotal)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    new_id(),
+                    order_id,
+                    item['product_id'],
+                    item['quantity'],
+                    item['unit_price'],
+                    item['quantity'] * item['unit_price'],
+                ),
+            )
+
+        record_event(
+            cursor,
+            'order.placed',
+            order_id,
+            {
+                'OrderNumber': order_number,
+                'CustomerEmail': customer_email,
+                'Status': status,
+                'TotalAmount': total_amount,
+                'Items': [
+                    {'ProductId': item['product_id'], 'Quantity': item['quantity'], 'UnitPrice': item['unit_price']}
+                    for item in order_items
+                ],
+            },
+        )
+        conn.commit()
+        return order_number, total_amount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def customer_orders(conn, customer_email, limit, before=None):
+    """Return a customer's orders, newest first, each with its ``items``, and whether more follow.
+
+    ``before`` is the ``(CreatedAt, Id)`` of the last order of the previous page.
+    """
+
+    clauses, params = ["CustomerEmail = ?"], [customer_email]
+    if before is not None:
+        created_at, last_id = before
+        clauses.append("(CreatedAt < ? OR (CreatedAt = ? AND Id < ?))")
+        params.extend([created_at, created_at, last_id])
+    sql, params = dialects.current().limit(
+        f"""
+        SELECT Id, OrderNumber, Status, TotalAmount, CreatedAt
+        FROM vanshul_Orders
+        {_where(clauses)}
+        ORDER BY CreatedAt DESC, Id DESC
+        """,
+        params,
+        limit + 1,
+    )
+    orders = _fetch_all(conn, sql, params)
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    items_by_order = {}
+    if orders:
+        placeholders = ', '.join('?' for _ in orders)
+        items = _fetch_all(
+            conn,
+            f"""
+            SELECT oi.OrderId, oi.ProductId, p.ItemName, oi.Quantity, oi.UnitPrice, oi.LineTotal
+            FROM vanshul_OrderItems oi
+            LEFT JOIN vanshul_Products p ON p.Id = oi.ProductId
+            WHERE oi.OrderId IN ({placeholders})
+            """,
+            [order['Id'] for order in orders],
+        )
+        for item in items:
+            items_by_order.setdefault(str(item.pop('OrderId')).lower(), []).append(item)
+    for order in orders:
+        order['items'] = items_by_order.get(str(order['Id']).lower(), [])
+    return orders, has_more
+
+
+def insert_customer(cursor, full_name, email, password_hash):
+    customer_id = new_id()
+    cursor.execute(
+        """
+        INSERT INTO Customers (Id, FullName, Email, PasswordHash)
+        VALUES (?, ?, ?, ?)
+        """,
+        (customer_id, full_name, email, password_hash),
+    )
+    return customer_id
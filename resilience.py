@@ -0,0 +1,175 @@
+"""Keeping the storefront up while the database is slow or down.
+
+``CircuitBreaker`` stops the app from queueing every request behind a
+database that is not answering. After ``failure_threshold`` consecutive
+failures (connections that fail or time out, statements that hit the query
+timeout) it opens: ``get_db()`` raises at once instead of waiting for another
+timeout. After ``reset_seconds`` one caller is let through as a probe; its
+success closes the breaker, its failure re-opens it for another period.
+
+``StaleWhileRevalidate`` keeps the last good result of a loader (the
+catalogue). Results younger than ``fresh_seconds`` are served as they are;
+older ones are still served immediately while a single background thread
+reloads, retrying with backoff for as long as the database keeps failing. Only
+the very first load -- when there is nothing to serve yet -- waits for the
+database.
+
+Configured in app.py from:
+
+    DB_BREAKER_FAILURES        consecutive failures that open the breaker (default 5)
+    DB_BREAKER_RESET_SECONDS   how long it stays open before a probe (default 30)
+    CATALOG_FRESH_SECONDS      age after which the catalogue snapshot is reloaded (default 10)
+    CATALOG_RETRY_MAX_SECONDS  longest pause between failed background reloads (default 30)
+"""
+
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger('app.resilience')
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half-open', 'open'
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open: the call was refused without trying the database."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, error_class=Exception, failure_threshold=5, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        # Also an ``error_class``, so code catching the driver's errors handles a refusal too
+        self.OpenError = type('CircuitOpenError', (CircuitOpenError, error_class), {})
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        metrics.DB_BREAKER_STATE.labels(name).set(0)
+
+    def before_call(self):
+        """Raise ``OpenError`` unless a call may go ahead now."""
+
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                # This caller is the probe; everyone else is refused until it reports back
+                self._set_state(HALF_OPEN)
+                return
+        metrics.DB_BREAKER_REJECTIONS.labels(self.name).inc()
+        raise self.OpenError(f"{self.name} unavailable: circuit breaker is {self.state} after repeated failures")
+
+    def record_success(self):
+        if self.state == CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._failures = 0
+            if self.state != CLOSED:
+                logger.info("Circuit breaker %s closed: %s is answering again", self.name, self.name)
+                self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                logger.error(
+                    "Circuit breaker %s opened for %.0fs after %d failure(s): %s",
+                    self.name,
+                    self.reset_seconds,
+                    self._failures,
+                    error,
+                )
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.DB_BREAKER_STATE.labels(self.name).set({CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[state])
+
+
+class StaleWhileRevalidate:
+    def __init__(self, name, loader, error_types=Exception, fresh_seconds=10.0, retry_max_seconds=30.0):
+        self.name = name
+        self.loader = loader
+        self.error_types = error_types
+        self.fresh_seconds = fresh_seconds
+        self.retry_max_seconds = retry_max_seconds
+        # (value, monotonic time loaded), replaced whole so readers never need the lock
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._refresh_lock = threading.Lock()
+
+    def get(self, refresh=False):
+        """The latest value; ``refresh=True`` reloads first, falling back to the snapshot if that fails."""
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load_first()
+        if refresh:
+            try:
+                return self._load()
+            except self.error_types as e:
+                logger.warning("Serving stale %s: reload failed: %s", self.name, e)
+                self._revalidate()
+                return self._snapshot[0]
+
+        value, loaded_at = snapshot
+        age = time.monotonic() - loaded_at
+        fresh = age < self.fresh_seconds
+        metrics.cache_lookup(self.name, fresh, stale=not fresh)
+        metrics.CACHE_AGE.labels(self.name).set(age)
+        if not fresh:
+            self._revalidate()
+        return value
+
+    def age(self):
+        snapshot = self._snapshot
+        return None if snapshot is None else time.monotonic() - snapshot[1]
+
+    def invalidate(self):
+        """Make the next ``get()`` start a reload (it still serves the current snapshot meanwhile)."""
+
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self._snapshot = (snapshot[0], snapshot[1] - self.fresh_seconds)
+
+    def _load(self):
+        value = self.loader()
+        self._snapshot = (value, time.monotonic())
+        return value
+
+    def _load_first(self):
+        # One caller loads; the others wait for its result rather than all querying at once
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                return snapshot[0]
+            metrics.cache_lookup(self.name, False)
+            return self._load()
+
+    def _revalidate(self):
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name=f'{self.name}-refresh', daemon=True).start()
+
+    def _refresh(self):
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    self._load()
+                    return
+                except self.error_types as e:
+                    logger.warning("Reloading %s failed, retrying in %.0fs: %s", self.name, delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max_seconds)
+        finally:
+            with self._refresh_lock:
+                self._refreshing = False
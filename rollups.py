@@ -0,0 +1,255 @@
+"""Sales rollups: units, revenue and cost per product per hour, day and month.
+
+The supplier console's reports used to need every order line of the range
+they covered; a year's report summed a year of orders. Here orders are folded
+once into vanshul_SalesRollup (migration 0007) -- one row per grain, period
+and product, carrying the product's category and supplier at the time -- and
+reports read only those rows: a year by month is at most twelve rows per
+product whatever the order volume.
+
+``run()`` folds orders placed between the job's watermark
+(vanshul_JobWatermarks) and ``ROLLUP_SETTLE_SECONDS`` ago, one calendar month
+at a time. Each month is one transaction that first moves the watermark --
+compare-and-set, so two processes never fold the same orders -- then reads the
+orders' hourly totals, derives the day and month totals from them and writes
+all three grains. The watermark is not held to hour boundaries: each run folds
+the current hour, day and month so far, and periods that started before the
+chunk are added to; the rest are inserted. Orders are assumed to commit within
+the settle time: one placed before the watermark but committed after it would
+be missed. Cancelling an order does not take it back out of the rollups.
+
+Orders are stamped by the database's clock (GETDATE(), the server's local
+time), so the watermark and the reports' periods are taken from it too
+(``repository.database_now()``), not from the app server's.
+
+The first run, from the first order on, is a backfill: ``flask rollups``.
+After that the reports call ``refresher.refresh_if_due()``: at most every
+``ROLLUP_REFRESH_SECONDS`` per process, the request that finds it due folds
+the orders since the last run (an hour's or so) and the others carry on with
+the rollups as they are.
+
+Configured from the environment:
+
+    ROLLUP_SETTLE_SECONDS   how old an order must be before it is folded in (default 60)
+    ROLLUP_REFRESH_SECONDS  how often a process catches the rollups up (default 60)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import dialects
+import metrics
+import repository
+
+logger = logging.getLogger('app.rollups')
+
+GRAINS = ('hour', 'day', 'month')
+WATERMARK = 'sales_rollup'
+
+SETTLE_SECONDS = float(os.getenv('ROLLUP_SETTLE_SECONDS') or 60)
+REFRESH_SECONDS = float(os.getenv('ROLLUP_REFRESH_SECONDS') or 60)
+
+_MEASURES = ['Units', 'Revenue', 'Cost']
+
+_INSERT = """
+    INSERT INTO vanshul_SalesRollup (Grain, PeriodStart, ProductId, Category, SupplierId, Units, Revenue, Cost)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_ADD = """
+    UPDATE vanshul_SalesRollup SET Units = Units + ?, Revenue = Revenue + ?, Cost = Cost + ?
+    WHERE Grain = ? AND PeriodStart = ? AND ProductId = ?
+"""
+
+
+def period_start(grain, moment):
+    """The start of the ``grain`` period containing ``moment``."""
+
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if grain == 'hour':
+        return moment
+    moment = moment.replace(hour=0)
+    return moment if grain == 'day' else moment.replace(day=1)
+
+
+def next_period(grain, start):
+    if grain == 'hour':
+        return start + timedelta(hours=1)
+    if grain == 'day':
+        return start + timedelta(days=1)
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def periods(grain, start, end):
+    """Every ``grain`` period start in ``[start, end)``."""
+
+    moment = period_start(grain, start)
+    found = []
+    while moment < end:
+        if moment >= start:
+            found.append(moment)
+        moment = next_period(grain, moment)
+    return found
+
+
+# What the reports offer: range -> (grain, periods covered, ending with the current one)
+RANGES = {
+    '24h': ('hour', 24),
+    '30d': ('day', 30),
+    '12m': ('month', 12),
+}
+
+
+def window(range_key, now):
+    """``(grain, start, end)`` of report range ``range_key``, up to the end of the period containing ``now``.
+
+    ``now`` is by the database's clock, which stamps the orders.
+    """
+
+    grain, count = RANGES[range_key]
+    start = period_start(grain, now)
+    end = next_period(grain, start)
+    for _ in range(count - 1):
+        start = period_start(grain, start - timedelta(microseconds=1))
+    return grain, start, end
+
+
+def to_datetime(value):
+    """``value`` read from a DateTime column as a datetime (SQLite hands back ISO text)."""
+
+    return value if isinstance(value, datetime) or value is None else datetime.fromisoformat(str(value))
+
+
+def run(conn, now=None):
+    """Fold orders placed up to ``ROLLUP_SETTLE_SECONDS`` before ``now`` into the rollups.
+
+    ``now`` is by the database's clock (default: read from it). Returns the number of hourly
+    rows folded; the watermark is the time orders have been folded up to.
+    """
+
+    started = time.perf_counter()
+    now = now or repository.database_now(conn)
+    # Whole seconds: a DATETIME watermark keeps them exactly, so the next run starts where this one stopped
+    until = (now - timedelta(seconds=SETTLE_SECONDS)).replace(microsecond=0)
+    previous = repository.job_watermark(conn, WATERMARK)
+    if previous is None:
+        # The first run starts from the first order (or now, before there are any)
+        first = to_datetime(repository.first_order_at(conn))
+        previous = period_start('month', first) if first is not None else until
+        cursor = conn.cursor()
+        try:
+            repository.advance_job_watermark(cursor, WATERMARK, None, previous)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    since = previous
+    folded = 0
+    while since < until:
+        through = min(next_period('month', period_start('month', since)), until)
+        cursor = conn.cursor()
+        try:
+            if not repository.advance_job_watermark(cursor, WATERMARK, previous, through):
+                conn.rollback()
+                logger.info("Sales rollups already advanced past %s by another run", since)
+                break
+            rows = repository.hourly_sales(conn, since, through)
+            _write(cursor, rows, since)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        logger.info("Folded %d product-hours of sales from %s to %s", len(rows), since, through)
+        folded += len(rows)
+        previous = since = through
+    elapsed = time.perf_counter() - started
+    metrics.ROLLUP_RUN_LATENCY.observe(elapsed)
+    metrics.ROLLUP_LAG.set((now - since).total_seconds())
+    return folded
+
+
+def _write(cursor, rows, since):
+    if not rows:
+        return
+    hourly = pd.DataFrame.from_records(
+        [tuple(row) for row in rows], columns=['ProductId', 'Category', 'SupplierId', 'PeriodStart', *_MEASURES]
+    )
+    hourly['ProductId'] = hourly['ProductId'].astype(str)
+    hourly['SupplierId'] = hourly['SupplierId'].map(lambda value: None if value is None else str(value))
+    hourly['PeriodStart'] = pd.to_datetime(hourly['PeriodStart'], format='ISO8601')
+    hourly[_MEASURES] = hourly[_MEASURES].astype('float64')
+
+    inserts, additions = [], []
+    for grain in GRAINS:
+        frame = hourly
+        if grain == 'day':
+            frame = hourly.assign(PeriodStart=hourly['PeriodStart'].dt.floor('D'))
+        elif grain == 'month':
+            frame = hourly.assign(PeriodStart=hourly['PeriodStart'].dt.to_period('M').dt.to_timestamp())
+        totals = frame.groupby(['PeriodStart', 'ProductId'], sort=False).agg(
+            Category=('Category', 'first'),
+            SupplierId=('SupplierId', 'first'),
+            Units=('Units', 'sum'),
+            Revenue=('Revenue', 'sum'),
+            Cost=('Cost', 'sum'),
+        )
+        for (start, product_id), category, supplier_id, units, revenue, cost in zip(
+            totals.index, totals['Category'], totals['SupplierId'], totals['Units'], totals['Revenue'], totals['Cost']
+        ):
+            start = start.to_pydatetime()
+            category = None if pd.isna(category) else category
+            supplier_id = None if pd.isna(supplier_id) else supplier_id
+            measures = (int(units), round(float(revenue), 2), round(float(cost), 2))
+            if start >= since:
+                inserts.append((grain, start, product_id, category, supplier_id, *measures))
+            else:
+                additions.append(((grain, start, product_id, category, supplier_id), measures))
+
+    # Periods begun before this chunk may already have a row (or may not: no sales in them yet)
+    for (grain, start, product_id, category, supplier_id), measures in additions:
+        cursor.execute(_ADD, (*measures, grain, start, product_id))
+        if cursor.rowcount == 0:
+            inserts.append((grain, start, product_id, category, supplier_id, *measures))
+    dialects.current().executemany_bulk(cursor, _INSERT, inserts)
+
+
+class Refresher:
+    """Catches the rollups up at most every ``refresh_seconds``, one process-wide run at a time."""
+
+    def __init__(self, refresh_seconds=60.0):
+        self.refresh_seconds = refresh_seconds
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def refresh_if_due(self, connect):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed_at = time.monotonic()
+            conn = connect()
+            try:
+                if repository.job_watermark(conn, WATERMARK) is None:
+                    # Backfilling every order ever placed is for `flask rollups`, not a page view
+                    logger.warning("Sales rollups have not been built yet; run `flask rollups`")
+                    return
+                run(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            # Retried after another refresh_seconds; reports show the rollups as they are meanwhile
+            logger.warning("Could not refresh sales rollups: %s", e)
+        finally:
+            self._lock.release()
+
+
+refresher = Refresher(refresh_seconds=REFRESH_SECONDS)
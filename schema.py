@@ -0,0 +1,306 @@
+"""The store's tables, defined once for every database backend.
+
+This is the schema as of the latest script in migrations/. SQL Server builds
+and evolves it with those T-SQL scripts, which also own its SQL Server-only
+storage details (the clustered ``RowId`` surrogates and ``NEWSEQUENTIALID()``
+defaults of migration 0002); PostgreSQL and SQLite are created, and later
+extended, directly from these definitions by ``migrate.migrate()``. A
+migration that changes a table must change it here as well.
+
+Names are created unquoted, so PostgreSQL stores them folded to lower case and
+the app's unquoted SQL matches them on every backend. Id columns have no
+portable server default: code that inserts rows supplies the GUID unless the
+dialect says the server generates it.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import mssql, postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# UNIQUEIDENTIFIER / UUID where the backend has one, its text form elsewhere
+GUID = (
+    sa.String(36)
+    .with_variant(mssql.UNIQUEIDENTIFIER(as_uuid=False), 'mssql')
+    .with_variant(postgresql.UUID(as_uuid=False), 'postgresql')
+)
+
+metadata = sa.MetaData()
+
+
+def _column(name, type_, *args, **kwargs):
+    return sa.Column(name, type_, *args, quote=False, **kwargs)
+
+
+def _created_at(nullable=True):
+    return _column('CreatedAt', sa.DateTime, nullable=nullable, server_default=sa.func.current_timestamp())
+
+
+suppliers = sa.Table(
+    'vanshul_Suppliers',
+    metadata,
+    _column('Id', GUID, primary_key=True),
+    _column('Name', sa.Unicode(100), nullable=False, unique=True),
+    _column('Email', sa.Unicode(255)),
+    _created_at(),
+    quote=False,
+)
+
+products = sa.Table(
+    'vanshul_Products',
+    metadata,
+    _column('Id', GUID, primary_key=True),
+    _column('ItemName', sa.Unicode(255), nullable=False),
+    _column('Category', sa.Unicode(100)),
+    # Display name as entered; SupplierId is the key to filter and join on
+    _column('Supplier', sa.Unicode(100)),
+    _column('PurchasePrice', sa.Float, nullable=False),
+    _column('SalePrice', sa.Float),
+    _column('ProfitMargin', sa.Float, server_default=sa.text('20.0')),
+    _column('SellingPrice', sa.Float, nullable=False),
+    _column('Quantity', sa.Integer, nullable=False),
+    _column('PhotoPaths', sa.Unicode()),
+    _created_at(),
+    _column('InitialQuantity', sa.Integer),
+    _column('SupplierId', GUID, sa.ForeignKey('vanshul_Suppliers.Id', name='FK_vanshul_Products_SupplierId')),
+    quote=False,
+)
+
+orders = sa.Table(
+    'vanshul_Orders',
+    metadata,
+    _column('Id', GUID, primary_key=True),
+    _column('OrderNumber', sa.Unicode(50), nullable=False, unique=True),
+    _column('CustomerEmail', sa.Unicode(255)),
+    _column('Status', sa.Unicode(50), server_default='Pending'),
+    _column('TotalAmount', sa.Numeric(18, 2), nullable=False, server_default=sa.text('0')),
+    _created_at(),
+    quote=False,
+)
+
+order_items = sa.Table(
+    'vanshul_OrderItems',
+    metadata,
+    _column('OrderItemId', GUID, primary_key=True),
+    _column('OrderId', GUID, sa.ForeignKey('vanshul_Orders.Id', name='FK_Order_OrderId'), nullable=False),
+    _column('ProductId', GUID, sa.ForeignKey('vanshul_Products.Id', name='FK_Order_ProductId'), nullable=False),
+    _column('Quantity', sa.Integer, nullable=False),
+    _column('UnitPrice', sa.Numeric(18, 2), nullable=False),
+    _column('LineTotal', sa.Numeric(18, 2), nullable=False),
+    quote=False,
+)
+
+customers = sa.Table(
+    'Customers',
+    metadata,
+    _column('Id', GUID, primary_key=True),
+    _column('FullName', sa.Unicode(255), nullable=False),
+    _column('Email', sa.Unicode(255), nullable=False, unique=True),
+    _column('PasswordHash', sa.Unicode(255), nullable=False),
+    _created_at(),
+    quote=False,
+)
+
+# On SQL Server supplier logins live in pre-existing tables (accounts.SUPPLIER_TABLES);
+# other backends get this one so a fresh database can sign suppliers in
+supplier_users = sa.Table(
+    'SupplierUsers',
+    metadata,
+    _column('Id', GUID, primary_key=True),
+    _column('FullName', sa.Unicode(255)),
+    _column('Email', sa.Unicode(255), nullable=False, unique=True),
+    _column('PasswordHash', sa.Unicode(255), nullable=False),
+    quote=False,
+)
+
+# One row, stamped on the primary and read back from replicas to measure their lag (replicas.py)
+replica_heartbeat = sa.Table(
+    'vanshul_ReplicaHeartbeat',
+    metadata,
+    _column('Id', sa.Integer, primary_key=True, autoincrement=False),
+    _column('BeatAt', sa.DateTime, nullable=False),
+    quote=False,
+)
+
+# Units, revenue and cost sold per product per hour, day and month (rollups.py)
+sales_rollup = sa.Table(
+    'vanshul_SalesRollup',
+    metadata,
+    _column('Grain', sa.Unicode(5), primary_key=True),
+    _column('PeriodStart', sa.DateTime, primary_key=True),
+    _column('ProductId', GUID, primary_key=True),
+    # The product's category and supplier when the rollup was written, so reports need no join
+    _column('Category', sa.Unicode(100)),
+    _column('SupplierId', GUID),
+    _column('Units', sa.Integer, nullable=False),
+    _column('Revenue', sa.Numeric(18, 2), nullable=False),
+    _column('Cost', sa.Numeric(18, 2), nullable=False),
+    quote=False,
+)
+
+# How far each background job has got, e.g. orders folded into the rollups
+job_watermarks = sa.Table(
+    'vanshul_JobWatermarks',
+    metadata,
+    _column('Name', sa.Unicode(50), primary_key=True),
+    _column('ProcessedThrough', sa.DateTime, nullable=False),
+    quote=False,
+)
+
+# Append-only stock movements: receipts, sales and adjustments as signed quantities (stock.py)
+inventory_movements = sa.Table(
+    'vanshul_InventoryMovements',
+    metadata,
+    # SQLite only auto-numbers an INTEGER primary key
+    _column('Seq', sa.BigInteger().with_variant(sa.Integer, 'sqlite'), primary_key=True, autoincrement=True),
+    _column('ProductId', GUID, nullable=False),
+    _column('Kind', sa.Unicode(20), nullable=False),
+    _column('Quantity', sa.Integer, nullable=False),
+    # What caused it, e.g. the order's Id
+    _column('Reference', sa.Unicode(100)),
+    _column('Note', sa.Unicode(255)),
+    _created_at(nullable=False),
+    quote=False,
+)
+
+# One row: vanshul_Products.Quantity includes every movement up to ThroughSeq
+stock_compaction = sa.Table(
+    'vanshul_StockCompaction',
+    metadata,
+    _column('Id', sa.Integer, primary_key=True, autoincrement=False),
+    _column('ThroughSeq', sa.BigInteger, nullable=False),
+    _column('CompactedAt', sa.DateTime, nullable=False),
+    quote=False,
+)
+
+# A hot product's stock on hand, split across counter rows that sales draw from one at a time (stock.py)
+stock_shards = sa.Table(
+    'vanshul_StockShards',
+    metadata,
+    _column('ProductId', GUID, primary_key=True),
+    _column('Shard', sa.Integer, primary_key=True, autoincrement=False),
+    _column('Quantity', sa.Integer, nullable=False),
+    quote=False,
+)
+
+# Events appended in the same transaction as the writes they describe (outbox.py)
+outbox = sa.Table(
+    'vanshul_Outbox',
+    metadata,
+    _column('Seq', sa.BigInteger().with_variant(sa.Integer, 'sqlite'), primary_key=True, autoincrement=True),
+    _column('EventType', sa.Unicode(50), nullable=False),
+    _column('SubjectId', GUID, nullable=False),
+    # JSON
+    _column('Payload', sa.Unicode(), nullable=False),
+    _created_at(nullable=False),
+    quote=False,
+)
+
+# The last event the relay has published to each sink
+outbox_relay = sa.Table(
+    'vanshul_OutboxRelay',
+    metadata,
+    _column('Sink', sa.Unicode(255), primary_key=True),
+    _column('PublishedThrough', sa.BigInteger, nullable=False),
+    quote=False,
+)
+
+schema_version = sa.Table(
+    'vanshul_SchemaVersion',
+    metadata,
+    _column('Version', sa.Integer, primary_key=True, autoincrement=False),
+    _column('Name', sa.Unicode(255), nullable=False),
+    _column('Checksum', sa.CHAR(64), nullable=False),
+    _column('AppliedAt', sa.DateTime, nullable=False, server_default=sa.func.current_timestamp()),
+    quote=False,
+)
+
+# Indexes from migrations 0002, 0003, 0005, 0006, 0007 and 0008; INCLUDE columns apply where the backend supports them
+sa.Index(
+    'IX_vanshul_OrderItems_OrderId',
+    order_items.c.OrderId,
+    mssql_include=['ProductId', 'Quantity', 'UnitPrice', 'LineTotal'],
+    postgresql_include=['ProductId', 'Quantity', 'UnitPrice', 'LineTotal'],
+)
+sa.Index(
+    'IX_vanshul_OrderItems_ProductId',
+    order_items.c.ProductId,
+    mssql_include=['OrderId', 'Quantity', 'UnitPrice', 'LineTotal'],
+    postgresql_include=['OrderId', 'Quantity', 'UnitPrice', 'LineTotal'],
+)
+sa.Index(
+    'IX_vanshul_Orders_CustomerEmail',
+    orders.c.CustomerEmail,
+    orders.c.CreatedAt.desc(),
+    orders.c.Id.desc(),
+    mssql_include=['OrderNumber', 'Status', 'TotalAmount'],
+    postgresql_include=['OrderNumber', 'Status', 'TotalAmount'],
+)
+sa.Index(
+    'IX_vanshul_Orders_CreatedAt',
+    orders.c.CreatedAt,
+    mssql_include=['Status'],
+    postgresql_include=['Status'],
+)
+sa.Index(
+    'IX_vanshul_Products_Category_Listing',
+    products.c.Category,
+    mssql_include=['Id', 'ItemName', 'Supplier', 'SellingPrice', 'SalePrice', 'Quantity', 'PhotoPaths', 'CreatedAt'],
+    postgresql_include=['Id', 'ItemName', 'Supplier', 'SellingPrice', 'SalePrice', 'Quantity', 'PhotoPaths', 'CreatedAt'],
+)
+sa.Index(
+    'IX_vanshul_Products_SupplierId',
+    products.c.SupplierId,
+    mssql_include=['Id', 'ItemName', 'Category', 'Supplier', 'PurchasePrice', 'SellingPrice', 'SalePrice', 'ProfitMargin', 'Quantity', 'InitialQuantity'],
+    postgresql_include=['Id', 'ItemName', 'Category', 'Supplier', 'PurchasePrice', 'SellingPrice', 'SalePrice', 'ProfitMargin', 'Quantity', 'InitialQuantity'],
+)
+sa.Index(
+    'IX_vanshul_SalesRollup_SupplierId',
+    sales_rollup.c.SupplierId,
+    sales_rollup.c.Grain,
+    sales_rollup.c.PeriodStart,
+    mssql_include=['ProductId', 'Category', 'Units', 'Revenue', 'Cost'],
+    postgresql_include=['ProductId', 'Category', 'Units', 'Revenue', 'Cost'],
+)
+sa.Index(
+    'IX_vanshul_InventoryMovements_ProductId',
+    inventory_movements.c.ProductId,
+    inventory_movements.c.Seq,
+    mssql_include=['Quantity'],
+    postgresql_include=['Quantity'],
+)
+
+# Lower-cased name -> name as written here, for backends that fold unquoted identifiers
+CANONICAL_NAMES = {
+    name.lower(): name
+    for table in metadata.tables.values()
+    for name in (table.name, *(column.name for column in table.columns))
+}
+
+
+def create_all(cursor, dialect, tables=None):
+    """Create whatever is missing of ``tables`` (default: all) -- tables, columns, indexes.
+
+    Additive only: existing columns are never altered and nothing is dropped.
+    Added columns get no constraints beyond their type.
+    """
+
+    compile_for = dialect.sqlalchemy_dialect()
+    tables = tables or metadata.sorted_tables
+    for table in tables:
+        cursor.execute(str(CreateTable(table, if_not_exists=True).compile(dialect=compile_for)).strip())
+    _add_missing_columns(cursor, dialect, tables, compile_for)
+    for table in tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            cursor.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=compile_for)).strip())
+
+
+def _add_missing_columns(cursor, dialect, tables, compile_for):
+    column_names = sorted({column.name for table in tables for column in table.columns})
+    sql, params = dialect.columns_query([table.name for table in tables], column_names)
+    cursor.execute(sql, params)
+    existing = {(table_name.lower(), column_name.lower()) for table_name, column_name in cursor.fetchall()}
+    for table in tables:
+        for column in table.columns:
+            if (table.name.lower(), column.name.lower()) not in existing:
+                column_type = column.type.compile(dialect=compile_for)
+                cursor.execute(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
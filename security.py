@@ -0,0 +1,234 @@
+"""Login hardening: token-bucket rate limits and a bounded password-hashing pool.
+
+Password hashing is deliberately expensive, so running it directly on request
+threads lets a credential-stuffing burst pin every worker. Verification runs
+on a small dedicated pool instead; when that pool and its queue are full new
+attempts are rejected immediately (``VerifierBusy``) rather than queueing, and
+a per-IP token bucket turns most abusive attempts away before any database
+lookup or hash is computed.
+
+Every attempt counts against the client's IP; only failed ones count against
+the account. Each attempt at an account that has failed too often costs the IP
+``LOGIN_LOCKED_ACCOUNT_COST`` tokens, so guessing at it soon stops the IPs
+doing it, and guesses spread across many IPs are capped by the account itself:
+every failure past its bucket makes the account wait before its next attempt,
+twice as long each time up to ``LOGIN_BACKOFF_MAX_SECONDS``, whichever IP the
+attempts come from. The account is never locked for good -- once the wait is
+over its owner's correct password is verified and signs in as usual, and a
+success clears the wait. Behind a reverse proxy the client's IP is only known
+with ``TRUSTED_PROXY_HOPS`` set (see app.py).
+
+Tuning (environment):
+    PASSWORD_HASH_METHOD       werkzeug method for new hashes (default scrypt:32768:8:1)
+    PASSWORD_WORKERS           concurrent hash computations (default 4)
+    PASSWORD_QUEUE_LIMIT       attempts allowed to wait for a worker (default 32)
+    PASSWORD_VERIFY_TIMEOUT    seconds a request waits for its result (default 5)
+    LOGIN_IP_BURST / LOGIN_IP_PER_MINUTE            per-client-IP bucket (20 / 10)
+    LOGIN_ACCOUNT_BURST / LOGIN_ACCOUNT_PER_MINUTE  per-account bucket of failed attempts (5 / 5)
+    LOGIN_LOCKED_ACCOUNT_COST  IP tokens an attempt at an account with no failures left costs (default 5)
+    LOGIN_BACKOFF_SECONDS / LOGIN_BACKOFF_MAX_SECONDS  first and longest wait after failures past the bucket (2 / 900)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+WERKZEUG_HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+def is_werkzeug_hash(value):
+    return isinstance(value, str) and value.startswith(WERKZEUG_HASH_PREFIXES) and '$' in value
+
+
+def needs_rehash(stored_value):
+    """True unless ``stored_value`` already uses the configured method and cost."""
+
+    if not is_werkzeug_hash(stored_value):
+        return True
+    return stored_value.split('$', 1)[0] != PASSWORD_HASH_METHOD
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string (client IP, account identifier)."""
+
+    def __init__(self, capacity, per_minute, max_keys=50000):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(per_minute) / 60.0
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _tokens(self, bucket, now):
+        return min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+
+    def exhausted(self, key, cost=1.0):
+        """True if ``allow(key, cost)`` would refuse now; takes no tokens."""
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            return bucket is not None and self._tokens(bucket, now) < cost
+
+    def allow(self, key, cost=1.0):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [self.capacity, now]
+            tokens = self._tokens(bucket, now)
+            bucket[1] = now
+            if tokens < cost:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - cost
+            return True
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.capacity / self.refill_per_second if self.refill_per_second else float('inf')
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])[: len(self._buckets) // 2]
+            for key, _ in oldest:
+                del self._buckets[key]
+
+
+class LoginBackoff:
+    """Growing waits between attempts at a key (an account) once its failures outrun a ``RateLimiter``.
+
+    The first failure the key's bucket has no token for makes it wait
+    ``base_seconds`` before its next attempt; every failure after that doubles
+    the wait, up to ``max_seconds``, whether or not the bucket has refilled. A
+    key is forgotten on success, or once it has gone ``max_seconds`` past its
+    wait without failing again.
+    """
+
+    def __init__(self, base_seconds, max_seconds, max_keys=50000):
+        self.base_seconds = float(base_seconds)
+        self.max_seconds = float(max_seconds)
+        self.max_keys = max_keys
+        self._waits = {}  # key -> [wait, not_before]
+        self._lock = threading.Lock()
+
+    def _current(self, key, now):
+        entry = self._waits.get(key)
+        if entry is not None and now - entry[1] >= self.max_seconds:
+            del self._waits[key]
+            return None
+        return entry
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may be tried again; 0 if it may be now."""
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(key, now)
+            return max(0.0, entry[1] - now) if entry is not None else 0.0
+
+    def failed(self, key, over_limit):
+        """Record a failure at ``key``; ``over_limit`` if its bucket refused it."""
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(key, now)
+            if entry is None:
+                if not over_limit:
+                    return
+                if len(self._waits) >= self.max_keys:
+                    self._prune(now)
+                wait = self.base_seconds
+            else:
+                wait = min(self.max_seconds, entry[0] * 2)
+            self._waits[key] = [wait, now + wait]
+
+    def succeeded(self, key):
+        with self._lock:
+            self._waits.pop(key, None)
+
+    def _prune(self, now):
+        for key in [key for key, (_, not_before) in self._waits.items() if now - not_before >= self.max_seconds]:
+            del self._waits[key]
+        if len(self._waits) >= self.max_keys:
+            oldest = sorted(self._waits.items(), key=lambda item: item[1][1])[: len(self._waits) // 2]
+            for key, _ in oldest:
+                del self._waits[key]
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+class PasswordVerifier:
+    def __init__(self, workers, queue_limit, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created lazily so each preforked worker process builds its own threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+        return self._executor
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Run ``fn`` on the pool and wait for it; raise VerifierBusy if the pool is saturated."""
+
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise VerifierBusy()
+
+    def submit(self, fn, *args):
+        """Schedule background work (e.g. a rehash); silently dropped when saturated."""
+
+        try:
+            self._submit(fn, *args)
+        except VerifierBusy:
+            pass
+
+
+password_verifier = PasswordVerifier(
+    workers=int(os.getenv('PASSWORD_WORKERS', '4')),
+    queue_limit=int(os.getenv('PASSWORD_QUEUE_LIMIT', '32')),
+    timeout=float(os.getenv('PASSWORD_VERIFY_TIMEOUT', '5')),
+)
+login_ip_limiter = RateLimiter(
+    capacity=int(os.getenv('LOGIN_IP_BURST', '20')),
+    per_minute=float(os.getenv('LOGIN_IP_PER_MINUTE', '10')),
+)
+login_account_limiter = RateLimiter(
+    capacity=int(os.getenv('LOGIN_ACCOUNT_BURST', '5')),
+    per_minute=float(os.getenv('LOGIN_ACCOUNT_PER_MINUTE', '5')),
+)
+LOCKED_ACCOUNT_COST = float(os.getenv('LOGIN_LOCKED_ACCOUNT_COST', '5'))
+login_backoff = LoginBackoff(
+    base_seconds=float(os.getenv('LOGIN_BACKOFF_SECONDS', '2')),
+    max_seconds=float(os.getenv('LOGIN_BACKOFF_MAX_SECONDS', '900')),
+)
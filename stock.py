@@ -0,0 +1,174 @@
+"""Stock on hand as an append-only ledger of movements plus a compacted snapshot.
+
+Every stock change is a row appended to vanshul_InventoryMovements (migration
+0008) -- ``receipt`` when a product is uploaded with stock, ``sale`` for each
+order line, ``adjustment`` for counts and write-offs (``flask adjust-stock``)
+-- so a product's history can be audited (``flask stock-history``) and
+writers add rows instead of rewriting the product's. vanshul_Products.Quantity
+is the snapshot: on hand as of the movement recorded in
+vanshul_StockCompaction. Stock on hand is the snapshot plus the movements
+after it; repository.py's product reads add them up in the same statement.
+
+Receipts append without taking any lock. Movements that take stock out lock
+the product row first and check what is on hand (``repository.lock_on_hand()``),
+so two orders can never sell the same last unit.
+
+That lock queues every sale of a product behind the one before, which is the
+whole checkout during a drop. A hot product can be sharded (``shard()``,
+``flask shard-stock``): its stock on hand is then split across
+vanshul_StockShards rows (migration 0009) and a sale takes its units from a
+random shard with a conditional decrement, trying its siblings if that one
+runs short, so sales queue per shard. Only when no single shard holds enough
+are all of them locked together, the units taken from their total and the
+rest shared out evenly again. Movements are recorded as before and product
+reads take a sharded product's stock from its shards.
+
+``compact()`` folds settled movements -- recorded more than
+``INVENTORY_SETTLE_SECONDS`` ago by the database's clock, which stamps them,
+so every transaction that appended them has committed -- into the snapshot and moves the mark, in one transaction, which
+keeps the pending movements (and the cost of adding them up) small. Processes
+call ``compactor.compact_if_due()`` after their writes; it runs inline at most
+every ``INVENTORY_COMPACT_SECONDS``, like the replica checks, so no background
+thread has to survive gunicorn's fork.
+
+Configured from the environment:
+
+    INVENTORY_COMPACT_SECONDS  how often a process folds movements into the snapshot (default 30)
+    INVENTORY_SETTLE_SECONDS   how old a movement must be before it is folded in (default 60)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+import metrics
+import repository
+
+logger = logging.getLogger('app.stock')
+
+KINDS = ('receipt', 'sale', 'adjustment')
+
+COMPACT_SECONDS = float(os.getenv('INVENTORY_COMPACT_SECONDS') or 30)
+SETTLE_SECONDS = float(os.getenv('INVENTORY_SETTLE_SECONDS') or 60)
+
+
+def compact(conn, now=None):
+    """Fold settled movements into vanshul_Products.Quantity; returns ``(through Seq, products changed)``.
+
+    ``now`` is by the database's clock (default: read from it).
+    """
+
+    started = time.perf_counter()
+    # CreatedAt is GETDATE(), the server's local time: the app's utcnow() would be off by its UTC offset
+    now = now or repository.database_now(conn)
+    previous = repository.stock_compacted_through(conn)
+    through, totals = repository.settled_movements(conn, previous, now - timedelta(seconds=SETTLE_SECONDS))
+    if through is None:
+        return previous, 0
+    cursor = conn.cursor()
+    try:
+        if not repository.fold_movements(cursor, totals, previous, through, now):
+            conn.rollback()
+            logger.info("Stock already compacted past movement %s by another run", previous)
+            return previous, 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - started
+    metrics.INVENTORY_COMPACTION_LATENCY.observe(elapsed)
+    metrics.INVENTORY_MOVEMENTS_FOLDED.inc(through - (previous or 0))
+    logger.info("Compacted stock movements %s-%s into %d products in %.3fs", (previous or 0) + 1, through, len(totals), elapsed)
+    return through, len(totals)
+
+
+def adjust(conn, product_id, quantity, note=None):
+    """Record an adjustment of ``quantity`` units (negative: out); commits, or raises ValueError.
+
+    Returns the stock on hand after it.
+    """
+
+    cursor = conn.cursor()
+    try:
+        on_hand = repository.lock_on_hand(cursor, product_id)
+        if on_hand is None:
+            raise ValueError(f"No product {product_id}")
+        # Sales draw from a sharded product's shards without the product lock; this locks them too
+        sharded = repository.spread_over_shards(cursor, product_id, quantity)
+        if sharded is not None:
+            on_hand = sharded
+        if on_hand + quantity < 0:
+            raise ValueError(f"Only {on_hand} on hand; cannot take out {-quantity}")
+        repository.record_movement(cursor, product_id, 'adjustment', quantity, note=note)
+        repository.record_event(
+            cursor, 'stock.adjusted', product_id, {'Quantity': quantity, 'OnHand': on_hand + quantity, 'Note': note}
+        )
+        conn.commit()
+        return on_hand + quantity
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def shard(conn, product_id, shards):
+    """Split ``product_id``'s stock on hand across ``shards`` counter rows (0: back onto its product row); commits.
+
+    Returns the stock on hand.
+    """
+
+    if shards < 0:
+        raise ValueError("The number of shards cannot be negative")
+    cursor = conn.cursor()
+    try:
+        # Unsharded sales hold the product lock, sharded ones their shard's: wait for both
+        on_hand = repository.lock_on_hand(cursor, product_id)
+        if on_hand is None:
+            raise ValueError(f"No product {product_id}")
+        quantities = repository.lock_stock_shards(cursor, product_id)
+        if quantities:
+            on_hand = sum(quantities)
+        repository.replace_stock_shards(cursor, product_id, on_hand, shards)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    logger.info("Split stock of %s (%d on hand) across %d shards", product_id, on_hand, shards)
+    return on_hand
+
+
+class Compactor:
+    """Runs ``compact()`` at most every ``interval`` seconds per process, one thread at a time."""
+
+    def __init__(self, interval=30.0):
+        self.interval = interval
+        self._compacted_at = None
+        self._lock = threading.Lock()
+
+    def compact_if_due(self, connect):
+        if self._compacted_at is not None and time.monotonic() - self._compacted_at < self.interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._compacted_at = time.monotonic()
+            conn = connect()
+            try:
+                compact(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            # Retried after another interval; on hand is still right, only more movements are added up meanwhile
+            logger.warning("Could not compact stock movements: %s", e)
+        finally:
+            self._lock.release()
+
+
+compactor = Compactor(interval=COMPACT_SECONDS)
@@ -0,0 +1,22 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py            # or: python wsgi.py [extra gunicorn args]
+
+Workers import this module after forking; building the app does not touch the
+database, so a worker is ready as soon as it has imported the code.
+"""
+
+import os
+import sys
+
+from app import configure_app
+
+application = configure_app()
+
+
+if __name__ == '__main__':
+    from gunicorn.app.wsgiapp import run
+
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    sys.argv = ['gunicorn', '-c', config_path, *sys.argv[1:]]
+    run()